@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends
+from sqlmodel import Session, select
+from ..database import get_session
+from ..models import Persona
+from ..services.cache_service import cache_service
+from ..services.cache_metrics import cache_metrics
+from ..services.cache_keys import persona_version, feed_key, picks_key
+from ..services.feed_store import feed_store
+from ..services.ai_service import ai_service
+
+router = APIRouter(prefix="/api/v1/admin", tags=["admin"])
+
+@router.get("/cache")
+def get_cache_info(session: Session = Depends(get_session)):
+    """
+    Cache introspection: backend in use, local/L1 tier stats, per-prefix hit/miss/error counters
+    with latency histograms, per-method hit rates of the AI result memo, and the size/TTL of every
+    persona's cache keys.
+    """
+    personas = []
+    for persona in session.exec(select(Persona)).all():
+        pid = persona.id
+        version = persona_version(pid)
+        feed = feed_key(pid, version)
+        keys = [feed, f"{feed}:meta", picks_key(pid, version, "last")]
+        keys += feed_store.index_keys(feed)
+        keys += cache_service.scan(picks_key(pid, version, "hash:"), limit=20)
+        entries = [cache_service.inspect(k) for k in keys]
+        personas.append({
+            "persona_id": pid,
+            "version": version,
+            "name": persona.name,
+            "freshness": feed_store.freshness(feed),
+            "total_bytes": sum(e["bytes"] or 0 for e in entries),
+            "keys": entries,
+        })
+    return {**cache_service.stats(), "metrics": cache_metrics.snapshot(), "ai_memo": ai_service.memo_stats(), "personas": personas}
+
+@router.post("/cache/metrics/reset")
+def reset_cache_metrics():
+    cache_metrics.reset()
+    return {"ok": True}
@@ -2,12 +2,16 @@ from typing import List, Optional, Dict
 from datetime import datetime
 from pydantic import BaseModel
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
+import asyncio
+import json
 import logging
 
 from ..database import get_session
 from ..models import Persona
 from ..services.ai_service import ai_service
+from ..services.ai_jobs import ai_job_runner, FINISHED
 
 logger = logging.getLogger("BuddyApp.ai")
 router = APIRouter(prefix="/api/v1/ai", tags=["ai"])
@@ -41,6 +45,7 @@ def get_ai_picks(
     通用 AI 选题精选接口 - 使用 Redis 候选池
     """
     from ..services.cache_service import cache_service
+    from ..services.cache_keys import persona_version, feed_key
 
     # 1. 获取目标人设
     if persona_id:
@@ -52,7 +57,7 @@ def get_ai_picks(
         raise HTTPException(status_code=404, detail="Persona not found")
 
     # 2. 获取 Redis 候选池
-    cache_key = f"discovery:persona:{persona.id}"
+    cache_key = feed_key(persona.id, persona_version(persona.id))
     candidates = cache_service.get(cache_key) or []
     
     if not candidates:
@@ -78,3 +83,41 @@ def get_ai_picks(
             })
 
     return {"items": result_items, "count": len(result_items)}
+
+@router.get("/jobs/{job_id}")
+def get_ai_job(job_id: str):
+    """
+    Status of an AI job: {"id", "kind", "status": "queued|running|done|failed", "result", "error", ...}.
+    """
+    job = ai_job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_ai_job(job_id: str):
+    """
+    Server-Sent Events of an AI job: an `event: status` with the job on every status change, the
+    last one when it is done or failed. Waiting holds no worker thread; DB reads (jobs of other
+    processes) run in a thread so they never block the event loop.
+    """
+    if not await asyncio.to_thread(ai_job_runner.get, job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        while True:
+            job = await asyncio.to_thread(ai_job_runner.get, job_id)
+            if job is None:
+                # Deleted while streaming
+                return
+            if job["status"] != last:
+                last = job["status"]
+                yield f"event: status\ndata: {json.dumps(job, ensure_ascii=False)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if last in FINISHED:
+                return
+            await ai_job_runner.wait_async(job_id, last, timeout=15)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks, Response
 from sqlmodel import Session, select
 from ..database import get_session
 from ..models import Persona, SourceConfig
-from ..services.crawler import crawler_service
+from ..services.crawler import crawler_service, config_to_dict
+from ..services.bilibili_service import bilibili_service
+from ..services.source_fetcher import source_fetcher
+from ..services.cache_service import cache_service
 
 router = APIRouter(prefix="/api/v1/dashboard", tags=["dashboard"])
 
@@ -11,7 +15,7 @@ def manual_sync(background_tasks: BackgroundTasks, session: Session = Depends(ge
     """
     Manually trigger background synchronization.
     """
-    if crawler_service.is_syncing:
+    if crawler_service.status()["is_syncing"]:
         return {"ok": False, "message": "Synchronization already in progress"}
     
     background_tasks.add_task(crawler_service.sync_all_sources, session)
@@ -22,30 +26,81 @@ def get_sync_status():
     """
     Get the current synchronization status and progress.
     """
+    status = crawler_service.status()
     progress = 0
-    if crawler_service.total_count > 0:
-        progress = int((crawler_service.current_count / crawler_service.total_count) * 100)
+    if status["total_count"] > 0:
+        progress = int((status["current_count"] / status["total_count"]) * 100)
     
     return {
-        "is_syncing": crawler_service.is_syncing,
+        "is_syncing": status["is_syncing"],
         "progress": progress,
-        "current_count": crawler_service.current_count,
-        "total_count": crawler_service.total_count,
-        "last_message": crawler_service.last_message
+        "current_count": status["current_count"],
+        "total_count": status["total_count"],
+        "last_message": status["last_message"],
+        "rate_limits": bilibili_service.rate_limit_stats(),
+        "details_cache": bilibili_service.details_cache_stats(),
+        "breakers": source_fetcher.breaker_status(),
+        "cache": cache_service.stats()
     }
 
 @router.get("/feed")
-def get_discovery_feed(persona_id: int, session: Session = Depends(get_session)):
+def get_discovery_feed(
+    persona_id: int,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    source: Optional[str] = Query(None, description="Bilibili / RSS / HotList"),
+    min_views: Optional[int] = Query(None, ge=0),
+    sort: Optional[Literal["published", "views", "score"]] = None,
+    order: Literal["desc", "asc"] = "desc",
+    session: Session = Depends(get_session)
+):
     """
     Returns discovery feed from Redis cache (TopHub style).
+    Without paging/filter params the whole feed list is returned as before; with any of them the
+    response is a page: {"items": [...], "next_cursor": "..." | null, "total": n, "freshness": {...}}.
+    A stale (or missing) feed is still served and refreshed in the background for this persona;
+    freshness is also sent as X-Feed-Updated-At / X-Feed-Age / X-Feed-Stale headers.
     """
     from ..services.cache_service import cache_service
-    
-    cache_key = f"discovery:persona:{persona_id}"
-    cached_data = cache_service.get(cache_key)
-    
-    if cached_data:
-        return cached_data
-    
-    # Cache miss: if it's the first time or expired
-    return []
+    from ..services.cache_keys import persona_version, feed_key
+    from ..services.feed_store import feed_store, CursorExpired
+
+    version = persona_version(persona_id)
+    cache_key = feed_key(persona_id, version)
+    freshness = feed_store.freshness(cache_key)
+    if freshness is None or freshness["stale"]:
+        persona = session.get(Persona, persona_id)
+        configs = [c for c in persona.source_configs if c.enabled] if persona else []
+        if configs and feed_store.claim_refresh(cache_key):
+            background_tasks.add_task(crawler_service.refresh_persona, persona_id, persona.name,
+                                      [config_to_dict(c) for c in configs], version)
+    if freshness:
+        response.headers["X-Feed-Updated-At"] = freshness["updated_at"]
+        response.headers["X-Feed-Age"] = str(freshness["age_seconds"])
+        response.headers["X-Feed-Stale"] = "1" if freshness["stale"] else "0"
+
+    if limit is None and cursor is None and source is None and min_views is None and sort is None:
+        cached_data = cache_service.get(cache_key)
+
+        if cached_data:
+            return cached_data
+
+        # Cache miss: if it's the first time or expired (a refresh was just scheduled)
+        return []
+
+    empty = {"items": [], "next_cursor": None, "total": 0}
+    query = dict(sort=sort or "published", desc=order == "desc", source=source, min_views=min_views,
+                 limit=limit or 20, cursor=cursor)
+    try:
+        page = feed_store.page(cache_key, **query)
+        if page is None:
+            # Feed cached before the index existed: index it once from the whole-feed blob
+            cached_data = cache_service.get(cache_key)
+            if cached_data:
+                feed_store.replace(cache_key, cached_data)
+                page = feed_store.page(cache_key, **query)
+    except CursorExpired:
+        raise HTTPException(status_code=410, detail="Feed was refreshed, restart from the first page")
+    return {**(page or empty), "freshness": freshness}
@@ -1,11 +1,28 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, BackgroundTasks
 from sqlmodel import Session, select
 from ..database import get_session
 from ..models import Persona, PersonaCreate, PersonaRead, PersonaUpdate, SourceConfig
+from ..services.source_fetcher import get_source_key
+from ..services.cache_keys import bump_persona_version, feed_key
+from ..services.crawler import crawler_service, config_to_dict
 
 router = APIRouter(prefix="/api/v1/personas", tags=["personas"])
 
+def _invalidate_persona_cache(persona: Persona, background_tasks: BackgroundTasks):
+    """
+    Moves the persona to a new cache version (its feed and AI picks under the old one become
+    unreachable and simply expire) and rebuilds the feed under it from the stored source items.
+    """
+    from ..services.feed_store import feed_store
+
+    version = bump_persona_version(persona.id)
+    configs = [c for c in persona.source_configs if c.enabled]
+    # Hold the refresh lock of the new feed so a read meanwhile does not refetch every source
+    if configs and feed_store.claim_refresh(feed_key(persona.id, version)):
+        background_tasks.add_task(crawler_service.refresh_persona, persona.id, persona.name,
+                                  [config_to_dict(c) for c in configs], version, refetch=False)
+
 @router.post("/", response_model=PersonaRead)
 def create_persona(persona: PersonaCreate, session: Session = Depends(get_session)):
     db_persona = Persona.from_orm(persona)
@@ -29,7 +46,8 @@ def read_persona(persona_id: int, session: Session = Depends(get_session)):
     return persona
 
 @router.put("/{persona_id}", response_model=PersonaRead)
-def update_persona(persona_id: int, persona: PersonaUpdate, session: Session = Depends(get_session)):
+def update_persona(persona_id: int, persona: PersonaUpdate, background_tasks: BackgroundTasks,
+                   session: Session = Depends(get_session)):
     db_persona = session.get(Persona, persona_id)
     if not db_persona:
         raise HTTPException(status_code=404, detail="Persona not found")
@@ -41,6 +59,7 @@ def update_persona(persona_id: int, persona: PersonaUpdate, session: Session = D
     session.add(db_persona)
     session.commit()
     session.refresh(db_persona)
+    _invalidate_persona_cache(db_persona, background_tasks)
     return db_persona
 
 @router.delete("/{persona_id}")
@@ -51,7 +70,8 @@ def delete_persona(persona_id: int, session: Session = Depends(get_session)):
     session.delete(persona)
     session.commit()
 @router.put("/{persona_id}/sources", response_model=List[SourceConfig])
-def update_persona_sources(persona_id: int, sources: List[SourceConfig], session: Session = Depends(get_session)):
+def update_persona_sources(persona_id: int, sources: List[SourceConfig], background_tasks: BackgroundTasks,
+                           session: Session = Depends(get_session)):
     """
     Update sources for a persona. Reuses existing IDs to maintain topic associations.
     """
@@ -62,14 +82,6 @@ def update_persona_sources(persona_id: int, sources: List[SourceConfig], session
     # 1. Map existing sources by (type, unique_key)
     # unique_key depends on type: uid for bilibili, url for rss, name for hot
     existing_sources = session.exec(select(SourceConfig).where(SourceConfig.persona_id == persona_id)).all()
-    
-    def get_source_key(s):
-        stype = s.type
-        data = s.config_data or {}
-        if stype == "bilibili_user": return f"bili:{data.get('uid')}"
-        if stype == "rss_feed": return f"rss:{data.get('url')}"
-        if stype == "hot_list": return f"hot:{s.name}"
-        return f"other:{s.name}"
 
     existing_map = {get_source_key(s): s for s in existing_sources}
     new_ids = []
@@ -108,5 +120,7 @@ def update_persona_sources(persona_id: int, sources: List[SourceConfig], session
     # Refresh all
     for s in new_ids:
         session.refresh(s)
-        
+
+    session.refresh(persona)
+    _invalidate_persona_cache(persona, background_tasks)
     return new_ids
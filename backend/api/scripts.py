@@ -1,11 +1,18 @@
+import json
+import logging
 from datetime import datetime
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Body
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel import Session, select
-from ..database import get_session
+from ..database import get_session, SessionLocal
 from ..models import Script, ScriptCreate, ScriptRead, ScriptUpdate, ScriptTemplate, ScriptTemplateCreate, ScriptTemplateRead, ScriptTemplateUpdate, Topic, Persona
 from ..services.ai_service import ai_service
+from ..services.ai_jobs import ai_job_runner
 
+logger = logging.getLogger("BuddyApp.scripts")
 router = APIRouter(prefix="/api/v1", tags=["scripts"]) 
 
 # --- Script Templates ---
@@ -44,11 +51,26 @@ def delete_template(id: int, session: Session = Depends(get_session)):
     return {"ok": True}
 
 # --- Scripts (The generated ones) ---
-@router.post("/scripts/generate", response_model=ScriptRead)
-def generate_script(payload: dict = Body(...), session: Session = Depends(get_session)):
+@router.post("/scripts/generate")
+def generate_script(
+    payload: dict = Body(...),
+    wait: bool = False,
+    priority: Literal["interactive", "normal", "batch"] = "interactive",
+    session: Session = Depends(get_session)
+):
     """
-    Generate and persist a script for a topic.
+    Queue generation of a script for a topic: returns 202 {"job_id", "status"}, poll
+    /api/v1/ai/jobs/{job_id} for the persisted script. wait=true blocks and returns the script as before.
+    Identical inputs reuse the previous result unless the payload has "regenerate": true.
     """
+    params = _script_params(payload, session)
+    job_id = ai_job_runner.submit("script", params, priority)
+    if wait:
+        return ai_job_runner.result(job_id)
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+def _script_params(payload: dict, session: Session) -> dict:
+    """Validates the request up front, so a bad request fails now rather than as a job."""
     topic_id = payload.get("topic_id")
     template_id = payload.get("template_id")
     persona_id = payload.get("persona_id")
@@ -64,13 +86,8 @@ def generate_script(payload: dict = Body(...), session: Session = Depends(get_se
     except (ValueError, TypeError):
         raise HTTPException(status_code=400, detail="IDs must be integers")
 
-    # 1. Get Context
-    topic = session.get(Topic, topic_id)
-    if not topic:
+    if not session.get(Topic, topic_id):
         raise HTTPException(status_code=404, detail="Topic not found")
-    
-    template = session.get(ScriptTemplate, template_id) if template_id else None
-    template_data = template.dict() if template else {}
 
     if persona_id:
         persona = session.get(Persona, persona_id)
@@ -80,14 +97,39 @@ def generate_script(payload: dict = Body(...), session: Session = Depends(get_se
     if not persona:
         raise HTTPException(status_code=400, detail="Persona not found")
 
+    return {"topic_id": topic_id, "template_id": template_id, "persona_id": persona.id, "extra_prompt": extra_prompt,
+            "regenerate": bool(payload.get("regenerate"))}
+
+def run_generate_script(session: Session, params: dict) -> Script:
+    """
+    AI job handler: generate and persist the script.
+    """
+    topic_id = params["topic_id"]
+    template_id = params["template_id"]
+
+    # 1. Get Context
+    topic = session.get(Topic, topic_id)
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    
+    template = session.get(ScriptTemplate, template_id) if template_id else None
+    template_data = template.dict() if template else {}
+    persona = session.get(Persona, params["persona_id"])
+    if not persona:
+        raise HTTPException(status_code=400, detail="Persona not found")
+
     # 2. Real AI Generation
     content = ai_service.generate_script(
         topic=topic,
         template=template_data,
         persona=persona,
-        extra_prompt=extra_prompt
+        extra_prompt=params["extra_prompt"],
+        regenerate=params.get("regenerate", False)
     )
-    
+    return _save_script(session, topic, template_id, content)
+
+def _save_script(session: Session, topic: Topic, template_id: Optional[int], content: str) -> Script:
+    topic_id = topic.id
     title = f"【脚本】{topic.title[:20]}"
     
     # Check for existing script to update or create new
@@ -113,6 +155,54 @@ def generate_script(payload: dict = Body(...), session: Session = Depends(get_se
     session.refresh(db_script)
     return db_script
 
+ai_job_runner.register("script", run_generate_script)
+
+@router.post("/scripts/generate/stream")
+async def stream_script(request: Request, payload: dict = Body(...), session: Session = Depends(get_session)):
+    """
+    Generate a script as Server-Sent Events: `event: token` with {"text": "..."} per chunk as the
+    model writes it, then `event: done` with the persisted script (or `event: error` with {"detail"}).
+    Closing the connection cancels the upstream completion; nothing is saved then.
+    """
+    params = await run_in_threadpool(_script_params, payload, session)
+    topic, template_data, persona = await run_in_threadpool(_script_context, session, params)
+
+    async def events():
+        tokens = ai_service.stream_script(topic, template_data, persona, params["extra_prompt"], params["regenerate"])
+        parts = []
+        try:
+            async for text in tokens:
+                if await request.is_disconnected():
+                    logger.info(f"Script stream for topic {topic.id} dropped by the client")
+                    return
+                parts.append(text)
+                yield _sse("token", {"text": text})
+            script = await run_in_threadpool(_persist_streamed_script, topic.id, params["template_id"], "".join(parts))
+            yield _sse("done", jsonable_encoder(script))
+        except Exception as e:
+            logger.error(f"AI Stream Script Error: {e}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            # Also runs when the response is cancelled: closes the upstream completion right away
+            await tokens.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _script_context(session: Session, params: dict):
+    topic = session.get(Topic, params["topic_id"])
+    template = session.get(ScriptTemplate, params["template_id"]) if params["template_id"] else None
+    persona = session.get(Persona, params["persona_id"])
+    return topic, template.dict() if template else {}, persona
+
+def _persist_streamed_script(topic_id: int, template_id: Optional[int], content: str) -> Script:
+    # The request's session may already be closed once the stream ends
+    with SessionLocal() as session:
+        return _save_script(session, session.get(Topic, topic_id), template_id, content)
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 @router.get("/scripts/topic/{topic_id}", response_model=ScriptRead)
 def read_script_by_topic(topic_id: int, session: Session = Depends(get_session)):
     item = session.exec(select(Script).where(Script.topic_id == topic_id)).first()
@@ -1,30 +1,33 @@
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
 from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
 from ..database import get_session
 from ..models import Topic, TopicCreate, TopicRead, TopicUpdate, Persona
 from ..services.ai_service import ai_service
+from ..services.ai_jobs import ai_job_runner
 
 router = APIRouter(prefix="/api/v1/topics", tags=["topics"])
 
-@router.post("/{topic_id}/generate-metadata", response_model=TopicRead)
+@router.post("/{topic_id}/generate-metadata")
 def generate_topic_metadata(
     topic_id: int, 
     persona_id: Optional[int] = None,
     payload: dict = Body({}),
+    wait: bool = False,
+    priority: Literal["interactive", "normal", "batch"] = "normal",
     session: Session = Depends(get_session)
 ):
     """
-    Generates and persists AI titles, summary and tags for a topic.
-    If script_content is provided, recommendations are based on the script.
+    Queue generation of AI titles, summary and tags for a topic: returns 202 {"job_id", "status"},
+    poll /api/v1/ai/jobs/{job_id} for the updated topic. wait=true blocks and returns the topic as before.
+    If script_content is provided, recommendations are based on the script; "regenerate": true in the
+    payload skips previous results.
     """
-    db_topic = session.get(Topic, topic_id)
-    if not db_topic:
+    if not session.get(Topic, topic_id):
         raise HTTPException(status_code=404, detail="Topic not found")
 
-    script_content = payload.get("script_content")
-
     # Get Persona for analysis context
     if persona_id:
         persona = session.get(Persona, persona_id)
@@ -34,10 +37,31 @@ def generate_topic_metadata(
     if not persona:
         raise HTTPException(status_code=400, detail="No persona found for context")
 
+    params = {"topic_id": topic_id, "persona_id": persona.id, "script_content": payload.get("script_content"),
+              "regenerate": bool(payload.get("regenerate"))}
+    job_id = ai_job_runner.submit("topic_metadata", params, priority)
+    if wait:
+        return ai_job_runner.result(job_id)
+    return JSONResponse(status_code=202, content={"job_id": job_id, "status": "queued"})
+
+def run_generate_metadata(session: Session, params: dict) -> Topic:
+    """
+    AI job handler: generates and persists AI titles, summary and tags for a topic.
+    """
+    db_topic = session.get(Topic, params["topic_id"])
+    if not db_topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    persona = session.get(Persona, params["persona_id"])
+    if not persona:
+        raise HTTPException(status_code=400, detail="No persona found for context")
+
+    script_content = params.get("script_content")
+    regenerate = params.get("regenerate", False)
+
     # Call AI Generation
     if script_content:
         # Base on Script
-        result = ai_service.generate_metadata_from_script(db_topic, script_content, persona)
+        result = ai_service.generate_metadata_from_script(db_topic, script_content, persona, regenerate=regenerate)
         if result:
             # Force a fresh dict to ensure change detection
             analysis = dict(db_topic.analysis_result or {})
@@ -51,11 +75,11 @@ def generate_topic_metadata(
             
             db_topic.analysis_result = analysis
     else:
-        # Standard Deep Dive Analysis (only if not already done)
-        if db_topic.ai_title:
+        # Standard Deep Dive Analysis (only if not already done, unless regenerating)
+        if db_topic.ai_title and not regenerate:
             return db_topic
             
-        result = ai_service.analyze_topic(db_topic, persona)
+        result = ai_service.analyze_topic(db_topic, persona, regenerate=regenerate)
         if result:
             db_topic.ai_title = result.get("titles", [""])[0] if result.get("titles") else f"【解析】{db_topic.title}"
             db_topic.ai_summary = result.get("summary")
@@ -76,6 +100,8 @@ def generate_topic_metadata(
     session.refresh(db_topic)
     return db_topic
 
+ai_job_runner.register("topic_metadata", run_generate_metadata)
+
 @router.get("/", response_model=List[TopicRead])
 def read_topics(session: Session = Depends(get_session)):
     topics = session.exec(
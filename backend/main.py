@@ -3,8 +3,11 @@ from dotenv import load_dotenv
 load_dotenv()
 from fastapi.middleware.cors import CORSMiddleware
 from .database import create_db_and_tables, SessionLocal
-from .api import personas, topics, dashboard, scripts, ai
+from .api import personas, topics, dashboard, scripts, ai, admin
 from .services.crawler import crawler_service
+from .services.ai_jobs import ai_job_runner
+from .services.rss_service import shutdown_parse_pool
+from .services.job_queue import check_sync_mode
 from apscheduler.schedulers.background import BackgroundScheduler
 import logging
 
@@ -35,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Feed-Updated-At", "X-Feed-Age", "X-Feed-Stale"],
 )
 
 @app.on_event("startup")
@@ -43,6 +47,9 @@ def on_startup():
     Run on startup: Create database tables and start background scheduler
     """
     create_db_and_tables()
+    check_sync_mode()
+    # AI jobs interrupted by the previous shutdown run again
+    ai_job_runner.recover()
     
     # Initialize Scheduler
     scheduler = BackgroundScheduler()
@@ -52,6 +59,10 @@ def on_startup():
     
     logger.info("Backend services started and scheduler is active.")
 
+@app.on_event("shutdown")
+def on_shutdown():
+    shutdown_parse_pool()
+
 @app.get("/")
 def read_root():
     return {"message": "Buddy Backend API is running", "docs_url": "/docs"}
@@ -62,6 +73,7 @@ app.include_router(topics.router)
 app.include_router(dashboard.router)
 app.include_router(scripts.router)
 app.include_router(ai.router)
+app.include_router(admin.router)
 
 if __name__ == "__main__":
     import uvicorn
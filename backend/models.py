@@ -166,3 +166,41 @@ class ScriptUpdate(SQLModel):
     title: Optional[str] = None
     content: Optional[str] = None
     status: Optional[str] = None
+
+
+# --- 7. SourceWatermark (数据源同步水位) ---
+class SourceWatermark(SQLModel, table=True):
+    """
+    Per-source sync state, keyed by the shared source key (bili:{uid}, rss:{url}).
+    enriched: {original_id: {"metrics": {...}, "tags": [...], "title": "...", "summary": "..."}}
+    The watermark is per item id rather than a timestamp: listed videos found in `enriched` skip
+    the detail/tag requests, whatever their publish date.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source_key: str = Field(index=True, unique=True)
+    enriched: Dict = Field(default={}, sa_column=Column(JSON), description="Stored details of enriched items")
+    etag: Optional[str] = Field(default=None, description="ETag of the last 200 response (RSS)")
+    last_modified: Optional[str] = Field(default=None, description="Last-Modified of the last 200 response (RSS)")
+    last_items: List[Dict] = Field(default=[], sa_column=Column(JSON), description="Items of the last successful fetch")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+# --- 8. AIJob (AI 生成任务) ---
+class AIJob(SQLModel, table=True):
+    """
+    One queued AIService call, e.g. kind="script" with params {"topic_id": 1, "template_id": 2, ...}.
+    status: queued -> running -> done / failed; result is the body the synchronous endpoint returns.
+    owner is the API process running it, which refreshes heartbeat_at while it does.
+    """
+    id: str = Field(primary_key=True)
+    kind: str = Field(index=True)
+    priority: str = Field(default="normal", description="interactive / normal / batch")
+    status: str = Field(default="queued", index=True)
+    params: Dict = Field(default={}, sa_column=Column(JSON))
+    result: Optional[Dict] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    owner: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
@@ -0,0 +1,104 @@
+"""
+缓存编码基准：500 条人设 feed 在各编码/压缩组合下的编码、解码耗时和体积。
+
+用法：
+    python -m backend.scripts.bench_cache_codec                 # 合成的 500 条 feed
+    python -m backend.scripts.bench_cache_codec --persona 1     # 使用 Redis 中真实的 discovery:persona:1
+    python -m backend.scripts.bench_cache_codec --items 2000
+
+Redis 可用时额外输出 MEMORY USAGE（写入 bench:codec:* 临时 key，结束后删除）。
+"""
+import argparse
+import json
+import random
+import time
+
+from backend.services.cache_codec import CacheCodec, orjson, msgpack, zstandard
+from backend.services.cache_service import cache_service
+from backend.services.cache_keys import persona_version, feed_key
+
+
+def sample_feed(n: int = 500):
+    random.seed(42)
+    words = ["人工智能", "大模型", "开源", "芯片", "新能源", "评测", "深度解析", "行业观察", "教程", "访谈"]
+    items = []
+    for i in range(n):
+        bvid = f"BV1{random.randint(10**8, 10**9 - 1)}"
+        items.append({
+            "original_id": bvid,
+            "title": "【" + random.choice(words) + "】" + "".join(random.choices(words, k=4)),
+            "url": f"https://www.bilibili.com/video/{bvid}",
+            "summary": "".join(random.choices(words, k=30)) + "。本期视频我们聊聊最近的热门话题，欢迎三连支持！",
+            "thumbnail": f"https://i0.hdslb.com/bfs/archive/{random.getrandbits(128):032x}.jpg",
+            "author": random.choice(["科技UP主", "数码评测", "AI前线"]),
+            "metrics": {k: random.randint(0, 10**6) for k in ("views", "likes", "coins", "stars", "comments")},
+            "labels": random.sample(words, 3),
+            "published_at": f"2026-10-{random.randint(1, 18):02d}T{random.randint(0, 23):02d}:00:00",
+            "source": random.choice(["Bilibili", "RSS"]),
+            "source_config_id": random.randint(1, 20),
+            "analysis_result": {"difficulty": "Medium", "personaMatch": "High", "commercialValue": "Low"},
+            "score": round(random.uniform(70, 99), 1),
+            "status": "new",
+        })
+    return items
+
+
+def codecs():
+    serializers = ["json"] + (["orjson"] if orjson else []) + (["msgpack"] if msgpack else [])
+    compressions = ["none", "zlib"] + (["zstd"] if zstandard else [])
+    return [(s, c) for s in serializers for c in compressions]
+
+
+def bench(feed, rounds: int):
+    legacy = json.dumps(feed, ensure_ascii=False)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        json.loads(legacy)
+    legacy_decode = (time.perf_counter() - start) / rounds
+
+    redis = cache_service.client
+    print(f"{len(feed)} items, {rounds} rounds, legacy json text {len(legacy.encode('utf-8')) / 1024:.1f} KB")
+    print(f"{'codec':<18}{'encode ms':>10}{'decode ms':>10}{'size KB':>10}{'redis KB':>10}")
+    print(f"{'legacy json (str)':<18}{'-':>10}{legacy_decode * 1000:>10.2f}{len(legacy.encode('utf-8')) / 1024:>10.1f}"
+          f"{_redis_usage(redis, 'legacy', legacy.encode('utf-8')):>10}")
+    for name, compression in codecs():
+        codec = CacheCodec(name, compression)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            data = codec.encode(feed)
+        encode = (time.perf_counter() - start) / rounds
+        start = time.perf_counter()
+        for _ in range(rounds):
+            codec.decode(data)
+        decode = (time.perf_counter() - start) / rounds
+        label = f"{name}+{compression}"
+        print(f"{label:<18}{encode * 1000:>10.2f}{decode * 1000:>10.2f}{len(data) / 1024:>10.1f}"
+              f"{_redis_usage(redis, label, data):>10}")
+
+
+def _redis_usage(redis, label: str, data: bytes) -> str:
+    if not redis:
+        return "-"
+    key = f"bench:codec:{label}"
+    try:
+        redis.set(key, data, ex=60)
+        return f"{redis.memory_usage(key) / 1024:.1f}"
+    finally:
+        redis.delete(key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache codec benchmark")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--persona", type=int, help="benchmark the cached feed of this persona instead")
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    feed = cache_service.get(feed_key(args.persona, persona_version(args.persona))) if args.persona else sample_feed(args.items)
+    if not feed:
+        raise SystemExit(f"No cached feed for persona {args.persona}")
+    bench(feed, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
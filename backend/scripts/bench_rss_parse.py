@@ -0,0 +1,120 @@
+"""
+RSS 条目解析基准：对比旧实现（每条两次 BeautifulSoup + 6 次未编译正则）与单次解析实现。
+
+用法：
+    python -m backend.scripts.bench_rss_parse                      # 使用内置的 RSSHub 风格样例
+    python -m backend.scripts.bench_rss_parse feed.xml             # 使用录制好的 feed
+    python -m backend.scripts.bench_rss_parse --record URL feed.xml  # 先录制一个真实 feed
+"""
+import re
+import sys
+import time
+import urllib.request
+
+import feedparser
+from bs4 import BeautifulSoup
+
+from backend.services.rss_service import RssService, HTML_PARSER
+
+
+# --- Legacy implementation (before single-pass parsing), kept only for comparison ---
+def legacy_extract_metrics(description):
+    metrics = {}
+    if not description:
+        return metrics
+    patterns = {
+        "views": r"播放量[:：]\s*(\d+)",
+        "likes": r"点赞[:：]\s*(\d+)",
+        "comments": r"评论[:：]\s*(\d+)",
+        "coins": r"硬币[:：]\s*(\d+)",
+        "stars": r"收藏[:：]\s*(\d+)"
+    }
+    for key, pattern in patterns.items():
+        match = re.search(pattern, description)
+        if match:
+            metrics[key] = int(match.group(1))
+    return metrics
+
+
+def legacy_clean_description(description):
+    if not description:
+        return ""
+    soup = BeautifulSoup(description, "html.parser")
+    for script in soup(["script", "style"]):
+        script.decompose()
+    text = soup.get_text(separator=" ", strip=True)
+    text = re.sub(r"(播放量|点赞|评论|硬币|收藏)[:：]\s*\d+", "", text)
+    return text[:500]
+
+
+def legacy_extract_thumbnail(description):
+    if not description:
+        return None
+    soup = BeautifulSoup(description, "html.parser")
+    img = soup.find("img")
+    return img["src"] if img and img.has_attr("src") else None
+
+
+def legacy_entry(description):
+    return (legacy_clean_description(description), legacy_extract_thumbnail(description),
+            legacy_extract_metrics(description))
+
+
+def sample_feed(n: int = 300) -> str:
+    """RSSHub bilibili/user/video 风格的样例 feed"""
+    items = []
+    for i in range(n):
+        desc = (
+            f"这是第 {i} 期视频的简介，聊聊最近的技术热点和一些个人看法。" * 3
+            + f'<br><br><iframe src="https://player.bilibili.com/player.html?bvid=BV{i:08d}" frameborder="0"></iframe>'
+            + f'<br><img src="https://i0.hdslb.com/bfs/archive/{i:08d}.jpg" referrerpolicy="no-referrer">'
+            + f"<br>播放量: {1000 + i * 37} 点赞: {i * 3} 评论: {i} 硬币: {i // 2} 收藏: {i // 3}"
+        )
+        items.append(
+            f"<item><title>视频 {i}</title><link>https://www.bilibili.com/video/BV{i:08d}</link>"
+            f"<guid>https://www.bilibili.com/video/BV{i:08d}</guid>"
+            f"<pubDate>Sat, 17 Oct 2026 12:00:00 GMT</pubDate>"
+            f"<description><![CDATA[{desc}]]></description></item>"
+        )
+    return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            "<title>样例 UP 主 的 bilibili 空间</title>" + "".join(items) + "</channel></rss>")
+
+
+def bench(label, func, descriptions, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for d in descriptions:
+            func(d)
+        best = min(best, time.perf_counter() - start)
+    rate = len(descriptions) / best
+    print(f"{label:<32} {rate:>10.0f} entries/sec")
+    return rate
+
+
+def main(argv):
+    if len(argv) >= 3 and argv[0] == "--record":
+        with urllib.request.urlopen(argv[1], timeout=30) as resp, open(argv[2], "wb") as f:
+            f.write(resp.read())
+        print(f"Recorded {argv[1]} -> {argv[2]}")
+        argv = argv[2:]
+
+    if argv:
+        with open(argv[0], "rb") as f:
+            raw = f.read()
+        print(f"Feed: {argv[0]}")
+    else:
+        raw = sample_feed()
+        print("Feed: built-in RSSHub-style sample")
+
+    feed = feedparser.parse(raw)
+    descriptions = [e.get("description", "") for e in feed.entries]
+    print(f"Entries: {len(descriptions)}, HTML parser: {HTML_PARSER}\n")
+
+    before = bench("before (2 soups + 6 regexes)", legacy_entry, descriptions)
+    after = bench("after (single pass)", RssService._parse_description, descriptions)
+    print(f"\nSpeedup: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
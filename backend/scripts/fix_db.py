@@ -28,6 +28,22 @@ def fix_schema():
     except Exception as e:
         print(f"outline already exists or error: {e}")
 
+    # 2.1 Add RSS validators / last items to sourcewatermark
+    for column, ddl in [("etag", "VARCHAR"), ("last_modified", "VARCHAR"), ("last_items", "JSON")]:
+        try:
+            cursor.execute(f"ALTER TABLE sourcewatermark ADD COLUMN {column} {ddl}")
+            print(f"Added {column} to sourcewatermark")
+        except Exception as e:
+            print(f"{column} already exists or error: {e}")
+
+    # 2.2 Add owner / heartbeat to aijob (claiming jobs across API processes)
+    for column, ddl in [("owner", "VARCHAR"), ("heartbeat_at", "DATETIME")]:
+        try:
+            cursor.execute(f"ALTER TABLE aijob ADD COLUMN {column} {ddl}")
+            print(f"Added {column} to aijob")
+        except Exception as e:
+            print(f"{column} already exists or error: {e}")
+
     # 3. Create a test topic if none exists
     cursor.execute("SELECT count(*) FROM topic")
     count = cursor.fetchone()[0]
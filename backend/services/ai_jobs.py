@@ -0,0 +1,257 @@
+import asyncio
+import itertools
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import or_, update
+from sqlmodel import Session, select
+
+from ..database import SessionLocal
+from ..models import AIJob
+
+logger = logging.getLogger(__name__)
+
+# AI 任务：接口只把 AIService 调用入队并立即返回 job id，由固定大小的线程池按优先级执行
+# 例：POST /api/v1/scripts/generate -> 202 {"job_id": "...", "status": "queued"}
+#     再轮询 GET /api/v1/ai/jobs/{id}，或订阅 GET /api/v1/ai/jobs/{id}/events（SSE）
+# 生成再多也只占 AI_JOB_WORKERS 个线程，不会耗尽 FastAPI 的线程池拖慢其他接口
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", 4))
+AI_JOB_WAIT_TIMEOUT = float(os.getenv("AI_JOB_WAIT_TIMEOUT", 120))
+AI_JOB_TTL = int(os.getenv("AI_JOB_TTL", 7 * 86400))
+# 多个 API 进程共用一个数据库：任务以 UPDATE ... WHERE status='queued' 认领，只有一个进程能执行
+# 运行中的任务每 AI_JOB_HEARTBEAT 秒刷新 heartbeat_at；启动时只重新入队超过 AI_JOB_STALE_AFTER 秒没有心跳的任务
+AI_JOB_HEARTBEAT = float(os.getenv("AI_JOB_HEARTBEAT", 15))
+AI_JOB_STALE_AFTER = float(os.getenv("AI_JOB_STALE_AFTER", 4 * AI_JOB_HEARTBEAT))
+# 数值越小越先执行：用户点击触发的生成优先于页面自动触发的分析，批量任务最后
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+FINISHED = ("done", "failed")
+
+
+class AIJobRunner:
+    """
+    Bounded, prioritized pool for AIService calls. Jobs are AIJob rows (status and result survive a
+    restart; jobs left queued, or running without a recent heartbeat, are requeued by recover()).
+    A worker claims a job atomically before running it, so a job queued in several processes runs
+    once. A handler is `handler(session, params) -> dict` registered per kind; raising
+    HTTPException fails the job with its detail.
+    """
+
+    def __init__(self, workers: int = AI_JOB_WORKERS):
+        self.workers = workers
+        self.session_factory: Callable[[], Session] = SessionLocal
+        self._handlers: Dict[str, Callable[[Session, Dict], Dict]] = {}
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._done: Dict[str, threading.Event] = {}
+        self._live: Dict[str, Dict] = {} # job id -> latest snapshot, for jobs of this process
+        self._lock = threading.Lock()
+        self._threads = []
+        self._running = 0
+        self._running_ids = set() # jobs this process runs, kept alive by the heartbeat thread
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def register(self, kind: str, handler: Callable[[Session, Dict], Dict]):
+        self._handlers[kind] = handler
+
+    def submit(self, kind: str, params: Dict, priority: str = "normal") -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown AI job kind: {kind}")
+        job = AIJob(id=uuid.uuid4().hex, kind=kind, priority=priority, params=params)
+        with self.session_factory() as session:
+            # Housekeeping: forget finished jobs older than AI_JOB_TTL
+            cutoff = datetime.utcnow() - timedelta(seconds=AI_JOB_TTL)
+            for old in session.exec(select(AIJob).where(AIJob.finished_at < cutoff)).all():
+                session.delete(old)
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            self._enqueue(job)
+        return job.id
+
+    def _enqueue(self, job: AIJob):
+        with self._lock:
+            self._done[job.id] = threading.Event()
+            self._live[job.id] = self._snapshot(job)
+            self._start_workers()
+        self._queue.put((PRIORITIES.get(job.priority, PRIORITIES["normal"]), next(self._seq), job.id))
+
+    def recover(self) -> int:
+        """
+        Queues the jobs still waiting and requeues running ones whose process stopped heartbeating.
+        Call once on startup. Jobs another live process runs are left alone; queued ones it also
+        holds run once thanks to the claim in _run().
+        """
+        stale = datetime.utcnow() - timedelta(seconds=AI_JOB_STALE_AFTER)
+        is_stale = or_(AIJob.heartbeat_at.is_(None), AIJob.heartbeat_at < stale)
+        with self.session_factory() as session:
+            session.execute(update(AIJob).where(AIJob.status == "running", is_stale).values(status="queued", owner=None))
+            session.commit()
+            jobs = session.exec(select(AIJob).where(AIJob.status == "queued")).all()
+            for job in jobs:
+                self._enqueue(job)
+        if jobs:
+            logger.info(f"Requeued {len(jobs)} unfinished AI job(s)")
+        return len(jobs)
+
+    def _start_workers(self):
+        if not self._threads:
+            threading.Thread(target=self._heartbeat, daemon=True, name="ai-job-heartbeat").start()
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, daemon=True, name=f"ai-job-{len(self._threads)}")
+            self._threads.append(thread)
+            thread.start()
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(AI_JOB_HEARTBEAT)
+            with self._lock:
+                job_ids = list(self._running_ids)
+            if not job_ids:
+                continue
+            try:
+                with self.session_factory() as session:
+                    session.execute(update(AIJob).where(AIJob.id.in_(job_ids), AIJob.owner == self.instance_id)
+                                    .values(heartbeat_at=datetime.utcnow()))
+                    session.commit()
+            except Exception:
+                logger.exception("AI job heartbeat failed")
+
+    def _work(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            with self._lock:
+                self._running += 1
+            try:
+                self._run(job_id)
+            except Exception:
+                logger.exception(f"AI job {job_id} crashed")
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    event = self._done.pop(job_id, None)
+                if event:
+                    event.set()
+
+    def _run(self, job_id: str):
+        with self.session_factory() as session:
+            now = datetime.utcnow()
+            claimed = session.execute(
+                update(AIJob).where(AIJob.id == job_id, AIJob.status == "queued")
+                .values(status="running", owner=self.instance_id, started_at=now, heartbeat_at=now)
+            ).rowcount
+            session.commit()
+            if not claimed:
+                # Finished, or claimed by another process: its status is read from the DB
+                with self._lock:
+                    self._live.pop(job_id, None)
+                return
+            job = session.get(AIJob, job_id)
+            session.refresh(job)
+            with self._lock:
+                self._live[job_id] = self._snapshot(job)
+                self._running_ids.add(job_id)
+            try:
+                self._execute(session, job)
+            finally:
+                with self._lock:
+                    self._running_ids.discard(job_id)
+
+    def _execute(self, session: Session, job: AIJob):
+        start = time.perf_counter()
+        try:
+            job.result = jsonable_encoder(self._handlers[job.kind](session, job.params))
+            job.status = "done"
+        except HTTPException as e:
+            session.rollback()
+            job.status, job.error = "failed", str(e.detail)
+        except Exception as e:
+            session.rollback()
+            logger.exception(f"AI job {job.id} ({job.kind}) failed")
+            job.status, job.error = "failed", str(e) or type(e).__name__
+        job.finished_at = datetime.utcnow()
+        self._save(session, job)
+        logger.info(f"AI job {job.id} ({job.kind}) {job.status} in {time.perf_counter() - start:.1f}s")
+
+    def _save(self, session: Session, job: AIJob):
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        with self._lock:
+            self._live[job.id] = self._snapshot(job)
+            if job.status in FINISHED:
+                # Finished jobs are read from the DB from now on
+                self._live.pop(job.id, None)
+
+    @staticmethod
+    def _snapshot(job: AIJob) -> Dict:
+        return jsonable_encoder(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            live = self._live.get(job_id)
+        if live:
+            return live
+        with self.session_factory() as session:
+            job = session.get(AIJob, job_id)
+            return self._snapshot(job) if job else None
+
+    def wait(self, job_id: str, timeout: float = AI_JOB_WAIT_TIMEOUT) -> Optional[Dict]:
+        """Blocks until the job finished (or timeout) and returns its snapshot."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            event = self._done.get(job_id)
+        if event:
+            event.wait(timeout)
+        job = self.get(job_id)
+        # Claimed by another process: poll the DB
+        while job and job["status"] not in FINISHED and time.monotonic() < deadline:
+            time.sleep(1)
+            job = self.get(job_id)
+        return job
+
+    async def wait_async(self, job_id: str, status: str, timeout: float):
+        """
+        Returns once the job of this process has left `status` (or finished), or after timeout,
+        without holding a thread.
+        """
+        deadline = time.monotonic() + timeout
+        seen = False
+        while time.monotonic() < deadline:
+            with self._lock:
+                live = self._live.get(job_id)
+            if live is None:
+                if not seen:
+                    # Run by another API process: the caller polls the DB
+                    await asyncio.sleep(1)
+                return
+            seen = True
+            if live["status"] != status:
+                return
+            await asyncio.sleep(0.2)
+
+    def result(self, job_id: str, timeout: float = AI_JOB_WAIT_TIMEOUT) -> Dict:
+        """wait=true mode: the job's result, or the HTTP error the synchronous endpoint would raise."""
+        job = self.wait(job_id, timeout)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"AI job {job_id} not found")
+        if job["status"] == "done":
+            return job["result"]
+        if job["status"] == "failed":
+            raise HTTPException(status_code=500, detail=job["error"])
+        raise HTTPException(status_code=504, detail=f"AI job {job_id} still {job['status']}, poll /api/v1/ai/jobs/{job_id}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"workers": self.workers, "running": self._running, "queued": self._queue.qsize()}
+
+
+ai_job_runner = AIJobRunner()
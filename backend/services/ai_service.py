@@ -2,17 +2,26 @@ import os
 import json
 import logging
 import hashlib
-from typing import List, Dict, Optional
+import threading
+import time
+from typing import AsyncIterator, List, Dict, Optional
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from ..models import Topic, Persona
-from .cache_service import cache_service
+from .cache_service import cache_service, async_cache_service
+from .cache_keys import persona_version, picks_key
+from .topic_ranker import prerank
+from .prompt_builder import PromptBuilder, Text, Table, minify, estimate_messages
 
 # 确保在初始化前加载 .env
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# 内容寻址的结果缓存：key = hash(模型, temperature, 输出格式, 渲染后的 system/user prompt, 人设版本)
+# 输入逐字节相同就直接返回上次的结果，不再调用模型；regenerate=True 跳过读取（新结果仍会写入）
+AI_MEMO_TTL = int(os.getenv("AI_MEMO_TTL", 7 * 86400))
+
 class AIService:
     def __init__(self):
         self.api_key = os.getenv("AI_API_KEY")
@@ -22,34 +31,109 @@ class AIService:
         logger.info(f"Initializing AIService (Model: {self.model}, BaseURL: {self.base_url}, KeyFound: {bool(self.api_key)})")
         
         self.client = None
+        self.async_client = None # Streaming (stream_script)
         if self.api_key:
             self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=110.0)
+            self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=110.0)
         else:
             logger.error("AI_API_KEY not found in environment variables.")
 
+        self._memo_counts: Dict[str, Dict[str, int]] = {}
+        self._memo_lock = threading.Lock()
+
+    def _memo_key(self, method: str, messages: List[Dict], temperature: float, json_mode: bool,
+                  persona: Optional[Persona]) -> str:
+        payload = json.dumps({
+            "model": self.model,
+            "temperature": temperature,
+            "json": json_mode,
+            "messages": messages,
+            "persona_version": persona_version(persona.id) if persona and persona.id else 0,
+        }, ensure_ascii=False, sort_keys=True)
+        return f"ai:memo:{method}:{hashlib.sha256(payload.encode()).hexdigest()}"
+
+    def _count(self, method: str, outcome: str):
+        with self._memo_lock:
+            counts = self._memo_counts.setdefault(method, {"hits": 0, "misses": 0, "bypassed": 0})
+            counts[outcome] += 1
+
+    def memo_stats(self) -> Dict:
+        """e.g. {"generate_script": {"hits": 3, "misses": 1, "bypassed": 0, "hit_rate": 0.75}}"""
+        with self._memo_lock:
+            result = {}
+            for method, counts in self._memo_counts.items():
+                total = sum(counts.values())
+                result[method] = {**counts, "hit_rate": round(counts["hits"] / total, 3) if total else 0}
+            return result
+
+    @staticmethod
+    def _log_usage(method: str, messages: List[Dict], usage):
+        """Local prompt estimate next to the token usage the API reports (when it does)."""
+        estimated = estimate_messages(messages)
+        if usage is None:
+            logger.info(f"AI {method}: prompt ~{estimated} tokens (estimated), no usage reported")
+            return
+        logger.info(f"AI {method}: prompt ~{estimated} tokens estimated / {usage.prompt_tokens} actual, "
+                    f"completion {usage.completion_tokens}")
+
+    def _complete(self, method: str, messages: List[Dict], temperature: float, persona: Optional[Persona],
+                  json_mode: bool = False, regenerate: bool = False) -> str:
+        """
+        One chat completion through the memo cache, returns the message content. Concurrent identical
+        calls share one model call (get_or_compute); regenerate=True always calls the model.
+        """
+        key = self._memo_key(method, messages, temperature, json_mode, persona)
+
+        def call() -> str:
+            extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                **extra
+            )
+            self._log_usage(method, messages, getattr(response, "usage", None))
+            return response.choices[0].message.content
+
+        if regenerate:
+            self._count(method, "bypassed")
+            content = call()
+            cache_service.set(key, content, expire=AI_MEMO_TTL)
+            return content
+        content = cache_service.get(key)
+        if content is not None:
+            self._count(method, "hits")
+            return content
+        self._count(method, "misses")
+        content = cache_service.get_or_compute(key, call, expire=AI_MEMO_TTL)
+        if content is None:
+            raise TimeoutError(f"No result for {method}: an identical call is still running")
+        return content
+
+    @staticmethod
+    def _persona_parts(persona: Persona, role_line: str) -> List:
+        """人设画像段落（选题精选 / 选题分析共用），人设描述和核心指令超出预算时可截短。"""
+        interests_str = ", ".join(persona.interests) if persona.interests else "泛内容创作"
+        parts = [
+            f"{role_line}你的服务对象是【{persona.name}】。\n人设描述：",
+            Text(persona.description or "无", priority=2, min_chars=50),
+            f"\n兴趣标签：{interests_str}\n专业深度：{persona.depth}/10\n",
+        ]
+        if persona.custom_prompt:
+            parts += ["\n人设核心指令（务必严格遵守）：\n", Text(persona.custom_prompt, priority=3, min_chars=200)]
+        return parts
+
     def pick_best_topics(self, topics: List[Dict], persona: Persona, n: int = 6) -> List[Dict]:
         """
         通用型选题精选逻辑。
-        topics: 候选列表（通常来自 Redis 缓存的 Dict 列表）
+        topics: 候选列表（通常来自 Redis 缓存的 Dict 列表），本地粗排后只把前 AI_PICKS_TOP_K 条交给 LLM
         """
         if not self.client or not topics:
             return []
 
-        # 1. 检查缓存
-        # 生成候选内容的 Hash，用于判断数据源是否变化
-        content_str = "".join([str(t.get("original_id") or t.get("id")) for t in topics[:20]])
-        # 加上人设的关键信息
-        persona_info = f"{persona.id}-{persona.depth}-{persona.custom_prompt or ''}"
-        cache_key = f"ai:picks:persona:{persona.id}:hash:{hashlib.md5((content_str + persona_info).encode()).hexdigest()}"
-        
-        cached_res = cache_service.get(cache_key)
-        if cached_res:
-            logger.info(f"AI Picks Cache Hit for persona {persona.name}")
-            return cached_res
-
-        # 2. 准备候选数据
+        # 1. 本地粗排 + 准备候选数据
         candidates_data = []
-        for t in topics:
+        for t in prerank(topics, persona):
             candidates_data.append({
                 "id": t.get("id") or t.get("original_id"),
                 "title": t.get("title"),
@@ -58,17 +142,35 @@ class AIService:
                 "summary": (t.get("summary", "")[:100] + "...") if t.get("summary") and len(t.get("summary", "")) > 100 else (t.get("summary") or "")
             })
 
-        # 3. 构建通用 Prompt，注入 custom_prompt
-        interests_str = ", ".join(persona.interests) if persona.interests else "泛内容创作"
+        # 2. 检查缓存
+        # 对实际发送给 LLM 的候选内容做 Hash，用于判断数据源是否变化
+        # 按 id 排序后再 Hash：粗排的新鲜度分随时间变化，同一批候选只是顺序变了不应错过缓存
+        # （发送给 LLM 的仍是粗排顺序，超出预算时从排名最后的候选开始裁）
+        content_str = json.dumps(sorted(candidates_data, key=lambda c: str(c["id"])), ensure_ascii=False, sort_keys=True)
+        # 加上人设的关键信息
+        persona_info = f"{persona.id}-{persona.depth}-{persona.custom_prompt or ''}"
+        version = persona_version(persona.id)
+        cache_key = picks_key(persona.id, version, f"hash:{hashlib.md5((content_str + persona_info).encode()).hexdigest()}")
         
-        # 核心逻辑：将人设详细设定注入 System Prompt
-        custom_instructions = f"\n人设核心指令（务必严格遵守）：\n{persona.custom_prompt}" if persona.custom_prompt else ""
+        # 同一份候选只让一个请求调用 LLM；其他并发请求拿上一次的精选结果，或等待这次的结果
+        try:
+            return cache_service.get_or_compute(
+                cache_key,
+                lambda: self._pick_best_topics_llm(candidates_data, persona, n),
+                expire=43200,
+                stale_key=picks_key(persona.id, version, "last"),
+            ) or []
+        except Exception as e:
+            logger.error(f"AI Picks Error: {str(e)}")
+            return []
 
-        system_prompt = f"""你是一个顶级的智能选题顾问。你的服务对象是【{persona.name}】。
-人设描述：{persona.description or "无"}
-兴趣标签：{interests_str}
-专业深度：{persona.depth}/10
-{custom_instructions}
+    def _pick_best_topics_llm(self, candidates_data: List[Dict], persona: Persona, n: int) -> List[Dict]:
+        logger.info(f"AI Picks Cache Miss for persona {persona.name}, calling LLM with {len(candidates_data)} candidates")
+
+        # 3. 构建通用 Prompt，注入 custom_prompt
+        # 核心逻辑：将人设详细设定注入 System Prompt；候选列表以表格形式发送，超出预算时先裁候选表
+        builder = PromptBuilder("pick_best_topics")
+        builder.message("system", *self._persona_parts(persona, "你是一个顶级的智能选题顾问。"), f"""
 
 任务：从提供的跨平台候选列表中，根据上述人设画像，挑选出最契合、最具备爆款潜力的 {n} 个选题。
 挑选原则：
@@ -81,63 +183,35 @@ class AIService:
     "picks": [
         {{"id": 选题ID, "reason": "针对性推荐理由，说明为什么高度符合该人设的性格和偏好"}}
     ]
-}}"""
+}}""")
+        builder.message("user", "候选列表（每行一个候选，字段以 | 分隔，第一行为表头）：\n", Table(
+            candidates_data, ["id", "title", "source", "metrics", "summary"], priority=1,
+            drop_columns=["summary", "metrics"], min_rows=2 * n))
 
-        user_prompt = f"候选列表：\n{json.dumps(candidates_data, ensure_ascii=False, indent=2)}"
+        content = self._complete("pick_best_topics", builder.build(), temperature=0.7, persona=persona, json_mode=True)
 
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
+        result = json.loads(content)
+        picks = result.get("picks", [])
 
-            result = json.loads(response.choices[0].message.content)
-            picks = result.get("picks", [])
-            
-            # 组装返回数据
-            valid_results = []
-            for p in picks:
-                if "id" in p and "reason" in p:
-                    # 我们尽量保持 ID 为原始类型
-                    valid_results.append({"id": p["id"], "reason": p["reason"]})
-            
-            # 存入缓存（12小时）
-            cache_service.set(cache_key, valid_results, expire=43200)
-            return valid_results
-
-        except Exception as e:
-            logger.error(f"AI Picks Error: {str(e)}")
-            return []
+        # 组装返回数据（由 get_or_compute 存入缓存，12小时）
+        valid_results = []
+        for p in picks:
+            if "id" in p and "reason" in p:
+                # 我们尽量保持 ID 为原始类型
+                valid_results.append({"id": p["id"], "reason": p["reason"]})
+        return valid_results
 
-    def analyze_topic(self, topic: Topic, persona: Persona) -> Dict:
+    def analyze_topic(self, topic: Topic, persona: Persona, regenerate: bool = False) -> Dict:
         """
         针对单个选题进行深度分析，生成标题、摘要、关键词等。
+        regenerate=True 时不使用缓存的结果。
         """
         if not self.client:
             return {}
 
-        # 1. 准备 Topic 数据
-        topic_data = {
-            "title": topic.title,
-            "summary": topic.summary or "",
-            "metrics": topic.metrics or {},
-            "author": topic.author or "未知"
-        }
-
-        # 2. 构建 Prompt
-        interests_str = ", ".join(persona.interests) if persona.interests else "泛内容创作"
-        custom_instructions = f"\n人设核心指令（务必严格遵守）：\n{persona.custom_prompt}" if persona.custom_prompt else ""
-
-        system_prompt = f"""你是一个顶级的智能选题分析师。你的服务对象是【{persona.name}】。
-人设描述：{persona.description or "无"}
-兴趣标签：{interests_str}
-专业深度：{persona.depth}/10
-{custom_instructions}
+        # 1. 构建 Prompt
+        builder = PromptBuilder("analyze_topic")
+        builder.message("system", *self._persona_parts(persona, "你是一个顶级的智能选题分析师。"), f"""
 
 任务：对提供的单个选题进行深度分析和内容重塑。
 要求：
@@ -153,51 +227,105 @@ class AIService:
     "keywords": ["关键词1", "关键词2", ...],
     "difficulty": 5,
     "personaMatch": 9
-}}"""
-
-        user_prompt = f"选题原文信息：\n{json.dumps(topic_data, ensure_ascii=False, indent=2)}"
+}}""")
+        # 2. 选题数据
+        builder.message(
+            "user",
+            f"选题原文信息：\n标题：{topic.title}\n作者：{topic.author or '未知'}\n数据：{minify(topic.metrics or {})}\n摘要：",
+            Text(topic.summary, priority=1, min_chars=100),
+        )
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
+            content = self._complete("analyze_topic", builder.build(), temperature=0.7, persona=persona,
+                                     json_mode=True, regenerate=regenerate)
 
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content)
             return result
 
         except Exception as e:
             logger.error(f"AI Analyze Topic Error: {str(e)}")
-            if 'response' in locals() and hasattr(response, 'choices'):
-                logger.error(f"Raw Response: {response.choices[0].message.content}")
+            if 'content' in locals():
+                logger.error(f"Raw Response: {content}")
             return {}
 
-    def generate_script(self, topic: Topic, template: Dict, persona: Persona, extra_prompt: str = "") -> str:
+    def generate_script(self, topic: Topic, template: Dict, persona: Persona, extra_prompt: str = "",
+                        regenerate: bool = False) -> str:
         """
         根据模板风格、人设和选题信息，生成视频脚本。
+        regenerate=True 时不使用缓存的结果。
         """
         if not self.client:
             return "AI 服务未初始化"
 
-        # 1. 准备上下文
-        template_name = template.get("name", "通用模板")
-        template_content = template.get("content_template", "")
-        
+        try:
+            return self._complete("generate_script", self._script_messages(topic, template, persona, extra_prompt),
+                                  temperature=0.8, persona=persona, regenerate=regenerate)
+        except Exception as e:
+            logger.error(f"AI Generate Script Error: {str(e)}")
+            raise e
+
+    async def stream_script(self, topic: Topic, template: Dict, persona: Persona, extra_prompt: str = "",
+                            regenerate: bool = False) -> AsyncIterator[str]:
+        """
+        generate_script 的流式版本：逐段产出模型输出的文本，与 generate_script 共用结果缓存
+        （命中时一次性产出整段脚本）。
+        调用方停止迭代（如浏览器断开）时关闭上游连接，模型不再继续生成，也不写入缓存。
+        """
+        if not self.async_client:
+            raise RuntimeError("AI 服务未初始化")
+
+        messages = self._script_messages(topic, template, persona, extra_prompt)
+        key = self._memo_key("generate_script", messages, 0.8, False, persona)
+        if not regenerate:
+            cached = await async_cache_service.get(key)
+            if cached is not None:
+                self._count("generate_script", "hits")
+                yield cached
+                return
+        self._count("generate_script", "bypassed" if regenerate else "misses")
+
+        start = time.perf_counter()
+        stream = await self.async_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            temperature=0.8,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        first = True
+        parts = []
+        usage = None
+        try:
+            async for chunk in stream:
+                # 开启 include_usage 后，最后一个 chunk 的 choices 为空，只带本次的 usage
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if first:
+                    first = False
+                    logger.info(f"AI Stream Script: first token after {time.perf_counter() - start:.2f}s")
+                parts.append(delta)
+                yield delta
+        finally:
+            await stream.close()
+        self._log_usage("stream_script", messages, usage)
+        await async_cache_service.set(key, "".join(parts), expire=AI_MEMO_TTL)
+
+    def _script_messages(self, topic: Topic, template: Dict, persona: Persona, extra_prompt: str) -> List[Dict]:
         # 1. 准备语言模型所需的上下文环境
+        # 超出预算时依次截短：选题素材 -> 参考案例 -> 人设设定 -> 额外要求
+        template_content = template.get("content_template", "")
         interests_str = ", ".join(persona.interests) if persona.interests else "泛内容创作"
         
-        system_prompt = f"""你是一个顶级的短视频剧本主创，擅长通过拆解优秀案例来为特定人设（Persona）量身定制内容。
+        builder = PromptBuilder("generate_script")
+        builder.message("system", f"""你是一个顶级的短视频剧本主创，擅长通过拆解优秀案例来为特定人设（Persona）量身定制内容。
 
 【当前人设身份】
 - 名称：{persona.name}
 - 专业深度：{persona.depth}/10
 - 核心标签：{interests_str}
-- 人设设定：{persona.custom_prompt or "未设定"}
+- 人设设定：""", Text(persona.custom_prompt or "未设定", priority=3, min_chars=200), """
 
 【创作准则】
 1. **适配案例骨架**：下方的【参考案例】是你本次创作的结构模版。请学习其叙事节奏、分镜逻辑和互动钩子。
@@ -206,43 +334,34 @@ class AIService:
 
 【参考案例（脚本模板）】
 ---
-{template_content}
+""", Text(template_content, priority=2, min_chars=300), """
 ---
 
 【输出格式】
 - 使用 Markdown 格式。
 - 必须包含 [画面提示] 和 [口播台词]。
 - 节奏感需与参考案例保持一致。
-{f"- 额外特殊要求：{extra_prompt}" if extra_prompt else ""}"""
-
-        user_prompt = f"""【选题素材】
-- 标题：{topic.title}
-- 背景分析：{topic.summary or "无"}
-- AI 深度见解：{topic.ai_summary or "无"}
-- 关键数据：{json.dumps(topic.metrics or {}, ensure_ascii=False)}"""
-
-        try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.8
-            )
-            return response.choices[0].message.content
-        except Exception as e:
-            logger.error(f"AI Generate Script Error: {str(e)}")
-            raise e
-
-    def generate_metadata_from_script(self, topic: Topic, script_content: str, persona: Persona) -> Dict:
+""", *(["- 额外特殊要求：", Text(extra_prompt, priority=4, min_chars=100)] if extra_prompt else []))
+
+        builder.message(
+            "user",
+            f"【选题素材】\n- 标题：{topic.title}\n- 背景分析：", Text(topic.summary or "无", priority=1, min_chars=100),
+            "\n- AI 深度见解：", Text(topic.ai_summary or "无", priority=1, min_chars=100),
+            f"\n- 关键数据：{minify(topic.metrics or {})}",
+        )
+        return builder.build()
+
+    def generate_metadata_from_script(self, topic: Topic, script_content: str, persona: Persona,
+                                      regenerate: bool = False) -> Dict:
         """
         基于生成的脚本内容，反向推导爆款标题、简介和标签。
+        regenerate=True 时不使用缓存的结果。
         """
         if not self.client:
             return {}
 
-        system_prompt = f"""你是一个短视频运营专家。
+        builder = PromptBuilder("generate_metadata_from_script")
+        builder.message("system", f"""你是一个短视频运营专家。
 你的任务是基于一份已经写好的【视频脚本】，为【{persona.name}】的人设撰写配套的宣发物料。
 
 【核心任务】：
@@ -258,26 +377,19 @@ class AIService:
     "titles": ["标题(视角A)", "标题(视角B)", "标题(视角C)"],
     "intro": "视频简介内容",
     "tags": ["标签1", "标签2", ...]
-}}"""
-
-        user_prompt = f"""选题原摘要：{topic.summary or "无"}
-AI 深度分析：{topic.ai_summary or "无"}
-最终脚本内容：
----
-{script_content}
----"""
+}}""")
+        # 预算不够时先裁两段摘要，脚本正文最后才截短
+        builder.message(
+            "user",
+            "选题原摘要：", Text(topic.summary or "无", priority=1, min_chars=50),
+            "\nAI 深度分析：", Text(topic.ai_summary or "无", priority=1, min_chars=50),
+            "\n最终脚本内容：\n---\n", Text(script_content, priority=2, min_chars=500), "\n---",
+        )
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7
-            )
-            return json.loads(response.choices[0].message.content)
+            content = self._complete("generate_metadata_from_script", builder.build(), temperature=0.7,
+                                     persona=persona, json_mode=True, regenerate=regenerate)
+            return json.loads(content)
         except Exception as e:
             logger.error(f"AI Generate Metadata Error: {str(e)}")
             raise e
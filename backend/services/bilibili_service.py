@@ -1,113 +1,257 @@
 from typing import List, Dict, Optional
 from bilibili_api import user, video, sync, comment
+from bilibili_api.exceptions import NetworkException, ResponseCodeException
+from .rate_limiter import AdaptiveRateLimiter
+from .cache_service import async_cache_service
+import httpx
+import os
 import time
 
+# 412 / -412 是 HTTP 拦截，-352 / -799 是风控校验和"请求过于频繁"
+THROTTLE_CODES = {412, -412, -352, -799}
+THROTTLE_RETRIES = int(os.getenv("BILI_THROTTLE_RETRIES", 2))
+
+def _make_limiter(family: str) -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(
+        f"bilibili.{family}",
+        rate=float(os.getenv("BILI_RATE_INITIAL", 2.0)),
+        min_rate=float(os.getenv("BILI_RATE_MIN", 0.2)),
+        max_rate=float(os.getenv("BILI_RATE_MAX", 10.0)),
+    )
+
+# One shared limiter per endpoint family: video (info/tags), space (user uploads), comment
+limiters = {family: _make_limiter(family) for family in ("video", "space", "comment")}
+
+# 视频详情缓存（按 BVID）：标题/标签/简介几乎不变，长期缓存；指标按视频"年龄"分级过期
+# 例：发布 3 小时的视频指标缓存 30 分钟，发布 3 天的缓存 6 小时，更老的缓存 24 小时
+DETAILS_META_TTL = int(os.getenv("BILI_DETAILS_META_TTL", 7 * 86400))
+DETAILS_STAT_TTL_TIERS = [(86400, 1800), (7 * 86400, 6 * 3600)]  # (max_age, ttl) in seconds
+DETAILS_STAT_TTL_OLD = 86400
+
+details_cache_stats = {"meta": {"hits": 0, "misses": 0}, "stat": {"hits": 0, "misses": 0}}
+
+def _details_key(part: str, bvid: str) -> str:
+    return f"bili:video:{bvid}:{part}"
+
+def _stat_ttl(pubdate: Optional[int]) -> int:
+    if not pubdate:
+        return DETAILS_STAT_TTL_OLD
+    age = time.time() - pubdate
+    for max_age, ttl in DETAILS_STAT_TTL_TIERS:
+        if age < max_age:
+            return ttl
+    return DETAILS_STAT_TTL_OLD
+
+async def _cache_get(bvid: str, *parts: str) -> List[Optional[Dict]]:
+    """Cached parts of one video in a single round trip, awaited so the sync engine's loop keeps running."""
+    values = await async_cache_service.mget([_details_key(part, bvid) for part in parts])
+    for part, value in zip(parts, values):
+        details_cache_stats[part]["hits" if value is not None else "misses"] += 1
+    return values
+
+def error_status(e: Exception) -> Optional[int]:
+    """HTTP status or API code carried by an error (SDK exceptions, httpx.HTTPStatusError), else None."""
+    if isinstance(e, NetworkException):
+        return e.status
+    if isinstance(e, ResponseCodeException):
+        return e.code
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def is_throttled(e: Exception) -> bool:
+    # Only a structured status counts: "412" inside a message (BVID, URL, count) is not throttling
+    return error_status(e) in THROTTLE_CODES
+
+def is_host_failure(e: Exception) -> bool:
+    """
+    Whether an SDK error says api.bilibili.com itself is unhealthy: network errors, timeouts,
+    5xx and throttling. App-level codes (e.g. -404 for a deleted UP) are the source's problem.
+    """
+    if isinstance(e, (httpx.TransportError, TimeoutError, ConnectionError)):
+        return True
+    status = error_status(e)
+    if isinstance(e, ResponseCodeException):
+        return status in THROTTLE_CODES
+    return status is not None and (status >= 500 or status in THROTTLE_CODES)
+
 class BilibiliService:
     """
     Service to interact with Bilibili APIs.
+    The *_async methods are the native coroutines used by the sync engine and raise on failure;
+    the plain methods are blocking wrappers that keep the old "empty result on error" contract.
     """
 
     @staticmethod
-    def get_video_comments(bvid: str, limit: int = 10) -> List[Dict]:
+    async def _call(family: str, make_request):
+        """
+        Runs one API request through the family's limiter. Throttled requests feed the AIMD
+        back-off and are retried (the limiter already enforces the penalty wait).
+        """
+        limiter = limiters[family]
+        for attempt in range(THROTTLE_RETRIES + 1):
+            await limiter.acquire()
+            try:
+                result = await make_request()
+            except Exception as e:
+                if not is_throttled(e):
+                    raise
+                limiter.on_throttle(f"{type(e).__name__}: {e}")
+                if attempt == THROTTLE_RETRIES:
+                    raise
+                continue
+            limiter.on_success()
+            return result
+
+    @staticmethod
+    def rate_limit_stats() -> List[Dict]:
+        return [limiter.stats() for limiter in limiters.values()]
+
+    @staticmethod
+    def details_cache_stats() -> Dict:
+        return details_cache_stats
+
+    @staticmethod
+    async def _cache_metrics(bvid: str, info: Dict) -> Dict:
+        metrics = BilibiliService._stat_to_metrics(info.get("stat", {}))
+        await async_cache_service.set(_details_key("stat", bvid), metrics, expire=_stat_ttl(info.get("pubdate")))
+        return metrics
+
+    @staticmethod
+    async def get_video_comments_async(bvid: str, limit: int = 10) -> List[Dict]:
         """
         Fetches top comments for a video.
         """
-        try:
-            time.sleep(1)
-            # Fetch AID
-            v = video.Video(bvid=bvid)
-            info = sync(v.get_info())
+        # Fetch AID (cached alongside the video meta)
+        meta, = await _cache_get(bvid, "meta")
+        if meta and meta.get("aid"):
+            aid = meta["aid"]
+        else:
+            info = await BilibiliService._call("video", video.Video(bvid=bvid).get_info)
             aid = info.get('aid')
-            if not aid:
-                return []
-
-            time.sleep(0.5)
-            # Use minimal arguments to avoid SDK version conflicts with parameter names
-            res = sync(comment.get_comments(oid=aid, type_=comment.CommentResourceType.VIDEO))
-            
-            # The SDK might return 'replies' as None if empty or blocked
-            replies = res.get('replies') or []
-            comments = []
-            
-            for r in replies[:limit]:
-                comments.append({
-                    "user": r.get('member', {}).get('uname'),
-                    "content": r.get('content', {}).get('message'),
-                    "likes": r.get('like', 0),
-                    "published_at": BilibiliService._timestamp_to_iso(r.get('ctime'))
-                })
-            return comments
+        if not aid:
+            return []
+
+        # Use minimal arguments to avoid SDK version conflicts with parameter names
+        res = await BilibiliService._call(
+            "comment", lambda: comment.get_comments(oid=aid, type_=comment.CommentResourceType.VIDEO)
+        )
+
+        # The SDK might return 'replies' as None if empty or blocked
+        replies = res.get('replies') or []
+        comments = []
+
+        for r in replies[:limit]:
+            comments.append({
+                "user": r.get('member', {}).get('uname'),
+                "content": r.get('content', {}).get('message'),
+                "likes": r.get('like', 0),
+                "published_at": BilibiliService._timestamp_to_iso(r.get('ctime'))
+            })
+        return comments
+
+    @staticmethod
+    def get_video_comments(bvid: str, limit: int = 10) -> List[Dict]:
+        try:
+            return sync(BilibiliService.get_video_comments_async(bvid, limit))
         except Exception as e:
             print(f"Error fetching comments for video {bvid}: {e}")
             return []
 
     @staticmethod
-    def get_video_details(bvid: str) -> Dict:
+    async def get_video_details_async(bvid: str) -> Dict:
         """
         Fetches detailed information for a single video including metrics and tags.
+        Meta (title/summary/tags) and metrics are cached separately, see DETAILS_* above.
         """
-        try:
-            # 合理安排间隔，避免触发 412
-            time.sleep(1) 
+        meta, metrics = await _cache_get(bvid, "meta", "stat")
+        if meta is None or metrics is None:
+            # 请求间隔由 limiters["video"] 自适应控制，避免触发 412
             v = video.Video(bvid=bvid)
-            info = sync(v.get_info())
-            
-            # 再等一下拿标签
-            time.sleep(0.5)
-            tags_list = sync(v.get_tags())
-            tags = [tag.get("tag_name") for tag in tags_list] if tags_list else []
-            
-            stat = info.get("stat", {})
-            return {
-                "metrics": {
-                    "views": stat.get("view", 0),
-                    "likes": stat.get("like", 0),
-                    "coins": stat.get("coin", 0),
-                    "stars": stat.get("favorite", 0),
-                    "comments": stat.get("reply", 0)
-                },
-                "tags": tags,
-                "title": info.get("title"),
-                "summary": info.get("desc")
-            }
+            info = await BilibiliService._call("video", v.get_info)
+            metrics = await BilibiliService._cache_metrics(bvid, info)
+            if meta is None:
+                tags_list = await BilibiliService._call("video", v.get_tags)
+                meta = {
+                    "title": info.get("title"),
+                    "summary": info.get("desc"),
+                    "tags": [tag.get("tag_name") for tag in tags_list] if tags_list else [],
+                    "aid": info.get("aid"),
+                    "pubdate": info.get("pubdate"),
+                }
+                await async_cache_service.set(_details_key("meta", bvid), meta, expire=DETAILS_META_TTL)
+
+        return {
+            "metrics": metrics,
+            "tags": meta["tags"],
+            "title": meta["title"],
+            "summary": meta["summary"]
+        }
+
+    @staticmethod
+    async def get_video_metrics_async(bvid: str) -> Dict:
+        """
+        Metrics-only refresh: at most one info request (none while the age-tiered cache is fresh).
+        """
+        metrics, = await _cache_get(bvid, "stat")
+        if metrics is None:
+            info = await BilibiliService._call("video", video.Video(bvid=bvid).get_info)
+            metrics = await BilibiliService._cache_metrics(bvid, info)
+        return metrics
+
+    @staticmethod
+    def get_video_details(bvid: str) -> Dict:
+        try:
+            return sync(BilibiliService.get_video_details_async(bvid))
         except Exception as e:
             print(f"Error fetching details for video {bvid}: {e}")
             return {}
 
     @staticmethod
-    def fetch_user_videos(uid: int, limit: int = 10) -> List[Dict]:
+    async def fetch_user_videos_async(uid: int, limit: int = 10) -> List[Dict]:
         """
         Fetches the latest videos uploaded by a user.
         """
+        u = user.User(uid)
+        res = await BilibiliService._call("space", lambda: u.get_videos(ps=limit))
+        video_list = res.get("list", {}).get("vlist", [])
+        topics = []
+
+        for v in video_list:
+            topics.append({
+                "original_id": v.get("bvid"),
+                "title": v.get("title"),
+                "url": f"https://www.bilibili.com/video/{v.get('bvid')}",
+                "summary": v.get("description"),
+                "thumbnail": v.get("pic"),
+                "author": v.get("author"),
+                "metrics": {
+                    "views": v.get("play"),
+                    "comments": v.get("comment"),
+                    "likes": 0
+                },
+                "published_at": BilibiliService._timestamp_to_iso(v.get("created")),
+                "source": "Bilibili"
+            })
+        return topics
+
+    @staticmethod
+    def fetch_user_videos(uid: int, limit: int = 10) -> List[Dict]:
         try:
-            # 基础请求间隔
-            time.sleep(1)
-            u = user.User(uid)
-            res = sync(u.get_videos(ps=limit))
-            video_list = res.get("list", {}).get("vlist", [])
-            topics = []
-            
-            for v in video_list:
-                topics.append({
-                    "original_id": v.get("bvid"),
-                    "title": v.get("title"),
-                    "url": f"https://www.bilibili.com/video/{v.get('bvid')}",
-                    "summary": v.get("description"),
-                    "thumbnail": v.get("pic"),
-                    "author": v.get("author"),
-                    "metrics": {
-                        "views": v.get("play"),
-                        "comments": v.get("comment"),
-                        "likes": 0 
-                    },
-                    "published_at": BilibiliService._timestamp_to_iso(v.get("created")),
-                    "source": "Bilibili"
-                })
-            return topics
+            return sync(BilibiliService.fetch_user_videos_async(uid, limit))
         except Exception as e:
             print(f"Bilibili SDK fetch_user_videos failed for {uid}: {e}")
             return []
 
+    @staticmethod
+    def _stat_to_metrics(stat: Dict) -> Dict:
+        return {
+            "views": stat.get("view", 0),
+            "likes": stat.get("like", 0),
+            "coins": stat.get("coin", 0),
+            "stars": stat.get("favorite", 0),
+            "comments": stat.get("reply", 0)
+        }
+
     @staticmethod
     def _timestamp_to_iso(timestamp: Optional[int]) -> Optional[str]:
         if not timestamp:
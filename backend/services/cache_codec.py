@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import zlib
+from typing import Any, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+# 缓存值编码：CACHE_CODEC=auto|json|orjson|msgpack，CACHE_COMPRESSION=auto|zstd|zlib|none
+# 超过 CACHE_COMPRESS_MIN_BYTES（默认 4KB）的值才压缩，例如整份人设 feed；小的 stat/meta 条目不压缩
+CACHE_CODEC = os.getenv("CACHE_CODEC", "auto")
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "auto")
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", 4096))
+
+# Header: MAGIC + version + serializer id + compression id. A JSON document never starts with
+# a NUL byte, so values written before the codec layer (plain JSON text) still decode.
+MAGIC = b"\x00B"
+VERSION = 1
+SERIALIZERS = {"json": 0, "orjson": 1, "msgpack": 2}
+COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2}
+
+
+def _resolve(codec: str, compression: str) -> Tuple[str, str]:
+    if codec == "auto":
+        codec = "orjson" if orjson else "json"
+    if compression == "auto":
+        compression = "zstd" if zstandard else "zlib"
+    if (codec == "orjson" and not orjson) or (codec == "msgpack" and not msgpack):
+        logger.warning(f"Cache codec {codec} not installed, using json")
+        codec = "json"
+    if compression == "zstd" and not zstandard:
+        logger.warning("zstandard not installed, using zlib")
+        compression = "zlib"
+    return codec, compression
+
+
+class CacheCodec:
+    """
+    Encodes cache values to bytes with a 5-byte header, e.g. b"\\x00B" + [1, orjson, zstd] + payload.
+    Decoding follows the header, not the current settings, so a codec change never orphans entries.
+    Note: msgpack keeps tuples as lists and non-str dict keys as they are; JSON codecs stringify keys.
+    """
+
+    def __init__(self, codec: str = CACHE_CODEC, compression: str = CACHE_COMPRESSION,
+                 compress_min_bytes: int = CACHE_COMPRESS_MIN_BYTES):
+        self.codec, self.compression = _resolve(codec, compression)
+        self.compress_min_bytes = compress_min_bytes
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._dumps(self.codec, value)
+        compression = "none"
+        if self.compression != "none" and len(payload) >= self.compress_min_bytes:
+            payload = self._compress(self.compression, payload)
+            compression = self.compression
+        return MAGIC + bytes([VERSION, SERIALIZERS[self.codec], COMPRESSIONS[compression]]) + payload
+
+    def decode(self, data: Union[bytes, str]) -> Any:
+        if isinstance(data, str) or not data.startswith(MAGIC):
+            # Legacy plain-JSON entry
+            return json.loads(data)
+        version, serializer, compression = data[2], data[3], data[4]
+        if version != VERSION:
+            raise ValueError(f"Unsupported cache codec version {version}")
+        payload = data[5:]
+        if compression:
+            payload = self._decompress(compression, payload)
+        return self._loads(serializer, payload)
+
+    @staticmethod
+    def _dumps(codec: str, value: Any) -> bytes:
+        if codec == "orjson":
+            return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        if codec == "msgpack":
+            return msgpack.packb(value, use_bin_type=True)
+        return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def _loads(serializer: int, payload: bytes) -> Any:
+        if serializer == SERIALIZERS["orjson"]:
+            # orjson output is plain JSON: fall back to the stdlib if orjson is missing on this box
+            return orjson.loads(payload) if orjson else json.loads(payload)
+        if serializer == SERIALIZERS["msgpack"]:
+            if not msgpack:
+                raise ValueError("msgpack entry but msgpack is not installed")
+            return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        return json.loads(payload)
+
+    @staticmethod
+    def _compress(compression: str, payload: bytes) -> bytes:
+        if compression == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(payload)
+        return zlib.compress(payload, 6)
+
+    @staticmethod
+    def _decompress(compression: int, payload: bytes) -> bytes:
+        if compression == COMPRESSIONS["zstd"]:
+            if not zstandard:
+                raise ValueError("zstd entry but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(payload)
+        return zlib.decompress(payload)
+
+
+codec = CacheCodec()
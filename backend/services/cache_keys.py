@@ -0,0 +1,23 @@
+from .cache_service import cache_service
+
+# 按人设的缓存命名空间版本：所有依赖人设配置的 key 都带上版本号，例如
+#   discovery:persona:1:v3            人设 feed（及其 :meta / :head / 索引等子 key）
+#   ai:picks:persona:1:v3:hash:ab12   AI 精选结果
+# 修改人设或其数据源时 bump_persona_version 把版本 +1，旧 key 立即不可达，等 TTL 自然过期，无需扫描删除
+
+
+def persona_version(pid: int) -> int:
+    return int(cache_service.get(f"persona:{pid}:version") or 0)
+
+
+def bump_persona_version(pid: int) -> int:
+    return cache_service.incr(f"persona:{pid}:version")
+
+
+def feed_key(pid: int, version: int) -> str:
+    return f"discovery:persona:{pid}:v{version}"
+
+
+def picks_key(pid: int, version: int, part: str) -> str:
+    """part e.g. "hash:ab12" or "last"."""
+    return f"ai:picks:persona:{pid}:v{version}:{part}"
@@ -0,0 +1,77 @@
+import threading
+from typing import Dict
+
+# 按 key 前缀统计，例如 discovery:persona:1 -> "discovery:"，ai:picks:persona:1:hash:ab -> "ai:picks:"
+KNOWN_PREFIXES = ("discovery:", "ai:picks:", "ai:memo:", "bili:video:", "lock:")
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def key_prefix(key: str) -> str:
+    for prefix in KNOWN_PREFIXES:
+        if key.startswith(prefix):
+            return prefix
+    head, sep, _ = key.partition(":")
+    return head + sep if sep else "other"
+
+
+class CacheMetrics:
+    """
+    Per-prefix, per-operation outcome counters and latency histograms for CacheService.
+    Outcomes: where a get was served from ("l1" / "redis" / "local") or "miss"; where a write
+    went ("redis" / "local"). Errors (e.g. Redis timeouts) are counted separately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ops: Dict[str, Dict[str, Dict]] = {}
+
+    def _entry(self, op: str, key: str) -> Dict:
+        return self._ops.setdefault(key_prefix(key), {}).setdefault(op, {
+            "outcomes": {}, "errors": 0, "latency_ms": {"count": 0, "sum": 0.0, "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1)},
+        })
+
+    def record(self, op: str, key: str, outcome: str, seconds: float):
+        ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if ms <= bound), len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            entry = self._entry(op, key)
+            entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+            latency = entry["latency_ms"]
+            latency["count"] += 1
+            latency["sum"] += ms
+            latency["buckets"][bucket] += 1
+
+    def error(self, op: str, key: str):
+        with self._lock:
+            self._entry(op, key)["errors"] += 1
+
+    def snapshot(self) -> Dict:
+        """e.g. {"ai:picks:": {"get": {"outcomes": {"redis": 12, "miss": 1}, "hit_rate": 0.92, ...}}}"""
+        labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+        with self._lock:
+            result = {}
+            for prefix, ops in self._ops.items():
+                result[prefix] = {}
+                for op, entry in ops.items():
+                    latency = entry["latency_ms"]
+                    stats = {
+                        "outcomes": dict(entry["outcomes"]),
+                        "errors": entry["errors"],
+                        "latency_ms": {
+                            "count": latency["count"],
+                            "avg": round(latency["sum"] / latency["count"], 3) if latency["count"] else 0,
+                            "buckets": dict(zip(labels, latency["buckets"])),
+                        },
+                    }
+                    if op == "get" and latency["count"]:
+                        misses = entry["outcomes"].get("miss", 0)
+                        stats["hit_rate"] = round(1 - misses / latency["count"], 3)
+                    result[prefix][op] = stats
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._ops.clear()
+
+
+cache_metrics = CacheMetrics()
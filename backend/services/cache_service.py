@@ -1,76 +1,707 @@
 import redis
+import redis.asyncio as aioredis
+import asyncio
 import json
 import logging
 import os
-from typing import Optional, Any
+import threading
+import time
+import uuid
+import weakref
+from typing import Optional, Any, Callable, Dict, List, Tuple
+from .local_cache import LocalCache
+from .disk_cache import CACHE_DISK_PATH, DiskCache, PersistentLocalCache
+from .cache_codec import codec
+from .cache_metrics import cache_metrics
 
 logger = logging.getLogger(__name__)
 
+# 连接池：同一进程内的线程共享最多 REDIS_MAX_CONNECTIONS 个连接；首次使用时才连接并 ping（不在 import 时）
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+# L1：进程内缓存已解码的热点对象（如 discovery:persona:1:v3、每次读 feed 都要查的 persona:1:version），跳过 Redis 往返和解码
+# 任何进程 set/delete 都会通过 Redis pub/sub 广播失效；CACHE_L1_TTL 是消息丢失时的兜底
+# 每次读取返回一份拷贝（只复制 dict/list，比重新解码便宜），调用方修改返回值不会影响其他调用方
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "1") == "1"
+CACHE_L1_PREFIXES = tuple(p for p in os.getenv("CACHE_L1_PREFIXES", "discovery:,ai:picks:,persona:").split(",") if p)
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", 256))
+CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", 300))
+INVALIDATION_CHANNEL = "cache:invalidate"
+# get_or_compute：同一个 key 只有一个调用方在计算（进程内线程锁 + Redis 锁），其余调用方等待结果或拿上一次的值
+SINGLE_FLIGHT_LOCK_TTL = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", 180))
+SINGLE_FLIGHT_WAIT = float(os.getenv("SINGLE_FLIGHT_WAIT", 120))
+SINGLE_FLIGHT_POLL = 0.5
+# Deletes the lock only if we still own it (it may have expired and been taken by another worker)
+RELEASE_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+
+def _copy_value(value: Any) -> Any:
+    """
+    Copy of a decoded cache value for one caller, so editing it never touches the L1 entry.
+    Decoded values are only dicts, lists and immutable scalars, which makes this much cheaper than deepcopy.
+    """
+    if isinstance(value, dict):
+        return {k: _copy_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_value(v) for v in value]
+    return value
+
 class CacheService:
     def __init__(self):
         self.host = os.getenv("REDIS_HOST", "localhost")
         self.port = int(os.getenv("REDIS_PORT", 6379))
         self.db = int(os.getenv("REDIS_DB", 0))
         self.password = os.getenv("REDIS_PASSWORD", None)
-        
-        self.client = None
-        self._local_cache = {} # Fallback memory cache
-        
+
+        self._redis_kwargs = dict(
+            host=self.host,
+            port=self.port,
+            db=self.db,
+            password=self.password,
+            socket_connect_timeout=2,
+            health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        self._pool = redis.ConnectionPool(
+            **self._redis_kwargs,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+        )
+        self._client = None
+        self._connected = False
+        self._connect_lock = threading.Lock()
+        self._local_cache = LocalCache() # Fallback memory cache (bounded LRU with TTL)
+        self._l1 = None
+        self._l1_epoch = 0 # Bumped by every write and remote invalidation, guards L1 fills against races
+        self._l1_guard = threading.Lock()
+        self._instance_id = uuid.uuid4().hex
+        self._add_lock = threading.Lock()
+        self._flights: Dict[str, list] = {} # key -> [threading.Lock, users], for get_or_compute
+        self._flights_guard = threading.Lock()
+
+    @property
+    def client(self) -> Optional[redis.Redis]:
+        """Pooled Redis client, connected on first use; None when Redis is unreachable."""
+        if not self._connected:
+            with self._connect_lock:
+                if not self._connected:
+                    self._connect()
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+        self._connected = True
+
+    def _connect(self):
+        client = redis.Redis(connection_pool=self._pool) # Values are codec bytes (see cache_codec)
         try:
-            self.client = redis.Redis(
-                host=self.host, 
-                port=self.port, 
-                db=self.db, 
-                password=self.password,
-                decode_responses=True,
-                socket_connect_timeout=2
-            )
             # Test connection
-            self.client.ping()
-            logger.info(f"Redis connected at {self.host}:{self.port}")
+            client.ping()
+            logger.info(f"Redis connected at {self.host}:{self.port} (pool of {REDIS_MAX_CONNECTIONS})")
         except Exception as e:
             logger.warning(f"Redis connection failed: {e}. Falling back to in-memory cache.")
-            self.client = None
+            client = None
+        self._client = client
+
+        if not client and CACHE_DISK_PATH:
+            # Redis-less setup: keep the fallback across restarts (uvicorn reload, deploys)
+            try:
+                self._local_cache = PersistentLocalCache(DiskCache(CACHE_DISK_PATH))
+                logger.info(f"Fallback cache persisted to {CACHE_DISK_PATH}")
+            except Exception as e:
+                logger.warning(f"Disk cache unavailable ({e}), fallback cache is memory-only")
+
+        # Without Redis the fallback is already in-process, so L1 only makes sense in front of Redis
+        if client and CACHE_L1_ENABLED:
+            self._l1 = LocalCache(max_entries=CACHE_L1_MAX_ENTRIES)
+        self._connected = True
+        if self._l1 is not None:
+            threading.Thread(target=self._listen_invalidations, daemon=True, name="cache-invalidation").start()
+
+    def _use_l1(self, key: str) -> bool:
+        return self._l1 is not None and key.startswith(CACHE_L1_PREFIXES)
+
+    def _listen_invalidations(self):
+        # Own connection without the pool's socket timeout: listen() blocks until a message arrives
+        subscriber = redis.Redis(**self._redis_kwargs)
+        while True:
+            try:
+                pubsub = subscriber.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    self._on_invalidation(json.loads(message["data"]))
+            except Exception as e:
+                logger.warning(f"Cache invalidation listener error: {e}")
+            # Messages may have been missed while disconnected
+            self._l1_invalidate(None)
+            time.sleep(5)
+
+    def _on_invalidation(self, payload: Dict):
+        """payload e.g. {"origin": "<instance id>", "key": "discovery:persona:1"}"""
+        if payload.get("origin") == self._instance_id:
+            return
+        self._l1_invalidate([payload["key"]])
+
+    def _l1_invalidate(self, keys: Optional[List[str]]) -> int:
+        """
+        Drops keys (all of L1 for None) before they are written here or after they were written elsewhere,
+        and voids every read still in flight: a read that started earlier may carry the old value, so
+        its L1 fill is skipped. Returns the new epoch for the writer's own fill.
+        """
+        with self._l1_guard:
+            self._l1_epoch += 1
+            if keys is None:
+                self._l1.clear()
+            for key in keys or []:
+                self._l1.delete(key)
+            return self._l1_epoch
+
+    def _l1_get(self, key: str) -> Optional[Any]:
+        """A private copy of the L1 entry: callers may mutate what they get."""
+        value = self._l1.get(key)
+        return _copy_value(value) if value is not None else None
+
+    def _l1_store(self, key: str, value: Any, size: int, epoch: int, expire: int = CACHE_L1_TTL):
+        """
+        Caches value in L1 unless a write or invalidation happened since `epoch` was taken.
+        L1 keeps the object itself: never hand it out afterwards, give the caller a _copy_value.
+        """
+        with self._l1_guard:
+            if epoch == self._l1_epoch:
+                self._l1.set(key, value, min(expire, CACHE_L1_TTL) if expire else CACHE_L1_TTL, size=size)
+
+    def _invalidation_message(self, key: str) -> str:
+        return json.dumps({"origin": self._instance_id, "key": key})
+
+    def _publish_invalidation(self, key: str):
+        try:
+            self.client.publish(INVALIDATION_CHANNEL, self._invalidation_message(key))
+        except Exception as e:
+            logger.error(f"Redis publish failed: {e}")
+
+    def _l1_fill(self, key: str, serialized: bytes, expire: int, epoch: int):
+        """After a write reached Redis: cache a private decoded copy, the caller may keep mutating its own object."""
+        self._l1_store(key, codec.decode(serialized), len(serialized), epoch, expire)
 
     def set(self, key: str, value: Any, expire: int = 43200):
         """Default expire 12 hours (43200 seconds)"""
-        serialized = json.dumps(value, ensure_ascii=False)
+        start = time.perf_counter()
+        serialized = codec.encode(value)
         if self.client:
             try:
+                epoch = self._l1_invalidate([key]) if self._use_l1(key) else None
                 self.client.set(key, serialized, ex=expire)
+                if epoch is not None:
+                    self._l1_fill(key, serialized, expire, epoch)
+                    self._publish_invalidation(key)
+                cache_metrics.record("set", key, "redis", time.perf_counter() - start)
                 return
             except Exception as e:
                 logger.error(f"Redis set failed: {e}")
-        
+                cache_metrics.error("set", key)
+
         # Fallback
-        self._local_cache[key] = {
-            "data": value,
-            "expire_at": 0 # Simplistic fallback
-        }
+        self._local_cache.set(key, serialized, expire)
+        cache_metrics.record("set", key, "local", time.perf_counter() - start)
+
+    def add(self, key: str, value: Any, expire: int) -> bool:
+        """Set-if-absent, e.g. a short-lived lock. Returns False when the key already exists."""
+        serialized = codec.encode(value)
+        if self.client:
+            try:
+                return bool(self.client.set(key, serialized, ex=expire, nx=True))
+            except Exception as e:
+                logger.error(f"Redis add failed: {e}")
+
+        # Fallback
+        with self._add_lock:
+            if self._local_cache.get(key) is not None:
+                return False
+            self._local_cache.set(key, serialized, expire)
+            return True
+
+    def incr(self, key: str) -> int:
+        """
+        Atomic counter without expiry, e.g. a persona cache version. Other workers drop it from L1;
+        in the fallback cache it is pinned, LRU eviction would reset it to 0.
+        """
+        if self.client:
+            try:
+                epoch = self._l1_invalidate([key]) if self._use_l1(key) else None
+                value = int(self.client.incr(key))
+                if epoch is not None:
+                    self._l1_store(key, value, len(str(value)), epoch)
+                    self._publish_invalidation(key)
+                return value
+            except Exception as e:
+                logger.error(f"Redis incr failed: {e}")
+
+        # Fallback
+        with self._add_lock:
+            data = self._local_cache.get(key)
+            value = (self._decode(key, data) or 0) + 1 if data else 1
+            self._local_cache.set(key, codec.encode(value), 0, pinned=True)
+            return value
 
     def get(self, key: str) -> Optional[Any]:
+        """Every call returns its own object, L1 hits included."""
+        start = time.perf_counter()
+        value, tier = self._get(key)
+        cache_metrics.record("get", key, tier if value is not None else "miss", time.perf_counter() - start)
+        return value
+
+    def _get(self, key: str):
+        """Returns (value, tier it came from)."""
         if self.client:
+            use_l1 = self._use_l1(key)
+            if use_l1:
+                value = self._l1_get(key)
+                if value is not None:
+                    return value, "l1"
+                epoch = self._l1_epoch
             try:
                 data = self.client.get(key)
                 if data:
-                    return json.loads(data)
-                return None
+                    value = self._decode(key, data)
+                    # Skipped if a write or invalidation happened while we were reading
+                    if value is not None and use_l1:
+                        self._l1_store(key, value, len(data), epoch)
+                        value = _copy_value(value)
+                    return value, "redis"
+                return None, "redis"
             except Exception as e:
                 logger.error(f"Redis get failed: {e}")
+                cache_metrics.error("get", key)
 
         # Fallback
-        entry = self._local_cache.get(key)
-        if entry:
-            return entry["data"]
-        return None
+        data = self._local_cache.get(key)
+        if data:
+            return self._decode(key, data), "local"
+        return None, "local"
+
+    def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Values of keys in order (None for misses); keys not in L1 are read in one Redis round trip."""
+        start = time.perf_counter()
+        values: List[Optional[Any]] = [None] * len(keys)
+        tiers = ["local"] * len(keys)
+        pending = list(range(len(keys)))
+        if self.client and keys:
+            if self._l1 is not None:
+                for i, key in enumerate(keys):
+                    if self._use_l1(key):
+                        values[i] = self._l1_get(key)
+                        if values[i] is not None:
+                            tiers[i] = "l1"
+                pending = [i for i in pending if tiers[i] != "l1"]
+            epoch = self._l1_epoch
+            try:
+                datas = self.client.mget([keys[i] for i in pending]) if pending else []
+                for i, data in zip(pending, datas):
+                    tiers[i] = "redis"
+                    if data:
+                        values[i] = self._decode(keys[i], data)
+                        if values[i] is not None and self._use_l1(keys[i]):
+                            self._l1_store(keys[i], values[i], len(data), epoch)
+                            values[i] = _copy_value(values[i])
+                pending = []
+            except Exception as e:
+                logger.error(f"Redis mget failed: {e}")
+                for i in pending:
+                    cache_metrics.error("get", keys[i])
+
+        # Fallback
+        for i in pending:
+            data = self._local_cache.get(keys[i])
+            if data:
+                values[i] = self._decode(keys[i], data)
+        elapsed = time.perf_counter() - start
+        for key, value, tier in zip(keys, values, tiers):
+            cache_metrics.record("get", key, tier if value is not None else "miss", elapsed)
+        return values
+
+    def mset(self, mapping: Dict[str, Any], expire: int = 43200):
+        """Sets every key with the same expiry in one Redis round trip."""
+        with self.pipeline() as pipe:
+            for key, value in mapping.items():
+                pipe.set(key, value, expire=expire)
+
+    def pipeline(self) -> "CachePipeline":
+        """
+        Batched writes, e.g.
+            with cache_service.pipeline() as pipe:
+                pipe.set("discovery:persona:1:v0", feed, expire=3600)
+        """
+        return CachePipeline(self)
+
+    @staticmethod
+    def _decode(key: str, data: bytes) -> Optional[Any]:
+        """An undecodable entry (e.g. written with a codec missing here) is treated as a miss."""
+        try:
+            return codec.decode(data)
+        except Exception as e:
+            logger.error(f"Cache decode failed for {key}: {e}")
+            return None
 
     def delete(self, key: str):
+        start = time.perf_counter()
         if self.client:
             try:
+                use_l1 = self._use_l1(key)
+                if use_l1:
+                    self._l1_invalidate([key])
                 self.client.delete(key)
-            except: pass
-        
-        if key in self._local_cache:
-            del self._local_cache[key]
+                if use_l1:
+                    self._publish_invalidation(key)
+            except:
+                cache_metrics.error("delete", key)
+
+        self._local_cache.delete(key)
+        cache_metrics.record("delete", key, "redis" if self.client else "local", time.perf_counter() - start)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], expire: int = 43200,
+                       stale_key: Optional[str] = None, stale_expire: Optional[int] = None,
+                       wait: float = SINGLE_FLIGHT_WAIT) -> Optional[Any]:
+        """
+        Single-flight read-through cache. On a miss only one caller (per process and across workers)
+        runs compute(); the others get the previous value from stale_key right away when there is one,
+        otherwise they wait up to `wait` seconds for the result (None if it never arrives).
+        compute() returning None is not cached. If it raises, the stale value is returned when
+        available, otherwise the exception propagates.
+        e.g. get_or_compute("ai:picks:persona:1:hash:ab12", call_llm, stale_key="ai:picks:persona:1:last")
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        flight = self._join_flight(key)
+        try:
+            if not flight[0].acquire(blocking=False):
+                # Another thread of this process is computing it
+                stale = self.get(stale_key) if stale_key else None
+                if stale is not None or not flight[0].acquire(timeout=wait):
+                    return stale
+                flight[0].release()
+                return self.get(key)
+            try:
+                value = self.get(key)
+                if value is not None:
+                    return value
+                token = uuid.uuid4().hex
+                if not self.add(f"lock:{key}", token, expire=SINGLE_FLIGHT_LOCK_TTL):
+                    return self._wait_for(key, stale_key, wait)
+                try:
+                    try:
+                        value = compute()
+                    except Exception:
+                        stale = self.get(stale_key) if stale_key else None
+                        if stale is None:
+                            raise
+                        logger.exception(f"Compute failed for {key}, serving previous value")
+                        return stale
+                    # Write the result before releasing the lock: a waiter that sees the lock gone
+                    # must find the value
+                    if value is not None:
+                        self.set(key, value, expire=expire)
+                        if stale_key:
+                            self.set(stale_key, value, expire=stale_expire or expire * 2)
+                    return value
+                finally:
+                    self._release_lock(f"lock:{key}", token)
+            finally:
+                flight[0].release()
+        finally:
+            self._leave_flight(key)
+
+    def _join_flight(self, key: str) -> list:
+        with self._flights_guard:
+            flight = self._flights.setdefault(key, [threading.Lock(), 0])
+            flight[1] += 1
+            return flight
+
+    def _leave_flight(self, key: str):
+        with self._flights_guard:
+            flight = self._flights[key]
+            flight[1] -= 1
+            if not flight[1]:
+                del self._flights[key]
+
+    def _wait_for(self, key: str, stale_key: Optional[str], wait: float) -> Optional[Any]:
+        """Another worker holds the compute lock: previous value now, or poll for its result."""
+        stale = self.get(stale_key) if stale_key else None
+        if stale is not None:
+            return stale
+        deadline = time.time() + wait
+        while time.time() < deadline:
+            time.sleep(SINGLE_FLIGHT_POLL)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if not self.exists(f"lock:{key}"):
+                # Released between our two reads, or the computing worker gave up without a result
+                return self.get(key)
+        return None
+
+    def _release_lock(self, lock_key: str, token: str):
+        if self.client:
+            try:
+                self.client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, codec.encode(token))
+                return
+            except Exception as e:
+                logger.error(f"Redis lock release failed: {e}")
+        with self._add_lock:
+            data = self._local_cache.get(lock_key)
+            if data and self._decode(lock_key, data) == token:
+                self._local_cache.delete(lock_key)
+
+    def exists(self, key: str) -> bool:
+        if self.client:
+            try:
+                return bool(self.client.exists(key))
+            except Exception as e:
+                logger.error(f"Redis exists failed: {e}")
+        return self._local_cache.get(key) is not None
+
+    def inspect(self, key: str) -> Dict:
+        """Size and TTL of one key for the admin endpoint, e.g. {"key": ..., "bytes": 61234, "ttl": 40210}."""
+        if self.client:
+            try:
+                pipe = self.client.pipeline()
+                pipe.memory_usage(key)
+                pipe.ttl(key)
+                size, ttl = pipe.execute()
+                return {"key": key, "exists": size is not None, "bytes": size, "ttl": ttl if size is not None else None}
+            except Exception as e:
+                logger.error(f"Redis inspect failed: {e}")
+        info = self._local_cache.inspect(key)
+        return {"key": key, "exists": info is not None, **(info or {"bytes": None, "ttl": None})}
+
+    def scan(self, prefix: str, limit: int = 50) -> List[str]:
+        """Keys starting with prefix (at most limit). Admin/debug use only, never on a hot path."""
+        keys = []
+        if self.client:
+            try:
+                for key in self.client.scan_iter(match=f"{prefix}*", count=200):
+                    keys.append(key.decode() if isinstance(key, bytes) else key)
+                    if len(keys) >= limit:
+                        break
+                return keys
+            except Exception as e:
+                logger.error(f"Redis scan failed: {e}")
+        return self._local_cache.keys(prefix)[:limit]
+
+    @property
+    def backend(self) -> str:
+        """"redis", "disk" (fallback persisted to CACHE_DISK_PATH, shared by processes using the same file) or "memory"."""
+        return "redis" if self.client else ("disk" if isinstance(self._local_cache, PersistentLocalCache) else "memory")
+
+    def stats(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "codec": {"serializer": codec.codec, "compression": codec.compression},
+            "local": self._local_cache.stats(),
+            "l1": self._l1.stats() if self._l1 else None,
+        }
+
+
+class CachePipeline:
+    """
+    Writes queued on one non-transactional Redis pipeline and sent in a single round trip by
+    execute() (called when the with block exits cleanly). `redis` is the raw pipeline for other
+    commands (e.g. the feed index), None without Redis. If Redis is down or the round trip fails,
+    the queued sets/deletes are applied to the fallback cache instead.
+    """
+
+    def __init__(self, service: CacheService):
+        self.service = service
+        self.redis = service.client.pipeline(transaction=False) if service.client else None
+        self._writes: List[Tuple[str, Optional[bytes], int]] = [] # (key, serialized or None for a delete, expire)
+
+    def set(self, key: str, value: Any, expire: int = 43200):
+        serialized = codec.encode(value)
+        self._writes.append((key, serialized, expire))
+        if self.redis is not None:
+            self.redis.set(key, serialized, ex=expire)
+            if self.service._use_l1(key):
+                self.redis.publish(INVALIDATION_CHANNEL, self.service._invalidation_message(key))
+
+    def delete(self, key: str):
+        self._writes.append((key, None, 0))
+        if self.redis is not None:
+            self.redis.delete(key)
+            if self.service._use_l1(key):
+                self.redis.publish(INVALIDATION_CHANNEL, self.service._invalidation_message(key))
+
+    def execute(self):
+        start = time.perf_counter()
+        writes, self._writes = self._writes, []
+        if self.redis is not None:
+            try:
+                l1_keys = [key for key, _, _ in writes if self.service._use_l1(key)]
+                epoch = self.service._l1_invalidate(l1_keys) if l1_keys else None
+                self.redis.execute()
+                elapsed = time.perf_counter() - start
+                for key, serialized, expire in writes:
+                    if serialized is not None and self.service._use_l1(key):
+                        self.service._l1_fill(key, serialized, expire, epoch)
+                    cache_metrics.record("set" if serialized is not None else "delete", key, "redis", elapsed)
+                return
+            except Exception as e:
+                logger.error(f"Redis pipeline failed: {e}")
+                for key, serialized, _ in writes:
+                    cache_metrics.error("set" if serialized is not None else "delete", key)
+
+        # Fallback
+        for key, serialized, expire in writes:
+            if serialized is None:
+                self.service._local_cache.delete(key)
+            else:
+                self.service._local_cache.set(key, serialized, expire)
+        elapsed = time.perf_counter() - start
+        for key, serialized, _ in writes:
+            cache_metrics.record("set" if serialized is not None else "delete", key, "local", elapsed)
+
+    def __enter__(self) -> "CachePipeline":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+
+class AsyncCacheService:
+    """
+    asyncio counterpart of CacheService for coroutines (the sync engine, async routes): Redis calls
+    are awaited instead of blocking the event loop. Codec, L1, fallback cache and metrics are shared
+    with the sync service. Connections belong to an event loop, so each loop gets its own pooled
+    client; short-lived loops go through run() (or await aclose() before the loop ends) so their
+    connections are closed instead of piling up.
+    """
+
+    def __init__(self, service: CacheService):
+        self.service = service
+        self._clients = weakref.WeakKeyDictionary() # event loop -> aioredis.Redis
+
+    async def _client(self) -> Optional[aioredis.Redis]:
+        if not self.service._connected:
+            # The process's first Redis use connects and pings with the sync client: in a thread, off the loop
+            await asyncio.to_thread(lambda: self.service.client)
+        if not self.service.client:
+            return None
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            pool = aioredis.ConnectionPool(**self.service._redis_kwargs, max_connections=REDIS_MAX_CONNECTIONS,
+                                           socket_timeout=REDIS_SOCKET_TIMEOUT)
+            client = self._clients[loop] = aioredis.Redis(connection_pool=pool)
+        return client
+
+    def run(self, coro):
+        """asyncio.run(coro), closing the run's Redis client afterwards, e.g. async_cache_service.run(fetch())."""
+        async def main():
+            try:
+                return await coro
+            finally:
+                await self.aclose()
+        return asyncio.run(main())
+
+    async def aclose(self):
+        """Closes the running loop's client and its connection pool."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            try:
+                await client.aclose(close_connection_pool=True)
+            except Exception as e:
+                logger.warning(f"Closing async Redis client failed: {e}")
+
+    async def get(self, key: str) -> Optional[Any]:
+        return (await self.mget([key]))[0]
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        client = await self._client()
+        if not client or not keys:
+            return self.service.mget(keys)
+        service = self.service
+        start = time.perf_counter()
+        values: List[Optional[Any]] = [None] * len(keys)
+        tiers = ["redis"] * len(keys)
+        for i, key in enumerate(keys):
+            if service._use_l1(key):
+                values[i] = service._l1_get(key)
+                if values[i] is not None:
+                    tiers[i] = "l1"
+        pending = [i for i in range(len(keys)) if tiers[i] != "l1"]
+        epoch = service._l1_epoch
+        try:
+            datas = await client.mget([keys[i] for i in pending]) if pending else []
+        except Exception as e:
+            logger.error(f"Redis mget failed: {e}")
+            # Fallback cache only: service.mget would retry Redis, blocking the loop
+            for i in pending:
+                cache_metrics.error("get", keys[i])
+                data = service._local_cache.get(keys[i])
+                values[i] = service._decode(keys[i], data) if data else None
+            return values
+        for i, data in zip(pending, datas):
+            if data:
+                values[i] = service._decode(keys[i], data)
+                if values[i] is not None and service._use_l1(keys[i]):
+                    service._l1_store(keys[i], values[i], len(data), epoch)
+                    values[i] = _copy_value(values[i])
+        elapsed = time.perf_counter() - start
+        for key, value, tier in zip(keys, values, tiers):
+            cache_metrics.record("get", key, tier if value is not None else "miss", elapsed)
+        return values
+
+    async def set(self, key: str, value: Any, expire: int = 43200):
+        await self.mset({key: value}, expire=expire)
+
+    async def mset(self, mapping: Dict[str, Any], expire: int = 43200):
+        """One Redis round trip for every key."""
+        client = await self._client()
+        if not client:
+            self.service.mset(mapping, expire=expire)
+            return
+        service = self.service
+        start = time.perf_counter()
+        encoded = {key: codec.encode(value) for key, value in mapping.items()}
+        l1_keys = [key for key in encoded if service._use_l1(key)]
+        epoch = service._l1_invalidate(l1_keys) if l1_keys else None
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, serialized in encoded.items():
+                pipe.set(key, serialized, ex=expire)
+                if service._use_l1(key):
+                    pipe.publish(INVALIDATION_CHANNEL, service._invalidation_message(key))
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis pipeline failed: {e}")
+            for key, serialized in encoded.items():
+                cache_metrics.error("set", key)
+                service._local_cache.set(key, serialized, expire)
+            return
+        elapsed = time.perf_counter() - start
+        for key, serialized in encoded.items():
+            if service._use_l1(key):
+                service._l1_fill(key, serialized, expire, epoch)
+            cache_metrics.record("set", key, "redis", elapsed)
+
+    async def delete(self, key: str):
+        client = await self._client()
+        if not client:
+            self.service.delete(key)
+            return
+        try:
+            use_l1 = self.service._use_l1(key)
+            if use_l1:
+                self.service._l1_invalidate([key])
+            await client.delete(key)
+            if use_l1:
+                await client.publish(INVALIDATION_CHANNEL, self.service._invalidation_message(key))
+        except Exception:
+            cache_metrics.error("delete", key)
+        self.service._local_cache.delete(key)
+
 
 cache_service = CacheService()
+async_cache_service = AsyncCacheService(cache_service)
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+
+# 连续失败 N 次后熔断，冷却期内直接跳过；冷却结束放行一次试探请求（half_open），成功即恢复
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 3))
+BREAKER_COOLDOWN = int(os.getenv("BREAKER_COOLDOWN", 1800))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker per key, e.g. source "bili:2267573" or host "rsshub.app".
+    States: closed -> open (after threshold failures) -> half_open (cooldown passed, one trial).
+    """
+
+    def __init__(self, name: str, threshold: int = BREAKER_FAILURE_THRESHOLD, cooldown: int = BREAKER_COOLDOWN):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, key: str) -> Dict:
+        return self._entries.setdefault(key, {
+            "state": "closed", "failures": 0, "opened_at": None, "skips": 0, "last_error": None,
+        })
+
+    def allow(self, key: str) -> bool:
+        with self._lock:
+            entry = self._entry(key)
+            if entry["state"] == "closed":
+                return True
+            if entry["state"] == "open" and time.time() - entry["opened_at"] >= self.cooldown:
+                entry["state"] = "half_open"
+                return True
+            # open within cooldown, or a half_open trial is already in flight
+            entry["skips"] += 1
+            return False
+
+    def record_success(self, key: str):
+        with self._lock:
+            entry = self._entry(key)
+            entry.update(state="closed", failures=0, opened_at=None)
+
+    def record_failure(self, key: str, error: Exception):
+        with self._lock:
+            entry = self._entry(key)
+            entry["failures"] += 1
+            entry["last_error"] = f"{type(error).__name__}: {error}"[:200]
+            if entry["state"] == "half_open" or entry["failures"] >= self.threshold:
+                entry["state"] = "open"
+                entry["opened_at"] = time.time()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Non-closed keys plus anything that was ever skipped, for the sync status endpoint."""
+        with self._lock:
+            result = {}
+            for key, entry in self._entries.items():
+                if entry["state"] == "closed" and not entry["skips"] and not entry["failures"]:
+                    continue
+                result[key] = {
+                    **entry,
+                    "opened_at": datetime.utcfromtimestamp(entry["opened_at"]).isoformat() if entry["opened_at"] else None,
+                }
+            return result
+
+
+source_breakers = CircuitBreaker("source")
+host_breakers = CircuitBreaker("host")
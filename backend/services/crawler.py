@@ -2,11 +2,37 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from sqlmodel import Session, select
 from ..models import Topic, TopicTag, SourceConfig
-from .rss_service import rss_service
-from .bilibili_service import bilibili_service
+from .source_fetcher import source_fetcher, get_source_key
+from . import job_queue
+from .cache_keys import persona_version, feed_key
+from .cache_service import async_cache_service
 
+import asyncio
+import copy
+import os
 import random
 
+# 并发上限：全局 + 按平台（config.type），例如 SYNC_CONCURRENCY=8, SYNC_CONCURRENCY_BILIBILI=3
+SYNC_CONCURRENCY = int(os.getenv("SYNC_CONCURRENCY", 8))
+PLATFORM_CONCURRENCY = {
+    "bilibili_user": int(os.getenv("SYNC_CONCURRENCY_BILIBILI", 3)),
+    "rss_feed": int(os.getenv("SYNC_CONCURRENCY_RSS", 6)),
+}
+
+def config_to_dict(config) -> Dict:
+    """Plain-JSON form of a SourceConfig for queue jobs; SourceConfig(**data) restores it."""
+    return {
+        "id": config.id, "persona_id": config.persona_id, "type": config.type, "name": config.name,
+        "config_data": config.config_data or {}, "enabled": config.enabled, "views_threshold": config.views_threshold,
+    }
+
+def group_by_source(configs: List) -> Dict[str, List]:
+    """Groups configs that point at the same upstream source, so each one is fetched once."""
+    groups: Dict[str, List] = {}
+    for config in configs:
+        groups.setdefault(get_source_key(config), []).append(config)
+    return groups
+
 class CrawlerService:
     """
     Service to fetch data from external platforms.
@@ -16,139 +42,265 @@ class CrawlerService:
         self.total_count = 0
         self.current_count = 0
         self.last_message = ""
-    
+
     def sync_all_sources(self, session: Session):
         """
         Background task: Fetch all enabled sources and save to Redis cache (TopHub style).
+        Blocking entry point for the scheduler / BackgroundTasks; runs the asyncio engine.
+        """
+        async_cache_service.run(self.sync_all_sources_async(session))
+
+    async def sync_all_sources_async(self, session: Session):
+        """
+        Fetches every enabled source concurrently, so a sync takes about as long as the slowest source.
         """
-        from .cache_service import cache_service
         from ..models import Persona
-        
+
         # 1. Get all personas to group configs
         personas = session.exec(select(Persona)).all()
-        
+
+        # 2. Group configs across personas by source identity
+        persona_configs = {p.id: [c for c in p.source_configs if c.enabled] for p in personas}
+        persona_names = {p.id: p.name for p in personas}
+        # Captured with the configs: feeds built from them are written under this cache version
+        persona_versions = {p.id: persona_version(p.id) for p in personas}
+        groups = group_by_source([c for configs in persona_configs.values() for c in configs])
+
+        if job_queue.SYNC_MODE == "queue":
+            self._enqueue_sync(persona_configs, persona_names, groups, persona_versions)
+            return
+
         # Reset progress
         self.is_syncing = True
-        self.total_count = sum(len([c for c in p.source_configs if c.enabled]) for p in personas)
+        self.total_count = len(groups)
         self.current_count = 0
         self.last_message = "开始同步..."
 
-        for persona in personas:
-            print(f"Syncing all sources for persona: {persona.name}...")
-            
-            # 2. Aggregated feed for this persona
-            persona_items = []
-            
-            configs = [c for c in persona.source_configs if c.enabled]
+        def progress(config):
+            self.current_count += 1
+            self.last_message = f"已同步 {config.name}"
+
+        try:
+            # 3. One task per unique source, all running under the concurrency limits
+            source_items = await self._fetch_groups(session, groups, progress)
+
+            # 4. Fan out to persona feeds
+            self.publish_feeds(persona_configs, persona_names, source_items, persona_versions)
+        finally:
+            self.is_syncing = False
+
+        self.last_message = "同步完成"
+        self.current_count = self.total_count
+
+    async def _fetch_groups(self, session: Session, groups: Dict[str, List], on_fetched=None,
+                            reuse_stored: bool = False) -> Dict[str, List[Dict]]:
+        """
+        Fetches each unique source once with its watermark state, then records the new watermarks.
+        reuse_stored: sources that already have stored items (last_items) are not fetched again.
+        """
+        limits = self._make_limits()
+        watermarks = source_fetcher.load_watermarks(session, list(groups))
+        states = {key: source_fetcher.watermark_state(watermarks.get(key)) for key in groups}
+        stored = {}
+        if reuse_stored:
+            stored = {key: copy.deepcopy(states[key]["last_items"]) for key in groups if states[key].get("last_items")}
+            groups = {key: configs for key, configs in groups.items() if key not in stored}
+
+        async def sync_source(configs):
+            config = configs[0]
+            print(f"  Fetching: {config.name} ({config.type}) for {len(configs)} config(s)...")
+            items = await self._fetch_limited(config, limits, states[get_source_key(config)])
+            if on_fetched:
+                on_fetched(config)
+            return items
+
+        keys = list(groups)
+        results = await asyncio.gather(*[sync_source(groups[k]) for k in keys])
+        source_items = dict(zip(keys, results))
+        source_fetcher.save_watermarks(session, watermarks, states, source_items)
+        return {**stored, **source_items}
+
+    def refresh_persona(self, persona_id: int, persona_name: str, configs: List[Dict], version: int,
+                        refetch: bool = True):
+        """
+        Rebuilds a single persona feed under cache `version`, as a background task:
+        - stale-while-revalidate (refetch=True): every source of the persona is fetched again;
+        - after a persona/source edit (refetch=False): only sources without stored items are fetched,
+          the others reuse their watermark items.
+        configs are config_to_dict() copies taken during the request; watermarks are read and
+        written through a session of its own.
+        """
+        from ..database import SessionLocal
+
+        configs = [SourceConfig(**c) for c in configs]
+        print(f"Rebuilding feed for {persona_name} ({len(configs)} source(s), refetch={refetch})...")
+        try:
+            with SessionLocal() as session:
+                source_items = async_cache_service.run(self._fetch_groups(session, group_by_source(configs), reuse_stored=not refetch))
+            self.publish_feeds({persona_id: configs}, {persona_id: persona_name}, source_items, {persona_id: version})
+        except Exception as e:
+            print(f"Error refreshing feed for {persona_name}: {e}")
+
+    def publish_feeds(self, persona_configs: Dict[int, List], persona_names: Dict[int, str],
+                      source_items: Dict[str, List[Dict]], persona_versions: Optional[Dict[int, int]] = None):
+        """
+        Builds every persona feed from the shared per-source results and saves it to the cache.
+        Per-config settings are applied on each persona's own copy.
+        persona_versions: cache version each persona's configs were read at. A persona edited since
+        then has a newer version, so the feed built from its old configs lands under an unreachable key.
+        """
+        from .cache_service import cache_service
+        from .feed_store import feed_store, FEED_HARD_TTL
+
+        feeds = {}
+        for pid, configs in persona_configs.items():
             if not configs:
                 continue
-                
-            # 3. Fetch data for each config
+            persona_items = []
             for config in configs:
-                self.current_count += 1
-                self.last_message = f"正在同步 {persona.name} 的 {config.name}..."
-                print(f"  Fetching: {config.name} ({config.type})...")
-                items = self.fetch_feed([config])
-                
-                for item in items:
+                items = copy.deepcopy(source_items.get(get_source_key(config), []))
+                for item in self._apply_config(items, config):
                     # Enrich with source info for frontend
-                    source_str = "Unknown"
-                    if config.type == "bilibili_user": source_str = "Bilibili"
-                    elif config.type == "rss_feed": source_str = "RSS"
-                    elif config.type == "hot_list": source_str = "HotList"
-                    
-                    item["source"] = source_str
+                    item["source"] = self._source_label(config)
                     persona_items.append(item)
-            
-            # 4. Save to Redis (Key: discovery:persona:{id}, TTL: 12 Hours)
+
+            # Save to Redis (Key: discovery:persona:{id}:v{version}); soft expiry in the meta key, see feed_store
             # Sort by date before saving
             persona_items.sort(key=lambda x: x.get("published_at") or "", reverse=True)
-            cache_key = f"discovery:persona:{persona.id}"
-            cache_service.set(cache_key, persona_items, expire=43200)
-            
-            print(f"  ✓ Saved {len(persona_items)} items to Redis cache for {persona.name}")
+            version = persona_versions[pid] if persona_versions and pid in persona_versions else persona_version(pid)
+            feeds[feed_key(pid, version)] = persona_items
+            print(f"  ✓ Built {len(persona_items)} items for {persona_names.get(pid, pid)}")
 
-        self.is_syncing = False
-        self.last_message = "同步完成"
-        self.current_count = self.total_count
+        # Every persona in one Redis pipeline: whole-feed blobs, freshness meta and the indexed copies
+        # for paginated / filtered reads
+        with cache_service.pipeline() as pipe:
+            for cache_key, persona_items in feeds.items():
+                pipe.set(cache_key, persona_items, expire=FEED_HARD_TTL)
+                feed_store.mark_published(cache_key, pipe=pipe)
+            feed_store.replace_many(feeds, expire=FEED_HARD_TTL, pipe=pipe)
+        if feeds:
+            print(f"  ✓ Saved {len(feeds)} persona feed(s) to Redis cache")
+
+    def _enqueue_sync(self, persona_configs: Dict[int, List], persona_names: Dict[int, str], groups: Dict[str, List],
+                      persona_versions: Dict[int, int]):
+        """
+        Queue mode: one job per unique source; workers fetch them and the worker that completes
+        the last job assembles the persona feeds (see backend/worker.py).
+        """
+        if not groups:
+            self.last_message = "没有可同步的数据源"
+            return
+        sync_id = job_queue.new_sync_id()
+        plan = {
+            "personas": {str(pid): [config_to_dict(c) for c in configs] for pid, configs in persona_configs.items()},
+            "names": {str(pid): name for pid, name in persona_names.items()},
+            "versions": {str(pid): version for pid, version in persona_versions.items()},
+        }
+        jobs = [{"key": key, "config": config_to_dict(configs[0])} for key, configs in groups.items()]
+        job_queue.get_job_queue().create_sync(sync_id, plan, jobs)
+        self.last_message = f"已入队 {len(jobs)} 个同步任务 ({sync_id})"
+        print(f"  Enqueued sync {sync_id}: {len(jobs)} source job(s)")
+
+    def sync_source(self, session: Session, config) -> List[Dict]:
+        """
+        Queue worker entry: fetches one source with its watermark and records the new watermark.
+        """
+        key = get_source_key(config)
+        watermarks = source_fetcher.load_watermarks(session, [key])
+        states = {key: source_fetcher.watermark_state(watermarks.get(key))}
+        items = async_cache_service.run(source_fetcher.fetch(config, states[key]))
+        source_fetcher.save_watermarks(session, watermarks, states, {key: items})
+        return items
+
+    def status(self) -> Dict:
+        """Sync progress for the status endpoint; in queue mode it reflects the latest queued run."""
+        if job_queue.SYNC_MODE == "queue":
+            run = job_queue.get_job_queue().status()
+            if run:
+                return {
+                    "is_syncing": not run["finished"],
+                    "current_count": run["total"] - run["remaining"],
+                    "total_count": run["total"],
+                    "last_message": "同步完成" if run["finished"] else f"同步队列 {run['sync_id']} 进行中",
+                }
+        return {
+            "is_syncing": self.is_syncing,
+            "current_count": self.current_count,
+            "total_count": self.total_count,
+            "last_message": self.last_message,
+        }
 
     def fetch_feed(self, source_configs: List) -> List[Dict]:
         """
         Main entry point. Aggregates data from all enabled source configs.
         """
+        return async_cache_service.run(self.fetch_feed_async(source_configs))
+
+    async def fetch_feed_async(self, source_configs: List) -> List[Dict]:
+        groups = group_by_source([c for c in source_configs if c.enabled])
+        limits = self._make_limits()
+        keys = list(groups)
+        results = await asyncio.gather(*[self._fetch_limited(groups[k][0], limits) for k in keys])
+
         feed_items = []
-        
-        for config in source_configs:
-            if not config.enabled:
-                continue
-                
-            items = []
-            # NEW: Priority for Bilibili SDK
-            if config.type == "bilibili_user":
-                uid = config.config_data.get("uid")
-                if uid:
-                    try:
-                        # Convert to int if it's a string from JSON
-                        items = bilibili_service.fetch_user_videos(int(uid))
-                    except Exception as e:
-                        print(f"Error fetching real Bilibili data for {uid}: {e}")
-                        # Fallback to RSSHub if SDK fails
-                        url = f"https://rsshub.app/bilibili/user/video/{uid}"
-                        try:
-                            items = rss_service.fetch_and_parse(url)
-                        except: pass
-            
-            elif config.type == "rss_feed":
-                url = config.config_data.get("url")
-                if url:
-                    try:
-                        items = rss_service.fetch_and_parse(url)
-                    except Exception as e:
-                        print(f"Error fetching RSS {url}: {e}")
-            
-                # Tag items and polish
-            for item in items:
-                item["source_config_id"] = config.id
-                # Prioritize config.name (Remark) as author
-                if config.name:
-                    item["author"] = config.name
-                elif not item.get("author"):
-                    item["author"] = "采集UP主"
-                
-                # Enrich Bilibili data if it's a Bilibili item
-                if item.get("source") == "Bilibili" and item.get("original_id"):
-                    details = bilibili_service.get_video_details(item["original_id"])
-                    if details:
-                        # Update metrics
-                        if "metrics" in details:
-                            item["metrics"].update(details["metrics"])
-                        
-                        # Set tags (frontend uses 'labels' mapping)
-                        item["labels"] = details.get("tags", [])
-                        
-                        # Update title/summary if necessary (ensure high quality)
-                        if details.get("title"):
-                            item["title"] = details["title"]
-                        if details.get("summary"):
-                            item["summary"] = details["summary"]
-                
-                # Filter by views_threshold
-                views = item.get("metrics", {}).get("views", 0)
-                if views < config.views_threshold:
-                    print(f"Skipping video '{item['title']}' due to views threshold ({views} < {config.views_threshold})")
-                    continue
-                
-                item["analysis_result"] = self._random_analysis()
-                item["score"] = round(random.uniform(70, 99), 1)
-                item["status"] = "new"
-                
-                # Only add to results if it passed all processing (including filter)
-                feed_items.append(item)
-            
+        for key, items in zip(keys, results):
+            for config in groups[key]:
+                feed_items.extend(self._apply_config(copy.deepcopy(items), config))
+
         # Sort by freshness
         feed_items.sort(key=lambda x: x.get("published_at") or "", reverse=True)
         return feed_items
 
+    def _make_limits(self):
+        """Semaphores must be created inside the running loop, so build them per run."""
+        return (
+            asyncio.Semaphore(SYNC_CONCURRENCY),
+            {stype: asyncio.Semaphore(n) for stype, n in PLATFORM_CONCURRENCY.items()},
+        )
+
+    async def _fetch_limited(self, config, limits, state: Optional[Dict] = None) -> List[Dict]:
+        global_sem, platform_sems = limits
+        platform_sem = platform_sems.get(config.type)
+        async with global_sem:
+            if platform_sem is None:
+                return await source_fetcher.fetch(config, state)
+            async with platform_sem:
+                return await source_fetcher.fetch(config, state)
+
+    def _apply_config(self, items: List[Dict], config) -> List[Dict]:
+        """
+        Tags items with their source config and applies per-config filters (author, views_threshold).
+        """
+        results = []
+        for item in items:
+            item["source_config_id"] = config.id
+            # Prioritize config.name (Remark) as author
+            if config.name:
+                item["author"] = config.name
+            elif not item.get("author"):
+                item["author"] = "采集UP主"
+
+            # Filter by views_threshold
+            views = item.get("metrics", {}).get("views", 0) or 0
+            if views < config.views_threshold:
+                print(f"Skipping video '{item['title']}' due to views threshold ({views} < {config.views_threshold})")
+                continue
+
+            item["analysis_result"] = self._random_analysis()
+            item["score"] = round(random.uniform(70, 99), 1)
+            item["status"] = "new"
+
+            # Only add to results if it passed all processing (including filter)
+            results.append(item)
+        return results
+
+    @staticmethod
+    def _source_label(config) -> str:
+        if config.type == "bilibili_user": return "Bilibili"
+        if config.type == "rss_feed": return "RSS"
+        if config.type == "hot_list": return "HotList"
+        return "Unknown"
+
     def _random_time(self):
         """Returns ISO format time within last 24 hours"""
         dt = datetime.utcnow() - timedelta(hours=random.randint(0, 24), minutes=random.randint(0, 59))
@@ -0,0 +1,18 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def published_timestamp(value: Optional[str]) -> float:
+    """
+    Unix timestamp of an item's ISO published_at (naive values are UTC), 0.0 when missing or unparseable,
+    e.g. "2024-05-01T08:00:00Z" -> 1714550400.0
+    """
+    if not value:
+        return 0.0
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return 0.0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
@@ -0,0 +1,145 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .local_cache import LocalCache
+
+logger = logging.getLogger(__name__)
+
+# 没有 Redis 时的持久化兜底：内存 LRU 负责热数据，写入同步落盘到本地 SQLite，重启后按需读回
+# CACHE_DISK_PATH="" 关闭持久化（只用内存）
+CACHE_DISK_PATH = os.getenv("CACHE_DISK_PATH", "buddy_cache.db")
+# 同一个文件可被多个进程共享（队列 worker、多个 uvicorn worker）：内存里的副本最多保留 CACHE_DISK_MEMORY_TTL 秒，
+# 之后重新读盘，例如 worker 写入的新 feed 最迟 5 秒后在 API 进程可见
+CACHE_DISK_MEMORY_TTL = int(os.getenv("CACHE_DISK_MEMORY_TTL", 5))
+
+
+class DiskCache:
+    """
+    SQLite table of serialized values with an absolute expiry (0 = none). One connection shared
+    under a lock; WAL keeps reads cheap while the sync is writing.
+    """
+
+    def __init__(self, path: str = CACHE_DISK_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache_entry (key TEXT PRIMARY KEY, value BLOB, expire_at REAL)")
+
+    def get(self, key: str) -> Optional[tuple]:
+        """(value, expire_at) of a live entry, None when missing or expired."""
+        with self._lock:
+            row = self._conn.execute("SELECT value, expire_at FROM cache_entry WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if row[1] and row[1] <= time.time():
+            self.delete(key)
+            return None
+        return bytes(row[0]), row[1]
+
+    def set(self, key: str, data: bytes, expire_at: float):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO cache_entry (key, value, expire_at) VALUES (?, ?, ?)",
+                               (key, data, expire_at))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache_entry WHERE key = ?", (key,))
+
+    def keys(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT key FROM cache_entry WHERE key >= ? AND key < ? AND (expire_at = 0 OR expire_at > ?)",
+                                      (prefix, prefix + "\U0010ffff", time.time())).fetchall()
+        return [r[0] for r in rows]
+
+    def sweep(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache_entry WHERE expire_at > 0 AND expire_at <= ?", (time.time(),))
+        return cur.rowcount
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache_entry").fetchone()[0]
+
+
+class PersistentLocalCache(LocalCache):
+    """
+    LocalCache whose serialized (bytes) entries are written through to a DiskCache and read back
+    lazily on a memory miss, so a restart starts instantly with warm data. In-process objects
+    (not bytes) stay memory-only.
+    The disk is the source of truth: memory copies of bytes entries live at most memory_ttl seconds,
+    so writes by other processes sharing the file are picked up.
+    """
+
+    def __init__(self, disk: DiskCache, memory_ttl: int = CACHE_DISK_MEMORY_TTL, **kwargs):
+        self.disk = disk
+        self.memory_ttl = max(memory_ttl, 1) # 0 would mean no expiry in LocalCache
+        self.disk_counters = {"disk_hits": 0, "disk_writes": 0, "disk_errors": 0}
+        super().__init__(**kwargs)
+
+    def get(self, key: str) -> Optional[Any]:
+        data = super().get(key)
+        if data is not None:
+            return data
+        try:
+            entry = self.disk.get(key)
+        except Exception as e:
+            logger.error(f"Disk cache read failed: {e}")
+            self.disk_counters["disk_errors"] += 1
+            return None
+        if entry is None:
+            return None
+        data, expire_at = entry
+        self.disk_counters["disk_hits"] += 1
+        # Promote to memory (briefly, see memory_ttl) without writing it back to disk
+        super().set(key, data, self._memory_expire(max(int(expire_at - time.time()), 1) if expire_at else 0))
+        return data
+
+    def _memory_expire(self, expire: int) -> int:
+        return min(expire, self.memory_ttl) if expire else self.memory_ttl
+
+    def set(self, key: str, data: Any, expire: int = 0, size: Optional[int] = None, pinned: bool = False):
+        if not isinstance(data, bytes):
+            super().set(key, data, expire, size, pinned)
+            return
+        super().set(key, data, self._memory_expire(expire), size, pinned)
+        try:
+            self.disk.set(key, data, time.time() + expire if expire else 0)
+            self.disk_counters["disk_writes"] += 1
+        except Exception as e:
+            logger.error(f"Disk cache write failed: {e}")
+            self.disk_counters["disk_errors"] += 1
+
+    def delete(self, key: str):
+        super().delete(key)
+        try:
+            self.disk.delete(key)
+        except Exception as e:
+            logger.error(f"Disk cache delete failed: {e}")
+            self.disk_counters["disk_errors"] += 1
+
+    def inspect(self, key: str) -> Optional[Dict]:
+        # The memory copy's TTL is only memory_ttl, the disk row has the real one
+        entry = self.disk.get(key)
+        if entry is None:
+            return super().inspect(key)
+        return {"bytes": len(entry[0]), "ttl": int(entry[1] - time.time()) if entry[1] else -1}
+
+    def keys(self, prefix: str = "") -> List[str]:
+        return sorted(set(super().keys(prefix)) | set(self.disk.keys(prefix)))
+
+    def sweep(self) -> int:
+        removed = super().sweep()
+        try:
+            self.disk.sweep()
+        except Exception as e:
+            logger.error(f"Disk cache sweep failed: {e}")
+        return removed
+
+    def stats(self) -> Dict:
+        return {**super().stats(), **self.disk_counters, "disk_path": self.disk.path, "disk_entries": self.disk.count()}
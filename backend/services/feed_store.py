@@ -0,0 +1,313 @@
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .cache_codec import codec
+from .cache_service import cache_service, CachePipeline
+from .dates import published_timestamp
+
+logger = logging.getLogger(__name__)
+
+# 人设 feed 的索引形式：每条一个 hash 字段 + 按发布时间/播放量/评分的有序集合（另有按来源拆分的集合）
+# {feed} 是带版本的 feed key，见 cache_keys.feed_key，例如 discovery:persona:1:v3
+#   {feed}:head            -> {"gen": "...", "keys": [...]} 当前代
+#   {feed}:{gen}:items     -> hash，条目 id -> 编码后的条目
+#   {feed}:{gen}:z:views:Bilibili -> 有序集合，条目 id -> 播放量
+# 重建时写入新的一代再切换 head，旧的一代保留 FEED_GENERATION_GRACE 秒，翻页中的游标不会错乱
+FEED_GENERATION_GRACE = int(os.getenv("FEED_GENERATION_GRACE", 600))
+# 软过期后继续返回旧 feed，并在后台只刷新这个人设；硬过期才真正删除（默认 12 小时 / 7 天）
+FEED_SOFT_TTL = int(os.getenv("FEED_SOFT_TTL", 43200))
+FEED_HARD_TTL = int(os.getenv("FEED_HARD_TTL", 7 * 86400))
+FEED_REFRESH_LOCK_TTL = int(os.getenv("FEED_REFRESH_LOCK_TTL", 600))
+SORTS = ("published", "views", "score")
+SCAN_CHUNK = 100
+
+
+class CursorExpired(Exception):
+    """The generation a cursor points into has been replaced and dropped."""
+
+
+def _scores(item: Dict) -> Dict[str, float]:
+    return {
+        "published": published_timestamp(item.get("published_at")),
+        "views": float((item.get("metrics") or {}).get("views") or 0),
+        "score": float(item.get("score") or 0),
+    }
+
+
+def _zset_name(sort: str, source: Optional[str]) -> str:
+    return f"z:{sort}:{source}" if source else f"z:{sort}"
+
+
+class RedisFeedIndex:
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _base(feed: str, gen: str) -> str:
+        return f"{feed}:{gen}"
+
+    def replace_many(self, batch: Dict[str, Tuple[str, List[Tuple[str, Dict, Dict[str, float], str]]]], expire: int,
+                     pipe):
+        """Previous heads in one MGET, then every write queued on the raw Redis pipeline `pipe`."""
+        feeds = list(batch)
+        olds = self.client.mget([f"{feed}:head" for feed in feeds])
+        for feed, old in zip(feeds, olds):
+            gen, entries = batch[feed]
+            self._replace(pipe, feed, gen, entries, expire, old)
+
+    def _replace(self, pipe, feed: str, gen: str, entries: List[Tuple[str, Dict, Dict[str, float], str]],
+                 expire: int, old: Optional[bytes]):
+        base = self._base(feed, gen)
+        zsets: Dict[str, Dict[str, float]] = {}
+        for item_id, _, scores, source in entries:
+            for sort, score in scores.items():
+                zsets.setdefault(_zset_name(sort, None), {})[item_id] = score
+                zsets.setdefault(_zset_name(sort, source), {})[item_id] = score
+        keys = [f"{base}:items"] + [f"{base}:{name}" for name in zsets]
+
+        head_key = f"{feed}:head"
+        if entries:
+            pipe.hset(f"{base}:items", mapping={item_id: codec.encode(item) for item_id, item, _, _ in entries})
+        for name, members in zsets.items():
+            pipe.zadd(f"{base}:{name}", members)
+        for key in keys:
+            pipe.expire(key, expire)
+        pipe.set(head_key, json.dumps({"gen": gen, "keys": keys}), ex=expire)
+        if old:
+            # Let readers paging through the previous generation finish
+            for key in json.loads(old)["keys"]:
+                pipe.expire(key, FEED_GENERATION_GRACE)
+
+    def head(self, feed: str) -> Optional[str]:
+        raw = self.client.get(f"{feed}:head")
+        return json.loads(raw)["gen"] if raw else None
+
+    def exists(self, feed: str, gen: str) -> bool:
+        return bool(self.client.exists(f"{self._base(feed, gen)}:items"))
+
+    def count(self, feed: str, gen: str, sort: str, source: Optional[str]) -> int:
+        return self.client.zcard(f"{self._base(feed, gen)}:{_zset_name(sort, source)}")
+
+    def count_min_views(self, feed: str, gen: str, source: Optional[str], min_views: int) -> int:
+        return self.client.zcount(f"{self._base(feed, gen)}:{_zset_name('views', source)}", min_views, "+inf")
+
+    def range(self, feed: str, gen: str, sort: str, source: Optional[str], start: int, stop: int,
+              desc: bool) -> List[Tuple[str, float]]:
+        key = f"{self._base(feed, gen)}:{_zset_name(sort, source)}"
+        members = (self.client.zrevrange if desc else self.client.zrange)(key, start, stop, withscores=True)
+        return [(m.decode() if isinstance(m, bytes) else m, s) for m, s in members]
+
+    def views(self, feed: str, gen: str, ids: List[str]) -> List[float]:
+        pipe = self.client.pipeline()
+        for item_id in ids:
+            pipe.zscore(f"{self._base(feed, gen)}:z:views", item_id)
+        return [s or 0.0 for s in pipe.execute()]
+
+    def items(self, feed: str, gen: str, ids: List[str]) -> List[Dict]:
+        datas = self.client.hmget(f"{self._base(feed, gen)}:items", ids) if ids else []
+        return [codec.decode(data) for data in datas if data]
+
+
+class MemoryFeedIndex:
+    """
+    Fallback index stored as one cache value per feed (current generation only). Without Redis it lands
+    in the fallback cache and its disk file, so an index written by the queue worker is read by the API.
+    One instance serves one page: the index is decoded once and every page gets fresh item objects.
+    """
+
+    def __init__(self):
+        self._loaded: Dict[str, Optional[Dict]] = {}
+
+    @staticmethod
+    def _key(feed: str) -> str:
+        return f"{feed}:index"
+
+    def replace_many(self, batch: Dict[str, Tuple[str, List[Tuple[str, Dict, Dict[str, float], str]]]], expire: int,
+                     pipe=None):
+        for feed, (gen, entries) in batch.items():
+            self._replace(feed, gen, entries, expire)
+
+    def _replace(self, feed: str, gen: str, entries: List[Tuple[str, Dict, Dict[str, float], str]], expire: int):
+        orders: Dict[str, List[Tuple[str, float]]] = {}
+        for item_id, _, scores, source in entries:
+            for sort, score in scores.items():
+                orders.setdefault(_zset_name(sort, None), []).append((item_id, score))
+                orders.setdefault(_zset_name(sort, source), []).append((item_id, score))
+        for members in orders.values():
+            members.sort(key=lambda m: (m[1], m[0]))  # ascending, like a Redis sorted set
+        index = {
+            "gen": gen,
+            "items": {item_id: item for item_id, item, _, _ in entries},
+            "views": {item_id: scores["views"] for item_id, _, scores, _ in entries},
+            "orders": orders,
+        }
+        cache_service.set(self._key(feed), index, expire=expire)
+        self._loaded.pop(feed, None)
+
+    def _index(self, feed: str, gen: Optional[str] = None) -> Optional[Dict]:
+        if feed not in self._loaded:
+            self._loaded[feed] = cache_service.get(self._key(feed))
+        index = self._loaded[feed]
+        if index is None or (gen is not None and index["gen"] != gen):
+            return None
+        return index
+
+    def head(self, feed: str) -> Optional[str]:
+        index = self._index(feed)
+        return index["gen"] if index else None
+
+    def exists(self, feed: str, gen: str) -> bool:
+        return self._index(feed, gen) is not None
+
+    def count(self, feed: str, gen: str, sort: str, source: Optional[str]) -> int:
+        index = self._index(feed, gen)
+        return len(index["orders"].get(_zset_name(sort, source), [])) if index else 0
+
+    def count_min_views(self, feed: str, gen: str, source: Optional[str], min_views: int) -> int:
+        index = self._index(feed, gen)
+        members = index["orders"].get(_zset_name("views", source), []) if index else []
+        return sum(1 for _, views in members if views >= min_views)
+
+    def range(self, feed: str, gen: str, sort: str, source: Optional[str], start: int, stop: int,
+              desc: bool) -> List[Tuple[str, float]]:
+        index = self._index(feed, gen)
+        if not index:
+            return []
+        members = index["orders"].get(_zset_name(sort, source), [])
+        if desc:
+            members = members[::-1]
+        return members[start:stop + 1]
+
+    def views(self, feed: str, gen: str, ids: List[str]) -> List[float]:
+        index = self._index(feed, gen)
+        return [index["views"].get(i, 0.0) for i in ids] if index else [0.0] * len(ids)
+
+    def items(self, feed: str, gen: str, ids: List[str]) -> List[Dict]:
+        index = self._index(feed, gen)
+        return [index["items"][i] for i in ids if i in index["items"]] if index else []
+
+
+class FeedStore:
+    """
+    Indexed persona feeds for paginated reads: only the requested page is fetched and decoded.
+    The whole-feed blob (the feed key itself) is still written by the crawler for consumers
+    that need every item, e.g. AI picks. Methods take the versioned feed key, see cache_keys.
+    """
+
+    def _backend(self):
+        return RedisFeedIndex(cache_service.client) if cache_service.client else MemoryFeedIndex()
+
+    def index_keys(self, feed: str) -> List[str]:
+        """Keys of the current index generation, for the admin cache endpoint."""
+        if not cache_service.client:
+            return [MemoryFeedIndex._key(feed)]
+        raw = cache_service.client.get(f"{feed}:head")
+        return [f"{feed}:head"] + (json.loads(raw)["keys"] if raw else [])
+
+    def mark_published(self, feed: str, pipe: Optional[CachePipeline] = None):
+        now = time.time()
+        (pipe or cache_service).set(f"{feed}:meta",
+                                    {"updated_at": now, "soft_expire_at": now + FEED_SOFT_TTL}, expire=FEED_HARD_TTL)
+
+    def freshness(self, feed: str) -> Optional[Dict]:
+        """e.g. {"updated_at": "2026-10-18T12:00:03+00:00", "age_seconds": 3600, "stale": False}"""
+        meta = cache_service.get(f"{feed}:meta")
+        if not meta:
+            return None
+        now = time.time()
+        return {
+            "updated_at": datetime.fromtimestamp(meta["updated_at"], timezone.utc).isoformat(timespec="seconds"),
+            "age_seconds": int(now - meta["updated_at"]),
+            "stale": now >= meta["soft_expire_at"],
+        }
+
+    def claim_refresh(self, feed: str) -> bool:
+        """
+        True for exactly one caller across API workers per FEED_REFRESH_LOCK_TTL. The lock is not
+        released after the refresh, so a persona whose sources keep failing is not refetched on every read.
+        """
+        return cache_service.add(f"{feed}:refreshing", 1, expire=FEED_REFRESH_LOCK_TTL)
+
+    def replace(self, feed: str, items: List[Dict], expire: int = FEED_HARD_TTL):
+        self.replace_many({feed: items}, expire)
+
+    def replace_many(self, feeds: Dict[str, List[Dict]], expire: int = FEED_HARD_TTL,
+                     pipe: Optional[CachePipeline] = None):
+        """
+        Rebuilds the index of several feeds. On Redis that is one MGET of the previous heads plus the
+        writes, which go on `pipe` when given (sent with the caller's other writes) or on a pipeline
+        of their own, i.e. two round trips however many feeds there are.
+        """
+        batch = {}
+        for feed, items in feeds.items():
+            entries = [(str(i), item, _scores(item), item.get("source") or "Unknown") for i, item in enumerate(items)]
+            batch[feed] = (uuid.uuid4().hex[:8], entries)
+        backend = self._backend()
+        try:
+            if isinstance(backend, RedisFeedIndex):
+                own = pipe is None
+                pipe = pipe or cache_service.pipeline()
+                backend.replace_many(batch, expire, pipe.redis)
+                if own:
+                    pipe.execute()
+            else:
+                backend.replace_many(batch, expire)
+        except Exception as e:
+            logger.error(f"Feed index write failed for {', '.join(feeds)}: {e}")
+
+    def page(self, feed: str, sort: str = "published", desc: bool = True, source: Optional[str] = None,
+             min_views: Optional[int] = None, limit: int = 20, cursor: Optional[str] = None) -> Optional[Dict]:
+        """
+        Returns {"items", "next_cursor", "total"}, or None when the persona has no indexed feed.
+        total counts the items matching source and min_views, not only the current page.
+        cursor is "{gen}.{position}": the position in the (source-filtered) sorted set to resume
+        scanning from, so min_views filtering never skips or repeats items.
+        Raises CursorExpired when the cursor's generation is gone.
+        """
+        backend = self._backend()
+        if cursor:
+            gen, _, pos = cursor.partition(".")
+            if not backend.exists(feed, gen):
+                raise CursorExpired(cursor)
+            pos = int(pos or 0)
+        else:
+            gen, pos = backend.head(feed), 0
+            if gen is None:
+                return None
+
+        total = backend.count(feed, gen, sort, source)
+        selected: List[str] = []
+        while len(selected) < limit and pos < total:
+            members = backend.range(feed, gen, sort, source, pos, pos + max(limit, SCAN_CHUNK) - 1, desc)
+            if not members:
+                break
+            ids = [m[0] for m in members]
+            views = None
+            if min_views:
+                # The views sorted set doubles as the filter column, no item is decoded for it
+                views = [m[1] for m in members] if sort == "views" else backend.views(feed, gen, ids)
+            for i, item_id in enumerate(ids):
+                pos += 1
+                if views and views[i] < min_views:
+                    if sort == "views" and desc:
+                        # Sorted by views: nothing further down can pass
+                        pos = total
+                        break
+                    continue
+                selected.append(item_id)
+                if len(selected) == limit:
+                    break
+
+        return {
+            "items": backend.items(feed, gen, selected),
+            "next_cursor": f"{gen}.{pos}" if pos < total else None,
+            "total": backend.count_min_views(feed, gen, source, min_views) if min_views else total,
+        }
+
+
+feed_store = FeedStore()
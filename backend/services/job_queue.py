@@ -0,0 +1,267 @@
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# SYNC_MODE=queue：同步只负责入队，每个去重后的数据源一个任务，由 `python -m backend.worker` 进程领取执行
+# worker 组装好的 feed 由 API 进程读取，所以两边要共用缓存：Redis，或没有 Redis 时同一个 CACHE_DISK_PATH 文件
+SYNC_MODE = os.getenv("SYNC_MODE", "local")
+# auto：Redis 可用则用 Redis，否则退回本机 SQLite 文件（API 和 worker 必须用同一种）
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "auto")
+JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "buddy_queue.db")
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 300))
+SYNC_RUN_TTL = 2 * 86400
+# Redis 领取任务是一个 Lua 脚本（原子执行）：先把过期租约放回队列，再弹出一个任务并登记租约
+# 弹出和登记之间 worker 退出也不会丢任务；已完成（不在 jobs 哈希里）的 id 直接丢弃
+# KEYS: pending 列表, leases 有序集合, jobs 哈希；ARGV: 当前时间, 租约截止时间
+LEASE_SCRIPT = """
+for _, id in ipairs(redis.call('zrangebyscore', KEYS[2], '-inf', ARGV[1])) do
+    redis.call('zrem', KEYS[2], id)
+    redis.call('rpush', KEYS[1], id)
+end
+while true do
+    local id = redis.call('lpop', KEYS[1])
+    if not id then
+        return false
+    end
+    local payload = redis.call('hget', KEYS[3], id)
+    if payload then
+        redis.call('zadd', KEYS[2], ARGV[2], id)
+        return payload
+    end
+end
+"""
+
+
+def new_sync_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+def check_sync_mode(mode: Optional[str] = None):
+    """Refuses queue mode with a memory-only cache: the API would never see the worker's feeds."""
+    if (mode or SYNC_MODE) != "queue":
+        return
+    from .cache_service import cache_service
+    if cache_service.backend == "memory":
+        raise RuntimeError("SYNC_MODE=queue needs Redis or a disk cache shared by the API and the workers "
+                           "(set CACHE_DISK_PATH to the same file for both)")
+
+
+class SQLiteJobQueue:
+    """
+    Single-box queue in a local SQLite file. Leases are rows with a deadline; an expired lease
+    (worker died mid-job) makes the job available again. BEGIN IMMEDIATE serializes writers.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS sync_run (
+                sync_id TEXT PRIMARY KEY, plan TEXT, total INTEGER, remaining INTEGER,
+                created_at REAL, finished_at REAL)""")
+            conn.execute("""CREATE TABLE IF NOT EXISTS sync_job (
+                sync_id TEXT, source_key TEXT, config TEXT, status TEXT DEFAULT 'pending',
+                worker TEXT, leased_until REAL DEFAULT 0, attempts INTEGER DEFAULT 0, result TEXT,
+                PRIMARY KEY (sync_id, source_key))""")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def create_sync(self, sync_id: str, plan: Dict, jobs: List[Dict]):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Housekeeping: forget runs older than SYNC_RUN_TTL
+            old = [r[0] for r in conn.execute("SELECT sync_id FROM sync_run WHERE created_at < ?", (now - SYNC_RUN_TTL,))]
+            for old_id in old:
+                conn.execute("DELETE FROM sync_job WHERE sync_id = ?", (old_id,))
+                conn.execute("DELETE FROM sync_run WHERE sync_id = ?", (old_id,))
+            conn.execute("INSERT INTO sync_run (sync_id, plan, total, remaining, created_at) VALUES (?, ?, ?, ?, ?)",
+                         (sync_id, json.dumps(plan, ensure_ascii=False), len(jobs), len(jobs), now))
+            conn.executemany("INSERT INTO sync_job (sync_id, source_key, config) VALUES (?, ?, ?)",
+                             [(sync_id, j["key"], json.dumps(j["config"], ensure_ascii=False)) for j in jobs])
+            conn.execute("COMMIT")
+
+    def lease(self, worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> Optional[Dict]:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT sync_id, source_key, config FROM sync_job "
+                "WHERE status = 'pending' OR (status = 'leased' AND leased_until < ?) ORDER BY rowid LIMIT 1",
+                (now,)).fetchone()
+            if row:
+                conn.execute(
+                    "UPDATE sync_job SET status = 'leased', worker = ?, leased_until = ?, attempts = attempts + 1 "
+                    "WHERE sync_id = ? AND source_key = ?", (worker_id, now + lease_seconds, row[0], row[1]))
+            conn.execute("COMMIT")
+        if not row:
+            return None
+        return {"sync_id": row[0], "key": row[1], "config": json.loads(row[2])}
+
+    def complete(self, sync_id: str, key: str, items: List[Dict]) -> bool:
+        """Stores a job result. Returns True for exactly one caller: the one that finished the sync."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(
+                "UPDATE sync_job SET status = 'done', result = ? WHERE sync_id = ? AND source_key = ? AND status != 'done'",
+                (json.dumps(items, ensure_ascii=False), sync_id, key))
+            remaining = None
+            if cur.rowcount == 1:
+                conn.execute("UPDATE sync_run SET remaining = remaining - 1 WHERE sync_id = ?", (sync_id,))
+                remaining = conn.execute("SELECT remaining FROM sync_run WHERE sync_id = ?", (sync_id,)).fetchone()[0]
+            conn.execute("COMMIT")
+        return remaining == 0
+
+    def get_plan(self, sync_id: str) -> Dict:
+        with self._connect() as conn:
+            row = conn.execute("SELECT plan FROM sync_run WHERE sync_id = ?", (sync_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def get_results(self, sync_id: str) -> Dict[str, List[Dict]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT source_key, result FROM sync_job WHERE sync_id = ? AND status = 'done'",
+                                (sync_id,)).fetchall()
+        return {key: json.loads(result) for key, result in rows}
+
+    def finish(self, sync_id: str):
+        with self._connect() as conn:
+            conn.execute("UPDATE sync_run SET finished_at = ? WHERE sync_id = ?", (time.time(), sync_id))
+
+    def status(self, sync_id: Optional[str] = None) -> Optional[Dict]:
+        """Progress of a sync run (the latest one when sync_id is None)."""
+        with self._connect() as conn:
+            if sync_id:
+                row = conn.execute("SELECT sync_id, total, remaining, finished_at FROM sync_run WHERE sync_id = ?",
+                                   (sync_id,)).fetchone()
+            else:
+                row = conn.execute("SELECT sync_id, total, remaining, finished_at FROM sync_run "
+                                   "ORDER BY created_at DESC LIMIT 1").fetchone()
+        if not row:
+            return None
+        return {"sync_id": row[0], "total": row[1], "remaining": row[2], "finished": row[3] is not None}
+
+
+class RedisJobQueue:
+    """
+    Multi-box queue. Pending job ids sit in a list, leased ones in a sorted set scored by lease
+    deadline; LEASE_SCRIPT pushes expired leases back and leases the next job in one atomic step.
+    HSETNX on the result hash makes duplicate completions (a re-leased job finishing twice) harmless.
+    Jobs of runs that expired unfinished (SYNC_RUN_TTL) are dropped when the next sync is created.
+    """
+    PREFIX = "syncq"
+
+    def __init__(self, client):
+        self.client = client
+        self._lease_script = client.register_script(LEASE_SCRIPT)
+
+    def _run_key(self, sync_id: str, part: str = "") -> str:
+        return f"{self.PREFIX}:run:{sync_id}" + (f":{part}" if part else "")
+
+    def create_sync(self, sync_id: str, plan: Dict, jobs: List[Dict]):
+        self._forget_abandoned()
+        pipe = self.client.pipeline()
+        pipe.set(self._run_key(sync_id), json.dumps({"plan": plan, "total": len(jobs)}, ensure_ascii=False), ex=SYNC_RUN_TTL)
+        pipe.set(self._run_key(sync_id, "remaining"), len(jobs), ex=SYNC_RUN_TTL)
+        for job in jobs:
+            job_id = f"{sync_id}|{job['key']}"
+            pipe.hset(f"{self.PREFIX}:jobs", job_id, json.dumps({"sync_id": sync_id, **job}, ensure_ascii=False))
+            pipe.rpush(f"{self.PREFIX}:pending", job_id)
+        pipe.set(f"{self.PREFIX}:latest", sync_id, ex=SYNC_RUN_TTL)
+        pipe.execute()
+
+    def _forget_abandoned(self):
+        """Housekeeping: drops jobs whose run key expired, e.g. a source that failed on every attempt."""
+        jobs = f"{self.PREFIX}:jobs"
+        job_ids = self.client.hkeys(jobs)
+        sync_ids = {job_id.split("|", 1)[0] for job_id in job_ids}
+        gone = {sync_id for sync_id in sync_ids if not self.client.exists(self._run_key(sync_id))}
+        stale = [job_id for job_id in job_ids if job_id.split("|", 1)[0] in gone]
+        if stale:
+            # Their ids left in the pending list are skipped by LEASE_SCRIPT (no payload)
+            pipe = self.client.pipeline()
+            pipe.hdel(jobs, *stale)
+            pipe.zrem(f"{self.PREFIX}:leases", *stale)
+            pipe.execute()
+            logger.info(f"Dropped {len(stale)} job(s) of {len(gone)} abandoned sync run(s)")
+
+    def lease(self, worker_id: str, lease_seconds: int = JOB_LEASE_SECONDS) -> Optional[Dict]:
+        now = time.time()
+        payload = self._lease_script(
+            keys=[f"{self.PREFIX}:pending", f"{self.PREFIX}:leases", f"{self.PREFIX}:jobs"],
+            args=[now, now + lease_seconds],
+        )
+        return json.loads(payload) if payload else None
+
+    def complete(self, sync_id: str, key: str, items: List[Dict]) -> bool:
+        job_id = f"{sync_id}|{key}"
+        self.client.zrem(f"{self.PREFIX}:leases", job_id)
+        self.client.hdel(f"{self.PREFIX}:jobs", job_id)
+        results = self._run_key(sync_id, "results")
+        if not self.client.hsetnx(results, key, json.dumps(items, ensure_ascii=False)):
+            return False
+        self.client.expire(results, SYNC_RUN_TTL)
+        return self.client.decr(self._run_key(sync_id, "remaining")) == 0
+
+    def get_plan(self, sync_id: str) -> Dict:
+        raw = self.client.get(self._run_key(sync_id))
+        return json.loads(raw)["plan"] if raw else {}
+
+    def get_results(self, sync_id: str) -> Dict[str, List[Dict]]:
+        return {k: json.loads(v) for k, v in self.client.hgetall(self._run_key(sync_id, "results")).items()}
+
+    def finish(self, sync_id: str):
+        self.client.set(self._run_key(sync_id, "finished"), 1, ex=SYNC_RUN_TTL)
+
+    def status(self, sync_id: Optional[str] = None) -> Optional[Dict]:
+        sync_id = sync_id or self.client.get(f"{self.PREFIX}:latest")
+        raw = self.client.get(self._run_key(sync_id)) if sync_id else None
+        if not raw:
+            return None
+        return {
+            "sync_id": sync_id,
+            "total": json.loads(raw)["total"],
+            "remaining": int(self.client.get(self._run_key(sync_id, "remaining")) or 0),
+            "finished": bool(self.client.exists(self._run_key(sync_id, "finished"))),
+        }
+
+
+_job_queue = None
+
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = _make_job_queue()
+    return _job_queue
+
+def _make_job_queue():
+    if JOB_QUEUE_BACKEND in ("redis", "auto"):
+        import redis
+        from .cache_service import cache_service
+        try:
+            client = redis.Redis(host=cache_service.host, port=cache_service.port, db=cache_service.db,
+                                 password=cache_service.password, decode_responses=True, socket_connect_timeout=2)
+            client.ping()
+            logger.info("Sync job queue: Redis")
+            return RedisJobQueue(client)
+        except Exception as e:
+            if JOB_QUEUE_BACKEND == "redis":
+                raise
+            logger.warning(f"Sync job queue: Redis unavailable ({e}), using SQLite at {JOB_QUEUE_DB}")
+    return SQLiteJobQueue(JOB_QUEUE_DB)
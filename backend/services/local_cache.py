@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# 进程内缓存上限，例如 LOCAL_CACHE_MAX_ENTRIES=1024、LOCAL_CACHE_MAX_BYTES=67108864 (64MB)
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", 1024))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+LOCAL_CACHE_SWEEP_INTERVAL = int(os.getenv("LOCAL_CACHE_SWEEP_INTERVAL", 60))
+
+
+class LocalCache:
+    """
+    In-process LRU bounded by entry count and total byte size. TTL is enforced on read and by a
+    background sweeper; expire=0 means no expiry. Pinned entries (e.g. persona version counters,
+    which must never silently reset) are never evicted.
+    The Redis fallback stores serialized bytes, so callers always get a fresh object when decoding.
+    The L1 tier stores decoded objects and passes their serialized size explicitly.
+    """
+
+    def __init__(self, max_entries: int = LOCAL_CACHE_MAX_ENTRIES, max_bytes: int = LOCAL_CACHE_MAX_BYTES,
+                 sweep_interval: int = LOCAL_CACHE_SWEEP_INTERVAL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expire_at, size)
+        self._pinned = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "expirations": 0, "evictions": 0}
+
+        if sweep_interval > 0:
+            sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,), daemon=True, name="local-cache-sweeper")
+            sweeper.start()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            data, expire_at, _ = entry
+            if expire_at and expire_at <= time.time():
+                self._remove(key)
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            self.counters["hits"] += 1
+            return data
+
+    def set(self, key: str, data: Any, expire: int = 0, size: Optional[int] = None, pinned: bool = False):
+        size = len(data) if size is None else size
+        if size > self.max_bytes:
+            # Larger than the whole cache: storing it would only evict everything else
+            with self._lock:
+                self._remove(key)
+            return
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (data, time.time() + expire if expire else 0, size)
+            self._bytes += size
+            if pinned:
+                self._pinned.add(key)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next((k for k in self._data if k not in self._pinned), None)
+                if oldest is None:
+                    break
+                self._remove(oldest)
+                self.counters["evictions"] += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key, None)
+        self._pinned.discard(key)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def inspect(self, key: str) -> Optional[Dict]:
+        """{"bytes": size, "ttl": seconds left or -1}; does not touch LRU order or counters."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            _, expire_at, size = entry
+            ttl = int(expire_at - time.time()) if expire_at else -1
+            if expire_at and ttl <= 0:
+                return None
+            return {"bytes": size, "ttl": ttl}
+
+    def keys(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            return [k for k in self._data if k.startswith(prefix)]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._pinned.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Drops every expired entry; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, (_, expire_at, _) in self._data.items() if expire_at and expire_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.counters["expirations"] += len(expired)
+        return len(expired)
+
+    def _sweep_loop(self, interval: int):
+        while True:
+            time.sleep(interval)
+            self.sweep()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,139 @@
+import json
+import logging
+import math
+import os
+import re
+from typing import Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# AIService 的 prompt 组装：固定的指令文本 + 可裁剪的片段（Text / Table），整体按每种调用的 token 预算裁剪
+# 超出预算时先裁 priority 最低的片段，例如选题精选：候选表先去掉 summary 列、再去掉 metrics 列、
+# 再从排名最后的候选开始删行；人设指令（custom_prompt）优先级最高，最后才被截短
+# token 数在本地估算（中日韩字符按 1 个 token，其余按 4 个字符 1 个 token），实际用量见 AIService._complete 的日志
+PROMPT_BUDGETS = {
+    "pick_best_topics": int(os.getenv("AI_PROMPT_BUDGET_PICKS", 4000)),
+    "analyze_topic": int(os.getenv("AI_PROMPT_BUDGET_ANALYZE", 2000)),
+    "generate_script": int(os.getenv("AI_PROMPT_BUDGET_SCRIPT", 6000)),
+    "generate_metadata_from_script": int(os.getenv("AI_PROMPT_BUDGET_METADATA", 5000)),
+}
+MESSAGE_OVERHEAD = 4 # role 和分隔符
+_WIDE = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    wide = len(_WIDE.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def estimate_messages(messages: List[Dict]) -> int:
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+def minify(obj) -> str:
+    """Compact JSON: no indentation or spaces, e.g. {"views":1000,"likes":5}."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+class Text:
+    """
+    Free text cut from the end when over budget, never below min_chars,
+    e.g. Text(topic.summary, priority=1, min_chars=100).
+    """
+
+    def __init__(self, text: Optional[str], priority: int = 0, min_chars: int = 0):
+        self.text = text or ""
+        self.priority = priority
+        self.min_chars = min_chars
+        self.trimmed = False
+
+    def render(self) -> str:
+        return self.text + ("…" if self.trimmed else "")
+
+    def shrink(self) -> bool:
+        if len(self.text) <= self.min_chars:
+            return False
+        self.text = self.text[:max(self.min_chars, len(self.text) * 3 // 4)]
+        self.trimmed = True
+        return True
+
+
+class Table:
+    """
+    Rows as a header line plus one `|`-separated line per row; dict cells are written as
+    k:v pairs. Over budget it drops `drop_columns` in order, then trailing rows down to min_rows:
+      id|title|source|metrics
+      BV1xx|标题|Bilibili|views:1000,likes:5
+    """
+
+    def __init__(self, rows: List[Dict], columns: Sequence[str], priority: int = 0,
+                 drop_columns: Sequence[str] = (), min_rows: int = 1):
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.priority = priority
+        self.drop_columns = [c for c in drop_columns if c in self.columns]
+        self.min_rows = min_rows
+
+    @staticmethod
+    def _cell(value) -> str:
+        if isinstance(value, dict):
+            value = ",".join(f"{k}:{v}" for k, v in value.items() if v not in (None, "", 0))
+        elif value is None:
+            value = ""
+        return " ".join(str(value).replace("|", "/").split())
+
+    def render(self) -> str:
+        lines = ["|".join(self.columns)]
+        lines += ["|".join(self._cell(row.get(c)) for c in self.columns) for row in self.rows]
+        return "\n".join(lines)
+
+    def shrink(self) -> bool:
+        if self.drop_columns:
+            self.columns.remove(self.drop_columns.pop(0))
+            return True
+        if len(self.rows) > self.min_rows:
+            self.rows.pop()
+            return True
+        return False
+
+
+Part = Union[str, Text, Table]
+
+
+class PromptBuilder:
+    """
+    Chat messages from fixed strings and trimmable parts, fitted to the method's token budget:
+      messages = PromptBuilder("analyze_topic").message("system", "...").message("user", "摘要：", Text(summary, 1)).build()
+    """
+
+    def __init__(self, method: str, budget: Optional[int] = None):
+        self.method = method
+        self.budget = budget or PROMPT_BUDGETS.get(method, 4000)
+        self._messages: List[tuple] = []
+
+    def message(self, role: str, *parts: Part) -> "PromptBuilder":
+        self._messages.append((role, [p for p in parts if p is not None]))
+        return self
+
+    def _render(self) -> List[Dict]:
+        return [{"role": role, "content": "".join(p if isinstance(p, str) else p.render() for p in parts)}
+                for role, parts in self._messages]
+
+    def build(self) -> List[Dict]:
+        messages = self._render()
+        estimated = before = estimate_messages(messages)
+        trimmable = sorted((p for _, parts in self._messages for p in parts if not isinstance(p, str)),
+                           key=lambda p: p.priority)
+        while estimated > self.budget and trimmable:
+            if not trimmable[0].shrink():
+                trimmable.pop(0)
+                continue
+            messages = self._render()
+            estimated = estimate_messages(messages)
+        if estimated != before:
+            logger.info(f"Prompt {self.method}: trimmed from ~{before} to ~{estimated} tokens (budget {self.budget})")
+        if estimated > self.budget:
+            logger.warning(f"Prompt {self.method}: ~{estimated} tokens is still over the budget of {self.budget}")
+        return messages
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket whose refill rate follows AIMD:
+    每次成功 rate += increase（加性增），被限流时 rate *= decrease（乘性减）并暂停 penalty 秒。
+    例：rate=2.0 连续成功 10 次 -> 3.0 req/s；一次 412 -> 1.5 req/s，且 5 秒内不再放行。
+
+    State lives behind a threading.Lock and waits are plain asyncio.sleep, so one limiter can be
+    shared by coroutines running on different event loops (sync engine, bilibili_api.sync wrappers).
+    """
+
+    def __init__(self, name: str, rate: float = 2.0, min_rate: float = 0.2, max_rate: float = 10.0,
+                 increase: float = 0.1, decrease: float = 0.5, penalty: float = 5.0, burst: float = 1.0):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.penalty = penalty
+        self.burst = burst
+
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.success_count = 0
+        self.throttle_count = 0
+        self.throttle_events = deque(maxlen=50)
+
+    def _reserve(self) -> float:
+        """Takes one token (possibly going into debt) and returns how long the caller must wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def on_success(self):
+        with self._lock:
+            self.success_count += 1
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, reason: str = ""):
+        with self._lock:
+            before = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            # Drain the bucket so nobody is let through during the penalty window
+            self._tokens = min(self._tokens, 0) - self.penalty * self.rate
+            self.throttle_count += 1
+            self.throttle_events.append({
+                "at": datetime.utcnow().isoformat(),
+                "reason": reason[:200],
+                "rate_before": round(before, 3),
+                "rate_after": round(self.rate, 3),
+            })
+
+    def stats(self) -> Dict:
+        return {
+            "name": self.name,
+            "rate": round(self.rate, 3),
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "success_count": self.success_count,
+            "throttle_count": self.throttle_count,
+            "throttle_events": list(self.throttle_events),
+        }
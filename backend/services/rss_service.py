@@ -1,9 +1,71 @@
 import feedparser
+import multiprocessing
+import os
 import re
-from typing import List, Dict, Optional
+import requests
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from bs4 import BeautifulSoup
 
+# lxml.html is several times faster than BeautifulSoup's tree builder; use it when installed
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+METRIC_PATTERN = re.compile(r"(播放量|点赞|评论|硬币|收藏)[:：]\s*(\d+)")
+METRIC_KEYS = {"播放量": "views", "点赞": "likes", "评论": "comments", "硬币": "coins", "收藏": "stars"}
+
+RSS_TIMEOUT = float(os.getenv("RSS_TIMEOUT", 15))
+RSS_POOL_SIZE = int(os.getenv("RSS_POOL_SIZE", 10))
+
+def _make_http_session() -> requests.Session:
+    """Shared keep-alive client: connections to the same host (e.g. rsshub.app) are reused."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=RSS_POOL_SIZE, pool_maxsize=RSS_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = feedparser.USER_AGENT
+    return session
+
+http_session = _make_http_session()
+
+# 可选的解析进程池：PARSE_WORKERS=2 时 feedparser/HTML 解析在子进程中执行，不与 API 线程争抢 GIL；默认 0 关闭
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", 0))
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+def _lower_priority():
+    # Parsing is background work; let the API process win the CPU (no-op on Windows)
+    if hasattr(os, "nice"):
+        os.nice(5)
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    global _parse_pool
+    if PARSE_WORKERS > 0 and _parse_pool is None:
+        # Concurrent first callers (sync threads) must not each start a pool
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                # spawn, not fork: the API process is multi-threaded
+                _parse_pool = ProcessPoolExecutor(
+                    max_workers=PARSE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_lower_priority,
+                )
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        pool, _parse_pool = _parse_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
 class RssService:
     """
     Service to handle RSS feed fetching and parsing.
@@ -15,18 +77,49 @@ class RssService:
         """
         Fetches an RSS feed and returns a list of dictionaries compatible with the Topic model.
         """
-        feed = feedparser.parse(url)
+        return RssService.parse(RssService.fetch(url)["content"])
+
+    @staticmethod
+    def fetch(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Dict:
+        """
+        Conditional GET through the pooled client. With validators from the previous response the
+        server may answer 304, e.g. {"not_modified": True, "content": None, "etag": '"abc"', ...}.
+        """
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        resp = http_session.get(url, headers=headers, timeout=RSS_TIMEOUT)
+        if resp.status_code == 304:
+            return {"not_modified": True, "content": None, "etag": etag, "last_modified": last_modified}
+        resp.raise_for_status()
+        return {
+            "not_modified": False,
+            "content": resp.content,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        }
+
+    @staticmethod
+    def parse(content: bytes) -> List[Dict]:
+        """
+        Raw feed bytes -> item dicts. Picklable on purpose: this is what the parse pool runs.
+        """
+        return RssService.parse_feed(feedparser.parse(content))
+
+    @staticmethod
+    def parse_feed(feed) -> List[Dict]:
+        """
+        Converts a feedparser result into Topic-compatible dicts.
+        """
         topics = []
 
         for entry in feed.entries:
             description = entry.get("description", "")
-            metrics = RssService._extract_metrics(description)
-            
-            # Clean up description to be used as a summary
-            summary = RssService._clean_description(description)
-
-            # Extract thumbnail if available
-            thumbnail = RssService._extract_thumbnail(description)
+            # Summary, thumbnail and metrics all come from one parse of the description
+            summary, thumbnail, metrics = RssService._parse_description(description)
 
             topic = {
                 "original_id": entry.get("id") or entry.get("link"),
@@ -43,57 +136,55 @@ class RssService:
         return topics
 
     @staticmethod
-    def _extract_metrics(description: str) -> Dict:
+    def _parse_description(description: str) -> Tuple[str, Optional[str], Dict]:
         """
-        Extracts metrics (views, likes, etc.) from RSSHub-generated description HTML.
+        Single pass over an RSSHub description: one HTML parse, one regex sweep.
+        Returns (summary, thumbnail, metrics), e.g.
+        '<img src="a.jpg">播放量: 1234 点赞: 56 好视频' -> ("好视频", "a.jpg", {"views": 1234, "likes": 56})
         """
-        metrics = {}
         if not description:
-            return metrics
-
-        # Bilibili RSSHub pattern: 播放量: 1234, 点赞: 567, etc.
-        patterns = {
-            "views": r"播放量[:：]\s*(\d+)",
-            "likes": r"点赞[:：]\s*(\d+)",
-            "comments": r"评论[:：]\s*(\d+)",
-            "coins": r"硬币[:：]\s*(\d+)",
-            "stars": r"收藏[:：]\s*(\d+)"
-        }
+            return "", None, {}
 
-        for key, pattern in patterns.items():
-            match = re.search(pattern, description)
-            if match:
-                metrics[key] = int(match.group(1))
+        if HTML_PARSER == "lxml":
+            text, thumbnail = RssService._text_and_image_lxml(description)
+        else:
+            text, thumbnail = RssService._text_and_image_bs4(description)
+
+        # Bilibili RSSHub pattern: 播放量: 1234, 点赞: 567, etc. Collect the first value of each
+        # metric and strip the metric lines from the summary in the same sweep.
+        metrics = {}
+        def take_metric(match):
+            metrics.setdefault(METRIC_KEYS[match.group(1)], int(match.group(2)))
+            return ""
+        text = METRIC_PATTERN.sub(take_metric, text)
 
-        return metrics
+        return text.strip()[:500], thumbnail, metrics # Limit summary length
 
     @staticmethod
-    def _clean_description(description: str) -> str:
-        """
-        Removes HTML tags and extra whitespace from description for a cleaner summary.
-        """
-        if not description:
-            return ""
-        soup = BeautifulSoup(description, "html.parser")
+    def _text_and_image_lxml(description: str) -> Tuple[str, Optional[str]]:
+        try:
+            root = lxml.html.fragment_fromstring(description, create_parent="div")
+        except ParserError:
+            return "", None
+        srcs = root.xpath("(.//img/@src)[1]")
         # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        text = soup.get_text(separator=" ", strip=True)
-        # Remove the metric lines if they exist at the end/start to keep summary clean
-        text = re.sub(r"(播放量|点赞|评论|硬币|收藏)[:：]\s*\d+", "", text)
-        return text[:500] # Limit summary length
+        for node in root.xpath(".//script|.//style"):
+            node.drop_tree()
+        # Same output as BeautifulSoup's get_text(separator=" ", strip=True)
+        text = " ".join(t.strip() for t in root.itertext() if t.strip())
+        return text, (str(srcs[0]) if srcs else None)
 
     @staticmethod
-    def _extract_thumbnail(description: str) -> Optional[str]:
-        """
-        Extracts the first image URL from the description to use as a thumbnail.
-        """
-        if not description:
-            return None
+    def _text_and_image_bs4(description: str) -> Tuple[str, Optional[str]]:
         soup = BeautifulSoup(description, "html.parser")
+        # Extract thumbnail (first image) before dropping non-text nodes
         img = soup.find("img")
-        return img["src"] if img and img.has_attr("src") else None
+        thumbnail = img["src"] if img and img.has_attr("src") else None
+
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        return soup.get_text(separator=" ", strip=True), thumbnail
 
     @staticmethod
     def _parse_date(date_str: Optional[str]) -> Optional[str]:
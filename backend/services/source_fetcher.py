@@ -0,0 +1,220 @@
+from datetime import datetime
+from typing import Callable, List, Dict, Optional
+from urllib.parse import urlparse
+from sqlmodel import Session, select
+from ..models import SourceWatermark
+from .rss_service import rss_service, get_parse_pool
+from .bilibili_service import bilibili_service, is_host_failure
+from .circuit_breaker import CircuitOpenError, source_breakers, host_breakers
+
+import asyncio
+import copy
+import os
+
+# 已补全过的视频是否额外刷新一次播放/点赞等指标（只请求 info，不请求标签）
+SYNC_REFRESH_METRICS = os.getenv("SYNC_REFRESH_METRICS", "0") == "1"
+BILIBILI_API_HOST = "api.bilibili.com"
+
+def get_source_key(s) -> str:
+    """
+    Source identity shared by personas, e.g. bili:2267573 / rss:https://example.com/feed.
+    """
+    stype = s.type
+    data = s.config_data or {}
+    if stype == "bilibili_user": return f"bili:{data.get('uid')}"
+    if stype == "rss_feed": return f"rss:{data.get('url')}"
+    if stype == "hot_list": return f"hot:{s.name}"
+    return f"other:{s.name}"
+
+class SourceFetcher:
+    """
+    Fetches one upstream source (Bilibili SDK / RSS) with its watermark state, enrichment and
+    circuit breakers. Used by the in-process sync engine and by queue workers.
+    """
+
+    async def fetch(self, config, state: Optional[Dict] = None) -> List[Dict]:
+        """
+        Fetches and enriches the raw items of one source. Per-config shaping happens in the crawler.
+        state: plain-dict snapshot of the source watermark (see watermark_state). Items listed in
+        state["enriched"] skip the detail/tag requests; RSS validators in it are updated in place.
+        A failing source (or one whose breaker is open) returns its last successful items instead.
+        """
+        state = state if state is not None else {}
+        key = get_source_key(config)
+        if not source_breakers.allow(key):
+            print(f"  Breaker open, reusing last items: {key}")
+            return copy.deepcopy(state.get("last_items") or [])
+
+        try:
+            items = await self._fetch_upstream(config, state)
+        except Exception as e:
+            print(f"Error fetching {key}: {e}")
+            source_breakers.record_failure(key, e)
+            return copy.deepcopy(state.get("last_items") or [])
+        source_breakers.record_success(key)
+
+        # Enrich Bilibili items concurrently (details are the slow part of a source)
+        enriched = state.get("enriched") or {}
+        await asyncio.gather(*[
+            self._enrich_bilibili(item, enriched.get(item["original_id"])) for item in items
+            if item.get("source") == "Bilibili" and item.get("original_id")
+        ])
+        return items
+
+    async def _fetch_upstream(self, config, state: Dict) -> List[Dict]:
+        """Raises when the source could not be fetched at all."""
+        # NEW: Priority for Bilibili SDK
+        if config.type == "bilibili_user":
+            uid = config.config_data.get("uid")
+            if not uid:
+                return []
+            try:
+                # Convert to int if it's a string from JSON
+                return await self._guarded(BILIBILI_API_HOST, lambda: bilibili_service.fetch_user_videos_async(int(uid)),
+                                           is_failure=is_host_failure)
+            except Exception as e:
+                print(f"Error fetching real Bilibili data for {uid}: {e}")
+                # Fallback to RSSHub if SDK fails (skipped while rsshub.app's breaker is open)
+                url = f"https://rsshub.app/bilibili/user/video/{uid}"
+                return await self._guarded(urlparse(url).netloc, lambda: self._fetch_rss(url, {}))
+
+        if config.type == "rss_feed":
+            url = config.config_data.get("url")
+            if not url:
+                return []
+            return await self._guarded(urlparse(url).netloc, lambda: self._fetch_rss(url, state))
+        return []
+
+    async def _guarded(self, host: str, make_call, is_failure: Optional[Callable[[Exception], bool]] = None):
+        """
+        Runs one upstream call under the host breaker, e.g. host="rsshub.app".
+        Errors for which is_failure() is False still mean the host answered: they are re-raised
+        (for the source breaker) but count as a success here.
+        """
+        if not host_breakers.allow(host):
+            raise CircuitOpenError(f"breaker open for host {host}")
+        try:
+            result = await make_call()
+        except Exception as e:
+            if is_failure is None or is_failure(e):
+                host_breakers.record_failure(host, e)
+            else:
+                host_breakers.record_success(host)
+            raise
+        host_breakers.record_success(host)
+        return result
+
+    async def _fetch_rss(self, url: str, state: Dict) -> List[Dict]:
+        """
+        Conditional GET: a 304 reuses the previous items without parsing anything.
+        """
+        # Validators are only useful if we still have the items they refer to
+        previous = state.get("last_items")
+        etag, last_modified = (state.get("etag"), state.get("last_modified")) if previous else (None, None)
+
+        resp = await asyncio.to_thread(rss_service.fetch, url, etag, last_modified)
+        if resp["not_modified"]:
+            print(f"  RSS not modified: {url}")
+            return copy.deepcopy(previous)
+
+        state["etag"], state["last_modified"] = resp["etag"], resp["last_modified"]
+        return await self._parse_rss(resp["content"])
+
+    async def _parse_rss(self, content: bytes) -> List[Dict]:
+        """
+        CPU-bound parsing goes to the process pool when PARSE_WORKERS > 0, otherwise to a thread:
+        never on the event loop, where it would stall every other source.
+        """
+        pool = get_parse_pool()
+        if pool is None:
+            return await asyncio.to_thread(rss_service.parse, content)
+        return await asyncio.get_running_loop().run_in_executor(pool, rss_service.parse, content)
+
+    async def _enrich_bilibili(self, item: Dict, known: Optional[Dict] = None):
+        bvid = item["original_id"]
+        if known:
+            # Already enriched in an earlier sync: fresh listing counts win, stored details fill the rest
+            listing = {k: v for k, v in item["metrics"].items() if v}
+            item["metrics"] = {**known.get("metrics", {}), **listing}
+            self._apply_details(item, {"tags": known.get("tags", []), "title": known.get("title"), "summary": known.get("summary")})
+            if SYNC_REFRESH_METRICS:
+                try:
+                    item["metrics"].update(await bilibili_service.get_video_metrics_async(bvid))
+                except Exception as e:
+                    print(f"Error refreshing metrics for video {bvid}: {e}")
+            return
+
+        try:
+            details = await bilibili_service.get_video_details_async(bvid)
+        except Exception as e:
+            print(f"Error fetching details for video {bvid}: {e}")
+            return
+        self._apply_details(item, details)
+
+    @staticmethod
+    def _apply_details(item: Dict, details: Dict):
+        if details:
+            # Update metrics
+            if "metrics" in details:
+                item["metrics"].update(details["metrics"])
+
+            # Set tags (frontend uses 'labels' mapping)
+            item["labels"] = details.get("tags", [])
+
+            # Update title/summary if necessary (ensure high quality)
+            if details.get("title"):
+                item["title"] = details["title"]
+            if details.get("summary"):
+                item["summary"] = details["summary"]
+
+    def load_watermarks(self, session: Session, keys: List[str]) -> Dict[str, SourceWatermark]:
+        rows = session.exec(select(SourceWatermark).where(SourceWatermark.source_key.in_(keys))).all()
+        return {w.source_key: w for w in rows}
+
+    @staticmethod
+    def watermark_state(watermark: Optional[SourceWatermark]) -> Dict:
+        """Detached copy of a watermark row that fetch tasks can read and update freely."""
+        if not watermark:
+            return {}
+        return {
+            "enriched": watermark.enriched or {},
+            "etag": watermark.etag,
+            "last_modified": watermark.last_modified,
+            "last_items": watermark.last_items or [],
+        }
+
+    def save_watermarks(self, session: Session, watermarks: Dict[str, SourceWatermark], states: Dict[str, Dict],
+                        source_items: Dict[str, List[Dict]]):
+        """
+        Records the details of every enriched item, the RSS validators and the fetched items
+        per source. Items that dropped out of the listing are forgotten,
+        so the stored set stays bounded.
+        """
+        for key, items in source_items.items():
+            if not items:
+                # Fetch failed or source is empty: keep the previous watermark
+                continue
+            watermark = watermarks.get(key) or SourceWatermark(source_key=key)
+            state = states.get(key, {})
+            watermark.etag = state.get("etag")
+            watermark.last_modified = state.get("last_modified")
+            watermark.last_items = items
+            watermark.enriched = {
+                i["original_id"]: {
+                    "metrics": i.get("metrics", {}),
+                    "tags": i["labels"],
+                    "title": i.get("title"),
+                    "summary": i.get("summary"),
+                }
+                for i in items if "labels" in i
+            }
+            watermark.updated_at = datetime.utcnow()
+            session.add(watermark)
+            watermarks[key] = watermark
+        session.commit()
+
+    @staticmethod
+    def breaker_status() -> Dict:
+        return {"sources": source_breakers.snapshot(), "hosts": host_breakers.snapshot()}
+
+source_fetcher = SourceFetcher()
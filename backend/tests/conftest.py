@@ -1,3 +1,7 @@
+import os
+# Keep the fallback cache in memory for tests (no buddy_cache.db next to the repo)
+os.environ["CACHE_DISK_PATH"] = ""
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import Session, SQLModel, create_engine
@@ -0,0 +1,142 @@
+import threading
+import time
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel, create_engine, select
+from backend.models import AIJob, Persona, Topic, Script
+from backend.services.ai_jobs import AIJobRunner, ai_job_runner
+from backend.services.ai_service import ai_service
+
+
+@pytest.fixture(name="runner")
+def runner_fixture(session: Session, monkeypatch):
+    # Jobs run on worker threads with sessions of their own, on the test database
+    monkeypatch.setattr(ai_job_runner, "session_factory", lambda: Session(session.get_bind()))
+    return ai_job_runner
+
+
+def make_topic(session: Session) -> Topic:
+    session.add(Persona(name="P"))
+    topic = Topic(original_id="J1", title="Job topic", url="u")
+    session.add(topic)
+    session.commit()
+    session.refresh(topic)
+    return topic
+
+
+def test_script_generation_is_queued_and_persisted(client: TestClient, session: Session, runner, monkeypatch):
+    monkeypatch.setattr(ai_service, "generate_script", lambda topic, template, persona, extra_prompt, regenerate=False: f"script for {topic.title}")
+    topic = make_topic(session)
+
+    resp = client.post("/api/v1/scripts/generate", json={"topic_id": topic.id})
+    assert resp.status_code == 202
+    job_id = resp.json()["job_id"]
+    runner.wait(job_id, timeout=10)
+
+    job = client.get(f"/api/v1/ai/jobs/{job_id}").json()
+    assert job["status"] == "done" and job["kind"] == "script"
+    assert job["result"]["content"] == "script for Job topic"
+    assert session.exec(select(Script).where(Script.topic_id == topic.id)).one().content == "script for Job topic"
+
+    events = client.get(f"/api/v1/ai/jobs/{job_id}/events").text
+    assert events.startswith("event: status") and '"status": "done"' in events
+
+    # Opt-in synchronous mode keeps the old response body
+    resp = client.post("/api/v1/scripts/generate", params={"wait": "true"}, json={"topic_id": topic.id})
+    assert resp.status_code == 200 and resp.json()["content"] == "script for Job topic"
+
+    # Bad requests still fail right away, without a job
+    assert client.post("/api/v1/scripts/generate", json={"topic_id": 9999}).status_code == 404
+
+
+def test_failed_job_reports_error(client: TestClient, session: Session, runner, monkeypatch):
+    monkeypatch.setattr(ai_service, "analyze_topic", lambda topic, persona, regenerate=False: {})
+    topic = make_topic(session)
+
+    resp = client.post(f"/api/v1/topics/{topic.id}/generate-metadata", params={"wait": "true"})
+    assert resp.status_code == 500 and resp.json()["detail"] == "AI analysis failed"
+    assert client.get("/api/v1/ai/jobs/unknown").status_code == 404
+
+
+def test_workers_are_bounded_and_run_by_priority(tmp_path):
+    # File database: submitting and running jobs concurrently needs separate connections
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    runner = AIJobRunner(workers=1)
+    runner.session_factory = lambda: Session(engine)
+    release, order = threading.Event(), []
+
+    def handler(_, params):
+        if params["name"] == "first":
+            release.wait(5)
+        order.append(params["name"])
+        return {"name": params["name"]}
+
+    runner.register("test", handler)
+    first = runner.submit("test", {"name": "first"})
+    while runner.get(first)["status"] != "running":
+        time.sleep(0.01)
+    batch = runner.submit("test", {"name": "batch"}, priority="batch")
+    interactive = runner.submit("test", {"name": "interactive"}, priority="interactive")
+    assert runner.stats()["running"] <= 1
+    release.set()
+    for job_id in (first, batch, interactive):
+        assert runner.wait(job_id, timeout=10)["status"] == "done"
+    assert order == ["first", "interactive", "batch"]
+
+
+def test_recover_leaves_jobs_of_live_processes_alone(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    runs = []
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        session.add(AIJob(id="live", kind="test", status="running", owner="other", heartbeat_at=now))
+        session.add(AIJob(id="dead", kind="test", status="running", owner="gone", heartbeat_at=now - timedelta(hours=1)))
+        session.add(AIJob(id="waiting", kind="test", status="queued"))
+        session.commit()
+
+    def make_runner():
+        runner = AIJobRunner(workers=1)
+        runner.session_factory = lambda: Session(engine)
+        runner.register("test", lambda _, params: runs.append(1) or {})
+        return runner
+
+    # Two processes starting up at once: each waiting or stale job runs exactly once
+    first, second = make_runner(), make_runner()
+    # The second count depends on how far the first runner's workers got; only the runs matter
+    assert first.recover() == 2
+    second.recover()
+    for job_id in ("dead", "waiting"):
+        assert first.wait(job_id, timeout=10)["status"] == "done"
+        assert second.wait(job_id, timeout=10)["status"] == "done"
+    assert len(runs) == 2
+    assert first.get("live")["status"] == "running"
+
+
+def test_events_read_the_db_off_the_loop_and_missing_jobs_are_404(client: TestClient, session: Session, runner, monkeypatch):
+    import asyncio
+    session.add(AIJob(id="elsewhere", kind="script", status="done", owner="other", result={"content": "x"}))
+    session.commit()
+    on_loop = []
+    get = runner.get
+
+    def recording_get(job_id):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return get(job_id)
+
+    monkeypatch.setattr(runner, "get", recording_get)
+    events = client.get("/api/v1/ai/jobs/elsewhere/events").text
+    assert '"status": "done"' in events
+    assert on_loop and not any(on_loop)
+
+    # wait=true on a job that is gone (deleted or expired): 404, not a TypeError
+    with pytest.raises(HTTPException) as exc:
+        runner.result("gone", timeout=0)
+    assert exc.value.status_code == 404
@@ -0,0 +1,54 @@
+import uuid
+from types import SimpleNamespace
+import pytest
+from backend.models import Persona, Topic
+from backend.services.ai_service import ai_service
+from backend.services.cache_keys import bump_persona_version
+
+
+@pytest.fixture(name="calls")
+def calls_fixture(monkeypatch):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"script #{len(calls)}"))])
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_service, "client", fake_client)
+    monkeypatch.setattr(ai_service, "_memo_counts", {})
+    return calls
+
+
+def make_inputs():
+    # Unique title: the memo lives in the process-wide fallback cache
+    persona = Persona(id=90000 + uuid.uuid4().int % 10000, name="Memo")
+    return Topic(original_id="M1", title=f"Memo {uuid.uuid4().hex}", url="u"), persona
+
+
+def test_identical_inputs_reuse_the_result(calls):
+    topic, persona = make_inputs()
+    assert ai_service.generate_script(topic, {}, persona) == "script #1"
+    assert ai_service.generate_script(topic, {}, persona) == "script #1"
+    assert len(calls) == 1
+
+    # Other inputs are a different entry
+    assert ai_service.generate_script(topic, {}, persona, extra_prompt="更短一点") == "script #2"
+    assert ai_service.memo_stats()["generate_script"] == {"hits": 1, "misses": 2, "bypassed": 0, "hit_rate": 0.333}
+
+
+def test_regenerate_calls_the_model_and_refreshes_the_entry(calls):
+    topic, persona = make_inputs()
+    ai_service.generate_script(topic, {}, persona)
+    assert ai_service.generate_script(topic, {}, persona, regenerate=True) == "script #2"
+    assert ai_service.generate_script(topic, {}, persona) == "script #2"
+    assert len(calls) == 2
+    assert ai_service.memo_stats()["generate_script"]["bypassed"] == 1
+
+
+def test_persona_edit_invalidates_the_memo(calls):
+    topic, persona = make_inputs()
+    ai_service.generate_script(topic, {}, persona)
+    bump_persona_version(persona.id)
+    assert ai_service.generate_script(topic, {}, persona) == "script #2"
+    assert len(calls) == 2
@@ -0,0 +1,59 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from bilibili_api.exceptions import NetworkException, ResponseCodeException
+from backend.services import bilibili_service as bili_module
+from backend.services.bilibili_service import bilibili_service, _stat_ttl, is_throttled
+
+
+class FakeVideo:
+    calls = []
+
+    def __init__(self, bvid):
+        self.bvid = bvid
+
+    async def get_info(self):
+        FakeVideo.calls.append(("info", self.bvid))
+        return {"aid": 1, "title": "T", "desc": "D", "pubdate": int(time.time()) - 3600,
+                "stat": {"view": 10, "like": 2, "coin": 0, "favorite": 0, "reply": 1}}
+
+    async def get_tags(self):
+        FakeVideo.calls.append(("tags", self.bvid))
+        return [{"tag_name": "tag"}]
+
+
+def test_details_cache_skips_network_on_repeat(monkeypatch):
+    monkeypatch.setattr(bili_module.video, "Video", FakeVideo)
+    FakeVideo.calls = []
+    bvid = f"BVcache{time.time_ns()}"
+
+    first = asyncio.run(bilibili_service.get_video_details_async(bvid))
+    second = asyncio.run(bilibili_service.get_video_details_async(bvid))
+    metrics = asyncio.run(bilibili_service.get_video_metrics_async(bvid))
+
+    assert first == second
+    assert first["tags"] == ["tag"] and first["metrics"]["views"] == 10
+    assert metrics["views"] == 10
+    assert FakeVideo.calls == [("info", bvid), ("tags", bvid)]
+
+
+def test_stat_ttl_tiers_by_age():
+    now = time.time()
+    assert _stat_ttl(int(now - 3600)) == 1800
+    assert _stat_ttl(int(now - 3 * 86400)) == 6 * 3600
+    assert _stat_ttl(int(now - 30 * 86400)) == 86400
+
+
+def test_throttle_is_read_from_status_not_message():
+    assert is_throttled(NetworkException(412, "Precondition Failed"))
+    assert is_throttled(ResponseCodeException(-352, "风控校验失败"))
+    # Same shape as httpx.HTTPStatusError: status on e.response
+    assert not is_throttled(RuntimeError("blocked"))
+    error = RuntimeError("blocked")
+    error.response = SimpleNamespace(status_code=412)
+    assert is_throttled(error)
+
+    # "412" in a BVID, URL or count is not throttling
+    assert not is_throttled(RuntimeError("video BV1412xx not found"))
+    assert not is_throttled(ResponseCodeException(-404, "啥都木有 (4120 views)"))
+    assert not is_throttled(NetworkException(500, "see /x/412"))
@@ -0,0 +1,33 @@
+import json
+import pytest
+from backend.services.cache_codec import CacheCodec, orjson, msgpack, zstandard
+
+FEED = [{"title": f"视频标题 {i}", "summary": "很长的中文简介。" * 40, "metrics": {"views": i * 100}} for i in range(50)]
+
+
+@pytest.mark.parametrize("name,compression", [
+    ("json", "none"), ("json", "zlib"),
+    pytest.param("orjson", "zlib", marks=pytest.mark.skipif(not orjson, reason="orjson not installed")),
+    pytest.param("msgpack", "zlib", marks=pytest.mark.skipif(not msgpack, reason="msgpack not installed")),
+    pytest.param("orjson", "zstd", marks=pytest.mark.skipif(not (orjson and zstandard), reason="zstd not installed")),
+])
+def test_roundtrip_and_compression_threshold(name, compression):
+    codec = CacheCodec(name, compression, compress_min_bytes=1024)
+    encoded = codec.encode(FEED)
+    assert codec.decode(encoded) == FEED
+    if compression != "none":
+        assert len(encoded) < len(json.dumps(FEED, ensure_ascii=False).encode("utf-8")) / 5
+
+    small = codec.encode({"views": 1})
+    assert small[4] == 0  # below threshold: stored uncompressed
+    assert codec.decode(small) == {"views": 1}
+
+
+def test_decode_follows_header_and_legacy_json():
+    written = CacheCodec("json", "zlib", compress_min_bytes=0).encode(FEED)
+    assert CacheCodec("orjson" if orjson else "json", "none").decode(written) == FEED
+
+    legacy = json.dumps({"a": "中文"}, ensure_ascii=False)
+    codec = CacheCodec()
+    assert codec.decode(legacy) == {"a": "中文"}
+    assert codec.decode(legacy.encode("utf-8")) == {"a": "中文"}
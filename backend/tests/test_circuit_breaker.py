@@ -0,0 +1,76 @@
+import asyncio
+from bilibili_api.exceptions import NetworkException, ResponseCodeException
+from backend.models import SourceConfig
+from backend.services.circuit_breaker import CircuitBreaker
+from backend.services import source_fetcher as fetcher_module
+from backend.services.source_fetcher import source_fetcher
+
+
+def test_breaker_opens_and_half_opens():
+    breaker = CircuitBreaker("test", threshold=2, cooldown=0)
+    breaker.record_failure("k", RuntimeError("boom"))
+    assert breaker.allow("k")
+    breaker.record_failure("k", RuntimeError("boom"))
+    assert breaker.snapshot()["k"]["state"] == "open"
+
+    # cooldown=0: the next call is the half-open trial, a concurrent one is skipped
+    assert breaker.allow("k")
+    assert not breaker.allow("k")
+    breaker.record_success("k")
+    assert breaker.allow("k")
+    assert breaker.snapshot()["k"]["skips"] == 1
+
+
+def test_failing_source_reuses_last_items_and_is_skipped(monkeypatch):
+    calls = []
+
+    async def failing_videos(uid, limit=10):
+        calls.append(uid)
+        raise RuntimeError("upstream down")
+
+    async def failing_rss(url, state):
+        raise RuntimeError("rsshub down")
+
+    monkeypatch.setattr(fetcher_module.bilibili_service, "fetch_user_videos_async", failing_videos)
+    monkeypatch.setattr(source_fetcher, "_fetch_rss", failing_rss)
+    monkeypatch.setattr(fetcher_module, "source_breakers", CircuitBreaker("source", threshold=2, cooldown=3600))
+    monkeypatch.setattr(fetcher_module, "host_breakers", CircuitBreaker("host", threshold=100, cooldown=3600))
+
+    config = SourceConfig(id=1, type="bilibili_user", name="UP", config_data={"uid": "5"}, enabled=True)
+    state = {"last_items": [{"original_id": "BVold", "title": "old", "metrics": {}, "labels": []}]}
+
+    for _ in range(3):
+        items = asyncio.run(source_fetcher.fetch(config, state))
+        assert [i["original_id"] for i in items] == ["BVold"]
+
+    # Two failures open the source breaker; the third sync does not call upstream
+    assert calls == [5, 5]
+    assert fetcher_module.source_breakers.snapshot()["bili:5"]["skips"] == 1
+
+
+def test_app_level_errors_do_not_open_the_bilibili_host_breaker(monkeypatch):
+    errors = iter([ResponseCodeException(-404, "啥都木有")] * 3 + [NetworkException(503, "Service Unavailable")] * 2)
+
+    async def failing_videos(uid, limit=10):
+        raise next(errors)
+
+    async def failing_rss(url, state):
+        raise RuntimeError("rsshub down")
+
+    monkeypatch.setattr(fetcher_module.bilibili_service, "fetch_user_videos_async", failing_videos)
+    monkeypatch.setattr(source_fetcher, "_fetch_rss", failing_rss)
+    monkeypatch.setattr(fetcher_module, "source_breakers", CircuitBreaker("source", threshold=100, cooldown=3600))
+    monkeypatch.setattr(fetcher_module, "host_breakers", CircuitBreaker("host", threshold=2, cooldown=3600))
+    configs = [SourceConfig(id=i, type="bilibili_user", name="UP", config_data={"uid": str(i)}, enabled=True)
+               for i in range(1, 6)]
+
+    # A deleted UP (-404) is the source's failure, not the host's
+    for config in configs[:3]:
+        asyncio.run(source_fetcher.fetch(config, {}))
+    assert fetcher_module.source_breakers.snapshot()["bili:3"]["failures"] == 1
+    assert fetcher_module.BILIBILI_API_HOST not in fetcher_module.host_breakers.snapshot()
+
+    # 5xx from the API does count against the host
+    for config in configs[3:]:
+        asyncio.run(source_fetcher.fetch(config, {}))
+    assert fetcher_module.host_breakers.snapshot()[fetcher_module.BILIBILI_API_HOST]["state"] == "open"
@@ -2,6 +2,7 @@ import pytest
 from backend.services.crawler import crawler_service
 from backend.models import SourceConfig
 from datetime import datetime
+from sqlmodel import select
 
 def test_crawler_bilibili():
     # Mock config
@@ -39,3 +40,169 @@ def test_crawler_mixed():
     t1 = datetime.fromisoformat(items[0]["published_at"])
     t2 = datetime.fromisoformat(items[-1]["published_at"])
     assert t1 >= t2
+
+def test_fetch_feed_runs_sources_concurrently(monkeypatch):
+    import asyncio
+    import time
+    from backend.services.bilibili_service import bilibili_service
+
+    async def fake_videos(uid, limit=10):
+        await asyncio.sleep(0.2)
+        return [{"original_id": f"BV{uid}", "title": f"v{uid}", "metrics": {"views": 10}, "source": "Bilibili"}]
+
+    async def fake_details(bvid):
+        await asyncio.sleep(0.2)
+        return {"metrics": {"views": 100}, "tags": ["t"], "title": f"{bvid}-detail"}
+
+    monkeypatch.setattr(bilibili_service, "fetch_user_videos_async", fake_videos)
+    monkeypatch.setattr(bilibili_service, "get_video_details_async", fake_details)
+
+    configs = [
+        SourceConfig(id=i, type="bilibili_user", name=f"UP{i}", config_data={"uid": str(i)}, enabled=True)
+        for i in range(1, 4)
+    ]
+    start = time.perf_counter()
+    items = crawler_service.fetch_feed(configs)
+    elapsed = time.perf_counter() - start
+
+    assert len(items) == 3
+    assert all(i["metrics"]["views"] == 100 and i["labels"] == ["t"] for i in items)
+    # 3 sources x (list + details) serially would take ~1.2s
+    assert elapsed < 0.8
+
+def test_fetch_feed_dedupes_shared_sources(monkeypatch):
+    from backend.services.bilibili_service import bilibili_service
+    calls = []
+
+    async def fake_videos(uid, limit=10):
+        calls.append(uid)
+        return [{"original_id": "BV1", "title": "v", "metrics": {"views": 50}, "source": "Bilibili"}]
+
+    async def fake_details(bvid):
+        return {}
+
+    monkeypatch.setattr(bilibili_service, "fetch_user_videos_async", fake_videos)
+    monkeypatch.setattr(bilibili_service, "get_video_details_async", fake_details)
+
+    shared = {"uid": "42"}
+    c1 = SourceConfig(id=1, persona_id=1, type="bilibili_user", name="A", config_data=shared, enabled=True)
+    c2 = SourceConfig(id=2, persona_id=2, type="bilibili_user", name="B", config_data=shared, enabled=True, views_threshold=100)
+    c3 = SourceConfig(id=3, persona_id=2, type="bilibili_user", name="C", config_data=shared, enabled=True)
+    items = crawler_service.fetch_feed([c1, c2, c3])
+
+    assert calls == [42]
+    # c2's threshold filters its copy only; author comes from each config
+    assert sorted(i["author"] for i in items) == ["A", "C"]
+    assert {i["source_config_id"] for i in items} == {1, 3}
+
+def test_sync_uses_watermark_for_enriched_items(monkeypatch, session):
+    from backend.models import Persona, SourceWatermark
+    from backend.services.bilibili_service import bilibili_service
+    from backend.services.cache_service import cache_service
+    detail_calls = []
+
+    async def fake_videos(uid, limit=10):
+        return [{"original_id": "BV1", "title": "v", "metrics": {"views": 50, "likes": 0}, "published_at": "2026-01-01T00:00:00", "source": "Bilibili"}]
+
+    async def fake_details(bvid):
+        detail_calls.append(bvid)
+        return {"metrics": {"views": 60, "likes": 7}, "tags": ["tag"], "title": "full title"}
+
+    monkeypatch.setattr(bilibili_service, "fetch_user_videos_async", fake_videos)
+    monkeypatch.setattr(bilibili_service, "get_video_details_async", fake_details)
+
+    persona = Persona(name="P")
+    session.add(persona)
+    session.commit()
+    session.add(SourceConfig(persona_id=persona.id, type="bilibili_user", name="UP", config_data={"uid": "7"}))
+    session.commit()
+    session.refresh(persona)
+
+    crawler_service.sync_all_sources(session)
+    crawler_service.sync_all_sources(session)
+
+    assert detail_calls == ["BV1"]
+    watermark = session.exec(select(SourceWatermark)).one()
+    assert watermark.source_key == "bili:7"
+    assert list(watermark.enriched) == ["BV1"]
+    item = cache_service.get(f"discovery:persona:{persona.id}:v0")[0]
+    # Listing views are fresh, likes/tags/title come from the stored details
+    assert item["metrics"]["views"] == 50 and item["metrics"]["likes"] == 7
+    assert item["labels"] == ["tag"] and item["title"] == "full title"
+
+def test_rebuild_reuses_stored_items_and_fetches_only_new_sources(monkeypatch, session):
+    import asyncio
+    from backend.models import SourceWatermark
+    from backend.services.crawler import group_by_source
+    fetched = []
+
+    async def fake_fetch(config, limits, state):
+        fetched.append(config.name)
+        return [{"original_id": "BV9", "title": "new"}]
+
+    monkeypatch.setattr(crawler_service, "_fetch_limited", fake_fetch)
+    session.add(SourceWatermark(source_key="rss:https://e.com/rss", last_items=[{"original_id": "a", "title": "stored"}]))
+    session.commit()
+    configs = [
+        SourceConfig(persona_id=1, type="rss_feed", name="Blog", config_data={"url": "https://e.com/rss"}),
+        SourceConfig(persona_id=1, type="bilibili_user", name="UP", config_data={"uid": "9"}),
+    ]
+
+    items = asyncio.run(crawler_service._fetch_groups(session, group_by_source(configs), reuse_stored=True))
+
+    assert fetched == ["UP"]
+    assert items["rss:https://e.com/rss"] == [{"original_id": "a", "title": "stored"}]
+    assert items["bili:9"][0]["title"] == "new"
+
+def test_rss_not_modified_reuses_previous_items(monkeypatch):
+    import asyncio
+    from backend.services.rss_service import rss_service
+    from backend.services.source_fetcher import source_fetcher
+    sent = []
+
+    def fake_fetch(url, etag=None, last_modified=None):
+        sent.append((etag, last_modified))
+        return {"not_modified": True, "content": None, "etag": etag, "last_modified": last_modified}
+
+    def fail_parse(content):
+        raise AssertionError("304 must not be parsed")
+
+    monkeypatch.setattr(rss_service, "fetch", fake_fetch)
+    monkeypatch.setattr(rss_service, "parse", fail_parse)
+
+    config = SourceConfig(id=5, type="rss_feed", name="Blog", config_data={"url": "https://example.com/rss"}, enabled=True)
+    state = {"etag": '"v1"', "last_modified": "Sat, 17 Oct 2026 00:00:00 GMT",
+             "last_items": [{"original_id": "a", "title": "A", "metrics": {}}]}
+    items = asyncio.run(source_fetcher.fetch(config, state))
+
+    assert sent == [('"v1"', "Sat, 17 Oct 2026 00:00:00 GMT")]
+    assert [i["original_id"] for i in items] == ["a"]
+    assert items[0] is not state["last_items"][0]
+
+
+def test_rss_fetch_and_parse_run_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    from backend.services import rss_service as rss_module
+    from backend.services.rss_service import rss_service
+    from backend.services.source_fetcher import source_fetcher
+    threads = {}
+
+    def fake_fetch(url, etag=None, last_modified=None):
+        threads["fetch"] = threading.current_thread()
+        return {"not_modified": False, "content": b"<rss/>", "etag": None, "last_modified": None}
+
+    def fake_parse(content):
+        threads["parse"] = threading.current_thread()
+        return [{"original_id": "a", "title": "A", "metrics": {}}]
+
+    monkeypatch.setattr(rss_module, "PARSE_WORKERS", 0)
+    monkeypatch.setattr(rss_service, "fetch", fake_fetch)
+    monkeypatch.setattr(rss_service, "parse", fake_parse)
+
+    async def fetch():
+        threads["loop"] = threading.current_thread()
+        return await source_fetcher._fetch_rss("https://example.com/rss", {})
+
+    assert [i["original_id"] for i in asyncio.run(fetch())] == ["a"]
+    assert threads["fetch"] is not threads["loop"] and threads["parse"] is not threads["loop"]
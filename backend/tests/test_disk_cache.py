@@ -0,0 +1,47 @@
+import time
+from backend.services.disk_cache import DiskCache, PersistentLocalCache
+
+
+def test_write_through_survives_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = PersistentLocalCache(DiskCache(path), sweep_interval=0)
+    cache.set("discovery:persona:1", b"feed", expire=60)
+    cache.set("short", b"x", expire=1)
+    cache.set("index", {"not": "bytes"}, expire=60)
+
+    # A new process: memory is empty, entries are read back lazily from disk
+    restarted = PersistentLocalCache(DiskCache(path), sweep_interval=0)
+    assert restarted.get("discovery:persona:1") == b"feed"
+    assert restarted.stats()["disk_hits"] == 1
+    assert restarted.get("discovery:persona:1") == b"feed"
+    assert restarted.stats()["disk_hits"] == 1  # now served from memory
+    assert restarted.get("index") is None
+    assert 0 < restarted.inspect("discovery:persona:1")["ttl"] <= 60
+
+    time.sleep(1.1)
+    assert restarted.get("short") is None
+    restarted.delete("discovery:persona:1")
+    assert PersistentLocalCache(DiskCache(path), sweep_interval=0).get("discovery:persona:1") is None
+
+
+def test_memory_eviction_keeps_disk_copy(tmp_path):
+    cache = PersistentLocalCache(DiskCache(str(tmp_path / "cache.db")), max_entries=1, sweep_interval=0)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("a") == b"1"
+    assert cache.keys() == ["a", "b"]
+
+
+def test_writes_from_another_process_are_picked_up(tmp_path):
+    path = str(tmp_path / "cache.db")
+    worker = PersistentLocalCache(DiskCache(path), sweep_interval=0)
+    api = PersistentLocalCache(DiskCache(path), memory_ttl=1, sweep_interval=0)
+    worker.set("discovery:persona:1:v0", b"old", expire=7 * 86400)
+    assert api.get("discovery:persona:1:v0") == b"old"
+
+    # The worker's next sync: the API's memory copy expires after memory_ttl, not the feed's 7 days
+    worker.set("discovery:persona:1:v0", b"new", expire=7 * 86400)
+    time.sleep(1.1)
+    assert api.get("discovery:persona:1:v0") == b"new"
+    assert api.inspect("discovery:persona:1:v0")["ttl"] > 86400
@@ -0,0 +1,146 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.services.cache_service import cache_service
+from backend.services.feed_store import feed_store, CursorExpired
+from backend.services.cache_keys import feed_key
+
+
+def make_feed(n=30):
+    return [{
+        "original_id": f"v{i}",
+        "title": f"Item {i}",
+        "source": "Bilibili" if i % 2 else "RSS",
+        "metrics": {"views": i * 10},
+        "score": 90 - i,
+        "published_at": f"2026-10-{i % 28 + 1:02d}T00:00:00",
+    } for i in range(n)]
+
+
+def collect(feed, **query):
+    pages, cursor = [], None
+    while True:
+        page = feed_store.page(feed, cursor=cursor, **query)
+        pages.append([i["original_id"] for i in page["items"]])
+        cursor = page["next_cursor"]
+        if not cursor:
+            return pages
+
+
+def test_cursor_pages_filter_and_sort():
+    feed = make_feed()
+    feed_store.replace(feed_key(901, 0), feed)
+
+    pages = collect(feed_key(901, 0), sort="views", limit=7)
+    assert [len(p) for p in pages] == [7, 7, 7, 7, 2]
+    assert sum(pages, []) == [f"v{i}" for i in range(29, -1, -1)]
+
+    # Filters are applied on the index: odd items only, views >= 150
+    ids = sum(collect(feed_key(901, 0), sort="published", source="Bilibili", min_views=150, limit=4), [])
+    expected = sorted((i for i in feed if i["source"] == "Bilibili" and i["metrics"]["views"] >= 150),
+                      key=lambda i: i["published_at"], reverse=True)
+    assert ids == [i["original_id"] for i in expected]
+    # total counts what the filters let through, not the whole feed
+    assert feed_store.page(feed_key(901, 0), source="Bilibili", min_views=150, limit=4)["total"] == len(expected)
+    assert feed_store.page(feed_key(901, 0), sort="views", min_views=150, limit=4)["total"] == 15
+
+    asc = feed_store.page(feed_key(901, 0), sort="score", desc=False, limit=3)
+    assert [i["score"] for i in asc["items"]] == [61, 62, 63]
+    assert asc["total"] == 30
+
+
+def test_refresh_expires_old_cursor_in_memory_backend():
+    feed_store.replace(feed_key(902, 0), make_feed(5))
+    cursor = feed_store.page(feed_key(902, 0), limit=2)["next_cursor"]
+    feed_store.replace(feed_key(902, 0), make_feed(3))
+    with pytest.raises(CursorExpired):
+        feed_store.page(feed_key(902, 0), limit=2, cursor=cursor)
+    assert feed_store.page(feed_key(903, 0)) is None
+
+
+def test_memory_index_is_stored_serialized():
+    feed_store.replace(feed_key(908, 0), make_feed(3))
+    assert isinstance(cache_service._local_cache.get(f"{feed_key(908, 0)}:index"), bytes)
+
+    # Each page decodes its own items: editing one does not leak into the next read
+    feed_store.page(feed_key(908, 0), limit=1)["items"][0]["title"] = "edited"
+    assert feed_store.page(feed_key(908, 0), limit=1)["items"][0]["title"] != "edited"
+
+
+def test_feed_endpoint_pages_and_keeps_list_shape(client: TestClient, monkeypatch):
+    from backend.services.crawler import crawler_service
+    monkeypatch.setattr(crawler_service, "refresh_persona", lambda *args: None)
+    cache_service.set(feed_key(904, 0), make_feed(5))
+
+    # Legacy shape without params
+    assert len(client.get("/api/v1/dashboard/feed", params={"persona_id": 904}).json()) == 5
+
+    # Indexed lazily from the blob on first paged read
+    page = client.get("/api/v1/dashboard/feed", params={"persona_id": 904, "limit": 2, "sort": "views"}).json()
+    assert [i["original_id"] for i in page["items"]] == ["v4", "v3"]
+    rest = client.get("/api/v1/dashboard/feed", params={"persona_id": 904, "sort": "views", "cursor": page["next_cursor"]}).json()
+    assert [i["original_id"] for i in rest["items"]] == ["v2", "v1", "v0"]
+    assert rest["next_cursor"] is None
+
+    resp = client.get("/api/v1/dashboard/feed", params={"persona_id": 904, "cursor": "gone.2"})
+    assert resp.status_code == 410
+
+
+def test_stale_feed_is_served_and_refreshed_once(client: TestClient, session, monkeypatch):
+    from backend.models import Persona, SourceConfig
+    from backend.services import feed_store as store_module
+    from backend.services.crawler import crawler_service
+    refreshed = []
+    monkeypatch.setattr(crawler_service, "refresh_persona", lambda pid, name, configs, version: refreshed.append(pid))
+    for pid in (905, 906):
+        session.add(Persona(id=pid, name=f"P{pid}"))
+        session.add(SourceConfig(persona_id=pid, type="rss_feed", name="Blog", config_data={"url": "https://e.com/rss"}))
+    session.commit()
+
+    # Missing feed: empty response, one refresh scheduled
+    assert client.get("/api/v1/dashboard/feed", params={"persona_id": 905}).json() == []
+    assert client.get("/api/v1/dashboard/feed", params={"persona_id": 905}).json() == []
+    assert refreshed == [905]
+
+    # Fresh feed: no refresh, freshness reported
+    cache_service.set(feed_key(906, 0), make_feed(2))
+    feed_store.mark_published(feed_key(906, 0))
+    resp = client.get("/api/v1/dashboard/feed", params={"persona_id": 906})
+    assert len(resp.json()) == 2 and resp.headers["X-Feed-Stale"] == "0"
+    assert refreshed == [905]
+
+    # Past the soft expiry: stale data still served, refresh scheduled
+    monkeypatch.setattr(store_module, "FEED_SOFT_TTL", -1)
+    feed_store.mark_published(feed_key(906, 0))
+    resp = client.get("/api/v1/dashboard/feed", params={"persona_id": 906, "limit": 1})
+    assert resp.json()["freshness"]["stale"] is True
+    assert len(resp.json()["items"]) == 1
+    assert refreshed == [905, 906]
+
+
+def test_source_edit_moves_persona_to_new_cache_version(client: TestClient, session, monkeypatch):
+    from backend.models import Persona, SourceConfig
+    from backend.services.cache_keys import persona_version, picks_key
+    from backend.services.crawler import crawler_service
+    rebuilds = []
+    monkeypatch.setattr(crawler_service, "refresh_persona",
+                        lambda pid, name, configs, version, refetch=True: rebuilds.append((pid, version, refetch)))
+    session.add(Persona(id=907, name="P907"))
+    session.add(SourceConfig(persona_id=907, type="rss_feed", name="Blog", config_data={"url": "https://e.com/rss"}))
+    session.commit()
+    cache_service.set(feed_key(907, 0), make_feed(2))
+    feed_store.mark_published(feed_key(907, 0))
+    cache_service.set(picks_key(907, 0, "last"), [{"title": "old pick"}])
+    assert len(client.get("/api/v1/dashboard/feed", params={"persona_id": 907}).json()) == 2
+
+    sources = [
+        {"type": "rss_feed", "name": "Blog", "config_data": {"url": "https://e.com/rss"}},
+        {"type": "bilibili_user", "name": "UP", "config_data": {"uid": "7"}},
+    ]
+    assert client.put("/api/v1/personas/907/sources", json=sources).status_code == 200
+
+    # Old feed and picks are no longer reachable; the rebuild reuses stored items and holds the refresh lock
+    assert persona_version(907) == 1
+    assert rebuilds == [(907, 1, False)]
+    assert client.get("/api/v1/dashboard/feed", params={"persona_id": 907}).json() == []
+    assert rebuilds == [(907, 1, False)]
+    assert cache_service.get(picks_key(907, 1, "last")) is None
@@ -0,0 +1,117 @@
+import pytest
+from backend.services.job_queue import SQLiteJobQueue
+
+
+def make_queue(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / "queue.db"))
+    jobs = [{"key": "bili:1", "config": {"type": "bilibili_user"}}, {"key": "rss:u", "config": {"type": "rss_feed"}}]
+    queue.create_sync("s1", {"personas": {}}, jobs)
+    return queue
+
+
+def test_lease_and_complete_finishes_once(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.lease("w1")
+    second = queue.lease("w2")
+    assert {first["key"], second["key"]} == {"bili:1", "rss:u"}
+    assert queue.lease("w3") is None
+
+    assert queue.complete("s1", first["key"], [{"title": "a"}]) is False
+    assert queue.complete("s1", second["key"], []) is True
+    # A duplicate completion (re-leased job) must not finish the sync again
+    assert queue.complete("s1", second["key"], []) is False
+    assert queue.get_results("s1") == {first["key"]: [{"title": "a"}], second["key"]: []}
+    assert queue.status("s1") == {"sync_id": "s1", "total": 2, "remaining": 0, "finished": False}
+
+
+def test_expired_lease_is_released(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.lease("dead-worker", lease_seconds=-1)
+    queue.lease("dead-worker", lease_seconds=-1)
+    assert queue.lease("w2") is not None
+
+
+def test_worker_assembles_feeds_after_last_job(tmp_path, monkeypatch):
+    from backend import worker
+    from backend.services.crawler import crawler_service
+    from backend.services.cache_service import cache_service
+
+    queue = SQLiteJobQueue(str(tmp_path / "queue.db"))
+    config = {"id": 9, "persona_id": 77, "type": "rss_feed", "name": "Blog",
+              "config_data": {"url": "https://example.com/rss"}, "enabled": True, "views_threshold": 0}
+    queue.create_sync("s2", {"personas": {"77": [config]}, "names": {"77": "P"}},
+                      [{"key": "rss:https://example.com/rss", "config": config}])
+    monkeypatch.setattr(crawler_service, "sync_source",
+                        lambda session, c: [{"original_id": "x", "title": "X", "metrics": {}, "published_at": "2026"}])
+
+    worker.run_job(queue, queue.lease("w1"))
+
+    feed = cache_service.get("discovery:persona:77:v0")
+    assert [i["original_id"] for i in feed] == ["x"]
+    assert feed[0]["author"] == "Blog" and feed[0]["source"] == "RSS"
+    assert queue.status("s2")["finished"] is True
+
+
+def test_redis_lease_is_atomic_and_abandoned_runs_are_dropped():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa") # Lua scripting in fakeredis
+    from backend.services.job_queue import RedisJobQueue
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    queue = RedisJobQueue(client)
+    queue.create_sync("s1", {"personas": {}}, [{"key": "bili:1", "config": {}}, {"key": "rss:u", "config": {}}])
+
+    # Leasing moves the id from the pending list to the leases set in one step
+    job = queue.lease("dead-worker", lease_seconds=-1)
+    assert client.llen("syncq:pending") == 1 and client.zcard("syncq:leases") == 1
+    # Expired lease: requeued behind the other job
+    assert queue.lease("w2")["key"] == "rss:u"
+    assert queue.lease("w2")["key"] == job["key"]
+    assert queue.lease("w2") is None
+
+    # s1 never finished and its run expired: its jobs go when the next sync is created
+    client.delete("syncq:run:s1")
+    queue.create_sync("s2", {"personas": {}}, [{"key": "bili:1", "config": {}}])
+    assert client.hkeys("syncq:jobs") == ["s2|bili:1"] and client.zcard("syncq:leases") == 0
+    assert queue.lease("w2")["sync_id"] == "s2"
+
+
+def test_worker_feeds_reach_the_api_through_the_disk_cache(tmp_path, monkeypatch):
+    import time
+    from backend import worker
+    from backend.services import job_queue
+    from backend.services.cache_service import CacheService, cache_service
+    from backend.services.crawler import crawler_service
+    from backend.services.disk_cache import DiskCache, PersistentLocalCache
+    from backend.services.local_cache import LocalCache
+
+    # Redis off, API and worker sharing one CACHE_DISK_PATH
+    path = str(tmp_path / "cache.db")
+    monkeypatch.setattr(cache_service, "_local_cache", PersistentLocalCache(DiskCache(path), sweep_interval=0))
+    api = CacheService()
+    api.client = None
+    api._local_cache = PersistentLocalCache(DiskCache(path), memory_ttl=1, sweep_interval=0)
+    api.set("discovery:persona:78:v0", [{"original_id": "api-old"}])
+    assert api.get("discovery:persona:78:v0") == [{"original_id": "api-old"}]
+
+    queue = SQLiteJobQueue(str(tmp_path / "queue.db"))
+    config = {"id": 10, "persona_id": 78, "type": "rss_feed", "name": "Blog",
+              "config_data": {"url": "https://example.com/rss"}, "enabled": True, "views_threshold": 0}
+    queue.create_sync("s3", {"personas": {"78": [config]}, "names": {"78": "P"}},
+                      [{"key": "rss:https://example.com/rss", "config": config}])
+    monkeypatch.setattr(crawler_service, "sync_source",
+                        lambda session, c: [{"original_id": "worker-new", "title": "X", "metrics": {}, "published_at": "2026"}])
+    worker.run_job(queue, queue.lease("w1"))
+
+    time.sleep(1.1)
+    assert [i["original_id"] for i in api.get("discovery:persona:78:v0")] == ["worker-new"]
+    assert api.get("discovery:persona:78:v0:meta") is not None
+    # Paged reads use the index, written to the same file
+    assert [i["original_id"] for i in api.get("discovery:persona:78:v0:index")["items"].values()] == ["worker-new"]
+
+    # A memory-only cache cannot be shared: queue mode is refused at startup
+    job_queue.check_sync_mode("queue")
+    monkeypatch.setattr(cache_service, "_local_cache", LocalCache(sweep_interval=0))
+    with pytest.raises(RuntimeError):
+        job_queue.check_sync_mode("queue")
+    job_queue.check_sync_mode("local")
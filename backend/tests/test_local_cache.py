@@ -0,0 +1,333 @@
+import json
+import threading
+import time
+from backend.services.local_cache import LocalCache
+from backend.services.cache_service import CacheService
+
+
+def test_ttl_enforced_on_read_and_by_sweep():
+    cache = LocalCache(sweep_interval=0)
+    cache.set("a", b"1", expire=1)
+    cache.set("b", b"2", expire=1)
+    cache.set("c", b"3")
+    assert cache.get("a") == b"1"
+
+    time.sleep(1.1)
+    assert cache.get("a") is None
+    assert cache.sweep() == 1  # "b"
+    assert cache.get("c") == b"3"
+    stats = cache.stats()
+    assert stats["expirations"] == 2
+    assert stats["entries"] == 1
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    cache = LocalCache(max_entries=2, max_bytes=10, sweep_interval=0)
+    cache.set("a", b"aaa")
+    cache.set("b", b"bbb")
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", b"ccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaa"
+
+    cache.set("d", b"dddddddd")  # 3 + 8 bytes > 10: evicts down to fit
+    assert cache.stats()["bytes"] <= 10
+    assert cache.get("d") == b"dddddddd"
+    assert cache.stats()["evictions"] == 3
+
+    cache.set("huge", b"x" * 11)  # never stored
+    assert cache.get("huge") is None
+
+
+def test_fallback_returns_copies():
+    service = CacheService.__new__(CacheService)
+    service.client = None
+    service._local_cache = LocalCache(sweep_interval=0)
+
+    service.set("feed", [{"title": "t"}], expire=60)
+    service.get("feed")[0]["title"] = "mutated"
+    assert service.get("feed") == [{"title": "t"}]
+    service.delete("feed")
+    assert service.get("feed") is None
+
+
+class FakeRedis:
+    """Just enough of redis.Redis for the L1 tests."""
+
+    def __init__(self):
+        self.data, self.gets, self.published = {}, 0, []
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def publish(self, channel, message):
+        self.published.append(json.loads(message))
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key) or 0) + 1).encode()
+        return int(self.data[key])
+
+    def mget(self, keys):
+        self.gets += 1
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client, self.commands = client, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.commands.append((name, args, kwargs))
+
+    def execute(self):
+        self.client.executes = getattr(self.client, "executes", 0) + 1
+        for name, args, kwargs in self.commands:
+            getattr(self.client, name)(*args, **kwargs)
+
+
+def make_two_tier(client):
+    service = CacheService.__new__(CacheService)
+    service.client = client
+    service._local_cache = LocalCache(sweep_interval=0)
+    service._l1 = LocalCache(sweep_interval=0)
+    service._l1_epoch = 0
+    service._l1_guard = threading.Lock()
+    service._add_lock = threading.Lock()
+    service._instance_id = "self"
+    return service
+
+
+def test_l1_serves_hot_keys_and_drops_remote_invalidations():
+    client = FakeRedis()
+    service = make_two_tier(client)
+    client.data["discovery:persona:1"] = json.dumps([{"title": "old"}])
+
+    assert service.get("discovery:persona:1") == [{"title": "old"}]
+    assert service.get("discovery:persona:1") == [{"title": "old"}]
+    assert client.gets == 1
+
+    # Another worker rewrote the feed
+    client.data["discovery:persona:1"] = json.dumps([{"title": "new"}])
+    service._on_invalidation({"origin": "self", "key": "discovery:persona:1"})
+    assert service.get("discovery:persona:1") == [{"title": "old"}]
+    service._on_invalidation({"origin": "other", "key": "discovery:persona:1"})
+    assert service.get("discovery:persona:1") == [{"title": "new"}]
+
+    # Local writes update L1 directly and broadcast; non-hot keys never touch L1
+    service.set("discovery:persona:1", [{"title": "mine"}])
+    assert client.published[-1] == {"origin": "self", "key": "discovery:persona:1"}
+    assert service.get("discovery:persona:1") == [{"title": "mine"}]
+    service.set("bili:video:BV1:meta", {"aid": 1})
+    service.get("bili:video:BV1:meta")
+    assert service._l1.stats()["entries"] == 1
+
+
+def test_local_write_during_a_read_is_not_undone_by_the_l1_fill():
+    client = FakeRedis()
+    service = make_two_tier(client)
+    client.data["discovery:persona:1"] = json.dumps([{"title": "old"}])
+    slow_read = client.get
+
+    def get_then_write(key):
+        data = slow_read(key)
+        # Another thread of this process writes while our read is on the wire
+        client.get = slow_read
+        service.delete("discovery:persona:1")
+        return data
+
+    client.get = get_then_write
+    assert service.get("discovery:persona:1") == [{"title": "old"}]
+    assert service.get("discovery:persona:1") is None
+
+    client.data["discovery:persona:1"] = json.dumps([{"title": "old"}])
+
+    def get_then_set(key):
+        data = slow_read(key)
+        client.get = slow_read
+        service.set("discovery:persona:1", [{"title": "new"}])
+        return data
+
+    client.get = get_then_set
+    assert service.get("discovery:persona:1") == [{"title": "old"}]
+    assert service.get("discovery:persona:1") == [{"title": "new"}]
+
+
+def test_persona_version_is_served_from_l1_and_survives_eviction():
+    client = FakeRedis()
+    service = make_two_tier(client)
+    assert service.incr("persona:1:version") == 1
+    assert client.published[-1] == {"origin": "self", "key": "persona:1:version"}
+    # Feed reads check the version every time: no Redis round trip for it
+    assert service.get("persona:1:version") == 1 and client.gets == 0
+    service._on_invalidation({"origin": "other", "key": "persona:1:version"})
+    client.incr("persona:1:version")
+    assert service.get("persona:1:version") == 2 and client.gets == 1
+
+    # Without Redis the counter lives in the LRU fallback: other entries cannot evict it
+    fallback = make_two_tier(None)
+    fallback._local_cache = LocalCache(max_entries=2, sweep_interval=0)
+    fallback.incr("persona:1:version")
+    for i in range(5):
+        fallback.set(f"bili:video:BV{i}:stat", {"views": i}, expire=60)
+    assert fallback.get("persona:1:version") == 1
+    assert fallback.get("bili:video:BV0:stat") is None
+
+
+def test_mget_and_pipeline_batch_round_trips():
+    client = FakeRedis()
+    service = make_two_tier(client)
+    with service.pipeline() as pipe:
+        pipe.set("discovery:persona:1:v0", [{"title": "a"}])
+        pipe.set("discovery:persona:2:v0", [{"title": "b"}])
+        pipe.set("persona:1:version", 3)
+    assert client.executes == 1
+    assert [m["key"] for m in client.published] == ["discovery:persona:1:v0", "discovery:persona:2:v0", "persona:1:version"]
+
+    # L1 was filled by the pipeline: only the other keys go to Redis, in one MGET
+    assert service.mget(["discovery:persona:1:v0", "persona:1:version", "missing"]) == [[{"title": "a"}], 3, None]
+    assert client.gets == 1
+
+    fallback = make_two_tier(None)
+    fallback.mset({"a": 1, "b": [2]}, expire=60)
+    assert fallback.mget(["b", "a", "c"]) == [[2], 1, None]
+
+
+def test_l1_hands_every_caller_its_own_copy():
+    client = FakeRedis()
+    service = make_two_tier(client)
+    client.data["discovery:persona:1"] = json.dumps([{"title": "feed", "labels": ["a"]}])
+
+    # Filled from Redis, then served from L1: editing either result leaves the cached feed intact
+    service.get("discovery:persona:1")[0]["labels"].append("edited")
+    service.get("discovery:persona:1")[0]["title"] = "edited"
+    service.mget(["discovery:persona:1"])[0].clear()
+    assert service.get("discovery:persona:1") == [{"title": "feed", "labels": ["a"]}]
+    assert client.gets == 1
+
+
+def test_async_client_falls_back_without_redis():
+    import asyncio
+    from backend.services.cache_service import AsyncCacheService
+    service = make_two_tier(None)
+    aio = AsyncCacheService(service)
+
+    async def run():
+        await aio.set("bili:video:BV1:stat", {"views": 1}, expire=60)
+        return await aio.mget(["bili:video:BV1:stat", "bili:video:BV1:meta"])
+
+    assert asyncio.run(run()) == [{"views": 1}, None]
+    assert service.get("bili:video:BV1:stat") == {"views": 1}
+
+
+def test_async_client_is_closed_when_the_run_ends(monkeypatch):
+    from backend.services import cache_service as cache_module
+    closed = []
+
+    class FakeAsyncRedis:
+        def __init__(self, connection_pool):
+            pass
+
+        async def mget(self, keys):
+            return [None] * len(keys)
+
+        async def aclose(self, close_connection_pool=None):
+            closed.append(close_connection_pool)
+
+    monkeypatch.setattr(cache_module.aioredis, "ConnectionPool", lambda **kwargs: object())
+    monkeypatch.setattr(cache_module.aioredis, "Redis", FakeAsyncRedis)
+    service = make_two_tier(FakeRedis())
+    service._redis_kwargs = {}
+    aio = cache_module.AsyncCacheService(service)
+
+    async def fetch():
+        return await aio.get("bili:video:BV1:stat")
+
+    # One client per asyncio.run(), closed with its pool when the run ends
+    assert aio.run(fetch()) is None and aio.run(fetch()) is None
+    assert closed == [True, True] and len(aio._clients) == 0
+
+
+def test_async_client_never_blocks_the_loop_on_redis(monkeypatch):
+    import asyncio
+    from backend.services import cache_service as cache_module
+    from backend.services.cache_codec import codec
+
+    class DownAsyncRedis:
+        def __init__(self, connection_pool):
+            pass
+
+        async def mget(self, keys):
+            raise ConnectionError("redis down")
+
+        async def aclose(self, close_connection_pool=None):
+            pass
+
+    monkeypatch.setattr(cache_module.aioredis, "ConnectionPool", lambda **kwargs: object())
+    monkeypatch.setattr(cache_module.aioredis, "Redis", DownAsyncRedis)
+    client = FakeRedis()
+    service = make_two_tier(client)
+    service._redis_kwargs = {}
+    service._local_cache.set("bili:video:BV1:stat", codec.encode({"views": 1}), 60)
+    # Not connected yet: the first use connects (sync ping) in a thread
+    service._connected, service._connect_lock, threads = False, threading.Lock(), []
+
+    def connect():
+        threads.append(threading.current_thread())
+        service.client = client
+
+    service._connect = connect
+    aio = cache_module.AsyncCacheService(service)
+
+    async def fetch():
+        return threading.current_thread(), await aio.mget(["bili:video:BV1:stat", "bili:video:BV2:stat"])
+
+    loop_thread, values = aio.run(fetch())
+    assert threads and threads[0] is not loop_thread
+    # The async error falls back to the local cache, without a blocking retry on the sync client
+    assert values == [{"views": 1}, None] and client.gets == 0
+
+
+def test_redis_is_contacted_on_first_use_not_at_import(monkeypatch):
+    monkeypatch.setenv("REDIS_PORT", "1")
+    monkeypatch.setattr("backend.services.cache_service.CACHE_DISK_PATH", "")
+    service = CacheService()
+    assert not service._connected
+    assert service.client is None and service._connected
+    service.set("k", 1, expire=60)
+    assert service.get("k") == 1
+
+
+def test_prefix_metrics_and_admin_endpoint(client, session):
+    from backend.models import Persona
+    from backend.services.cache_metrics import CacheMetrics, key_prefix
+    from backend.services.cache_service import cache_service
+
+    assert key_prefix("ai:picks:persona:1:hash:ab") == "ai:picks:"
+    assert key_prefix("syncq:jobs") == "syncq:"
+    metrics = CacheMetrics()
+    metrics.record("get", "ai:picks:persona:1:hash:ab", "redis", 0.0004)
+    metrics.record("get", "ai:picks:persona:1:hash:cd", "miss", 0.003)
+    metrics.error("get", "ai:picks:persona:1:hash:cd")
+    snap = metrics.snapshot()["ai:picks:"]["get"]
+    assert snap["hit_rate"] == 0.5 and snap["errors"] == 1
+    assert snap["latency_ms"]["buckets"]["<=0.5"] == 1 and snap["latency_ms"]["buckets"]["<=5"] == 1
+
+    session.add(Persona(id=950, name="Admin"))
+    session.commit()
+    cache_service.set("discovery:persona:950:v0", [{"title": "t"}], expire=600)
+    cache_service.get("discovery:persona:950:v0")
+    info = client.get("/api/v1/admin/cache").json()
+    assert info["backend"] in ("redis", "memory")
+    assert info["metrics"]["discovery:"]["get"]["outcomes"]
+    blob = info["personas"][0]["keys"][0]
+    assert blob["key"] == "discovery:persona:950:v0" and blob["exists"] and 0 < blob["ttl"] <= 600
@@ -0,0 +1,62 @@
+import logging
+import uuid
+from types import SimpleNamespace
+from backend.models import Persona, Topic
+from backend.services.ai_service import ai_service
+from backend.services.prompt_builder import PromptBuilder, Table, Text, estimate_messages, estimate_tokens
+
+
+def test_estimate_counts_cjk_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("选题分析") == 4
+    assert estimate_tokens("AI 选题") == 3
+
+
+def test_table_drops_low_value_columns_before_rows():
+    rows = [{"id": f"t{i}", "title": f"标题{i}", "metrics": {"views": 10 * i, "likes": 0}, "summary": "很长的摘要" * 20}
+            for i in range(10)]
+    table = Table(rows, ["id", "title", "metrics", "summary"], drop_columns=["summary", "metrics"], min_rows=4)
+    assert table.render().splitlines()[:2] == ["id|title|metrics|summary", "t0|标题0||" + "很长的摘要" * 20]
+
+    messages = PromptBuilder("pick_best_topics", budget=40).message("user", "候选：\n", table).build()
+    lines = messages[0]["content"].splitlines()
+    assert lines[1] == "id|title" and len(lines) < 12
+    assert estimate_messages(messages) <= 40
+
+    # Rows go from the end (lowest ranked) and never below min_rows
+    messages = PromptBuilder("pick_best_topics", budget=1).message("user", "候选：\n", table).build()
+    assert messages[0]["content"].splitlines()[-1] == "t3|标题3"
+
+
+def test_builder_trims_lowest_priority_first():
+    persona_rules = "务必使用犀利的语气" * 30
+    messages = (
+        PromptBuilder("analyze_topic", budget=400)
+        .message("system", "规则：", Text(persona_rules, priority=3, min_chars=50))
+        .message("user", "摘要：", Text("背景" * 500, priority=1, min_chars=20))
+        .build()
+    )
+    assert messages[0]["content"] == "规则：" + persona_rules
+    assert messages[1]["content"].endswith("…") and estimate_messages(messages) <= 400
+
+    # Nothing left to trim: over budget, but the fixed text is kept as is
+    assert PromptBuilder("analyze_topic", budget=5).message("system", "固定指令" * 10).build()[0]["content"] == "固定指令" * 10
+
+
+def test_script_prompt_fits_budget_and_usage_is_logged(monkeypatch, caplog):
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs["messages"])
+        usage = SimpleNamespace(prompt_tokens=1234, completion_tokens=56)
+        return SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=SimpleNamespace(content="脚本"))])
+
+    monkeypatch.setattr(ai_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    persona = Persona(name="P", custom_prompt="硬核" * 5000)
+    topic = Topic(original_id="B1", title=f"Budget {uuid.uuid4().hex}", url="u", summary="素材" * 5000)
+
+    with caplog.at_level(logging.INFO, logger="backend.services.ai_service"):
+        assert ai_service.generate_script(topic, {"content_template": "模板" * 5000}, persona, regenerate=True) == "脚本"
+    assert estimate_messages(calls[0]) <= 6000
+    assert "1234 actual" in caplog.text
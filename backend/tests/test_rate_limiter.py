@@ -0,0 +1,37 @@
+import asyncio
+import time
+from backend.services.rate_limiter import AdaptiveRateLimiter
+
+
+def test_aimd_increase_and_decrease():
+    limiter = AdaptiveRateLimiter("test", rate=2.0, max_rate=2.5, increase=0.1, decrease=0.5)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.rate == 2.5  # capped at max_rate
+
+    limiter.on_throttle("HTTP 412")
+    stats = limiter.stats()
+    assert stats["rate"] == 1.25
+    assert stats["throttle_count"] == 1
+    assert stats["throttle_events"][0]["reason"] == "HTTP 412"
+
+
+def test_acquire_paces_requests():
+    limiter = AdaptiveRateLimiter("test", rate=20.0, burst=1)
+
+    async def run():
+        for _ in range(5):
+            await limiter.acquire()
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    # First token is free, the next 4 are spaced 50ms apart
+    assert time.perf_counter() - start >= 0.18
+
+
+def test_throttle_enforces_penalty():
+    limiter = AdaptiveRateLimiter("test", rate=10.0, decrease=0.5, penalty=0.2)
+    limiter.on_throttle("risk control")
+    start = time.perf_counter()
+    asyncio.run(limiter.acquire())
+    assert time.perf_counter() - start >= 0.2
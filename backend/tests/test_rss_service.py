@@ -0,0 +1,73 @@
+import pytest
+from backend.services.rss_service import RssService
+
+DESCRIPTION = (
+    '简介：聊聊新框架<br><img src="https://i0.hdslb.com/a.jpg"><script>track()</script>'
+    "<br>播放量: 1234 点赞：56 评论: 7 硬币: 8 收藏: 9"
+)
+
+
+def test_parse_description_single_pass():
+    summary, thumbnail, metrics = RssService._parse_description(DESCRIPTION)
+    assert summary == "简介：聊聊新框架"
+    assert thumbnail == "https://i0.hdslb.com/a.jpg"
+    assert metrics == {"views": 1234, "likes": 56, "comments": 7, "coins": 8, "stars": 9}
+
+
+def test_lxml_and_bs4_backends_agree():
+    pytest.importorskip("lxml")
+    assert RssService._text_and_image_lxml(DESCRIPTION) == RssService._text_and_image_bs4(DESCRIPTION)
+
+
+def test_parse_description_empty():
+    assert RssService._parse_description("") == ("", None, {})
+    assert RssService._parse_description("   ") == ("", None, {})
+
+
+def test_parse_pool_returns_same_items(monkeypatch):
+    import asyncio
+    from backend.services import rss_service as rss_module
+    from backend.services.source_fetcher import source_fetcher
+
+    feed = (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>T</title>'
+        f"<item><title>a</title><link>https://x/a</link><description><![CDATA[{DESCRIPTION}]]></description></item>"
+        "</channel></rss>"
+    ).encode()
+    inline = asyncio.run(source_fetcher._parse_rss(feed))
+
+    monkeypatch.setattr(rss_module, "PARSE_WORKERS", 1)
+    try:
+        pooled = asyncio.run(source_fetcher._parse_rss(feed))
+    finally:
+        rss_module.shutdown_parse_pool()
+
+    assert pooled == inline
+    assert pooled[0]["metrics"]["views"] == 1234
+
+
+def test_parse_pool_is_created_once(monkeypatch):
+    import threading
+    from backend.services import rss_service as rss_module
+    created = []
+
+    class SlowPool:
+        def __init__(self, **kwargs):
+            created.append(self)
+            threading.Event().wait(0.05) # widen the window between the check and the assignment
+
+        def shutdown(self, **kwargs):
+            pass
+
+    monkeypatch.setattr(rss_module, "PARSE_WORKERS", 1)
+    monkeypatch.setattr(rss_module, "ProcessPoolExecutor", SlowPool)
+    pools = []
+    threads = [threading.Thread(target=lambda: pools.append(rss_module.get_parse_pool())) for _ in range(4)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        rss_module.shutdown_parse_pool()
+    assert len(created) == 1 and all(p is created[0] for p in pools)
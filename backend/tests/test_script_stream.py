@@ -0,0 +1,69 @@
+import asyncio
+import json
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+from backend.api import scripts as scripts_api
+from backend.models import Persona, Topic, Script
+from backend.services.ai_service import ai_service
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_forwards_tokens_and_persists_script(client: TestClient, session: Session, monkeypatch):
+    async def fake_stream(topic, template, persona, extra_prompt, regenerate=False):
+        for text in ("# 标题\n", "[口播台词] ", "你好"):
+            yield text
+
+    monkeypatch.setattr(ai_service, "stream_script", fake_stream)
+    monkeypatch.setattr(scripts_api, "SessionLocal", lambda: Session(session.get_bind()))
+    session.add(Persona(name="P"))
+    topic = Topic(original_id="S1", title="Stream topic", url="u")
+    session.add(topic)
+    session.commit()
+
+    resp = client.post("/api/v1/scripts/generate/stream", json={"topic_id": topic.id})
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(resp.text)
+    assert [e for e, _ in events] == ["token", "token", "token", "done"]
+    assert "".join(d["text"] for e, d in events if e == "token") == "# 标题\n[口播台词] 你好"
+    assert events[-1][1]["content"] == "# 标题\n[口播台词] 你好"
+    assert session.exec(select(Script).where(Script.topic_id == topic.id)).one().content == "# 标题\n[口播台词] 你好"
+
+
+def test_stopping_the_stream_closes_the_upstream_completion(monkeypatch):
+    class FakeStream:
+        closed = False
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content="tok"))])
+
+        async def close(self):
+            FakeStream.closed = True
+
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return FakeStream()
+
+    fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_service, "async_client", fake_client)
+    topic = Topic(original_id="S2", title="T", url="u")
+    persona = Persona(name="P")
+
+    async def read_one():
+        tokens = ai_service.stream_script(topic, {}, persona)
+        first = await tokens.__anext__()
+        await tokens.aclose()  # what the endpoint does when the browser goes away
+        return first
+
+    assert asyncio.run(read_one()) == "tok"
+    assert FakeStream.closed
@@ -0,0 +1,95 @@
+import threading
+import time
+import pytest
+from backend.services.cache_service import CacheService, SINGLE_FLIGHT_POLL
+from backend.services.local_cache import LocalCache
+
+
+def make_service():
+    service = CacheService.__new__(CacheService)
+    service.client = None
+    service._local_cache = LocalCache(sweep_interval=0)
+    service._l1 = None
+    service._add_lock = threading.Lock()
+    service._flights = {}
+    service._flights_guard = threading.Lock()
+    return service
+
+
+def test_concurrent_misses_compute_once():
+    service = make_service()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return ["pick"]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(service.get_or_compute("k", compute))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert results == [["pick"]] * 5
+    assert service._flights == {}
+
+
+def test_waiters_get_previous_value_and_failures_fall_back():
+    service = make_service()
+    service.set("k:last", ["old"])
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(2)
+        return ["new"]
+
+    worker = threading.Thread(target=lambda: service.get_or_compute("k", slow, stale_key="k:last"))
+    worker.start()
+    started.wait(2)
+    assert service.get_or_compute("k", lambda: pytest.fail("computed twice"), stale_key="k:last") == ["old"]
+    release.set()
+    worker.join()
+    assert service.get("k") == ["new"] and service.get("k:last") == ["new"]
+
+    def broken():
+        raise RuntimeError("llm down")
+    assert service.get_or_compute("other", broken, stale_key="k:last") == ["new"]
+    with pytest.raises(RuntimeError):
+        service.get_or_compute("other", broken)
+    assert not service.exists("lock:other")
+
+
+def test_lock_held_by_another_worker():
+    service = make_service()
+    service.add("lock:k", "other-worker", expire=60)
+    threading.Timer(0.3, lambda: service.set("k", ["theirs"])).start()
+    assert service.get_or_compute("k", lambda: pytest.fail("lock ignored"), wait=3) == ["theirs"]
+
+
+def test_waiter_in_another_worker_sees_the_result():
+    # Two workers sharing one store (Redis in production)
+    computing, waiting = make_service(), make_service()
+    waiting._local_cache = computing._local_cache
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.3)
+        return ["pick"]
+
+    real_set = computing.set
+
+    def slow_set(key, value, expire=43200):
+        # Widen the window between finishing compute() and the result being readable
+        time.sleep(SINGLE_FLIGHT_POLL * 2)
+        real_set(key, value, expire)
+
+    computing.set = slow_set
+    worker = threading.Thread(target=lambda: computing.get_or_compute("k", slow, stale_key="k:last"))
+    worker.start()
+    started.wait(2)
+    assert waiting.get_or_compute("k", lambda: pytest.fail("lock ignored"), stale_key="k:last", wait=5) == ["pick"]
+    worker.join()
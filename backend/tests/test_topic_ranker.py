@@ -0,0 +1,85 @@
+import json
+import time
+import uuid
+from types import SimpleNamespace
+from backend.models import Persona
+from backend.services import ai_service as ai_module
+from backend.services.ai_service import ai_service
+from backend.services.topic_ranker import prerank
+
+NOW = time.time()
+
+
+def item(item_id, title, views=0, likes=0, hours_ago=1.0, source="Bilibili"):
+    published = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(NOW - hours_ago * 3600))
+    return {"original_id": item_id, "title": title, "source": source, "published_at": published,
+            "metrics": {"views": views, "likes": likes}}
+
+
+def test_prerank_prefers_interest_engagement_and_recency():
+    persona = Persona(name="P", interests=["Rust", "编译器"])
+    pool = [
+        item("old", "Rust 编译器内幕", views=1000, hours_ago=24 * 30),
+        item("match", "Rust 编译器内幕", views=1000),
+        item("popular", "今日八卦", views=1_000_000, likes=100),
+        item("quiet", "今日八卦", views=10),
+    ]
+    assert [t["original_id"] for t in prerank(pool, persona, k=3, now=NOW)] == ["match", "popular", "old"]
+
+
+def test_prerank_is_deterministic():
+    persona = Persona(name="P", interests=[])
+    pool = [item("b", "video", views=50_000), item("r2", "post", source="RSS"), item("r1", "post", source="RSS")]
+    ranked = [t["original_id"] for t in prerank(pool, persona, now=NOW)]
+    # Equal scores are ordered by id, whatever the pool order
+    assert ranked == ["b", "r1", "r2"]
+    assert ranked == [t["original_id"] for t in prerank(list(reversed(pool)), persona, now=NOW)]
+
+
+def test_picks_send_only_top_k_and_key_on_them(monkeypatch):
+    prompts = []
+
+    def create(**kwargs):
+        prompts.append(kwargs["messages"][1]["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps({"picks": [{"id": "t0", "reason": "r"}]})))])
+
+    monkeypatch.setattr(ai_service, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create))))
+    monkeypatch.setattr(ai_module, "prerank", lambda topics, persona: prerank(topics, persona, k=3))
+    persona = Persona(id=80000 + uuid.uuid4().int % 10000, name="P", interests=["猫"])
+    pool = [item(f"t{i}", f"topic {i} {uuid.uuid4().hex}", views=100 * (50 - i)) for i in range(50)]
+
+    assert ai_service.pick_best_topics(pool, persona) == [{"id": "t0", "reason": "r"}]
+    # Intro line, table header, then one row per candidate sent
+    assert len(prompts[0].splitlines()[2:]) == 3
+
+    # Candidates beyond the top K do not change what is sent, so the cached picks are reused
+    pool[-1]["title"] = "changed"
+    ai_service.pick_best_topics(pool, persona)
+    assert len(prompts) == 1
+
+    # Same top K in another order (recency moves with the clock): still the same cache key
+    monkeypatch.setattr(ai_module, "prerank", lambda topics, persona: prerank(topics, persona, k=3)[::-1])
+    ai_service.pick_best_topics(pool, persona)
+    assert len(prompts) == 1
+
+
+def test_prerank_reads_real_feed_item_fields():
+    from backend.services.bilibili_service import BilibiliService
+    from backend.services.source_fetcher import SourceFetcher
+
+    def feed_item(bvid, stat, tags):
+        # Listing item enriched the way the sync does it
+        item = {"original_id": bvid, "title": "视频", "source": "Bilibili", "metrics": {"views": stat["view"]},
+                "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(NOW - 3600))}
+        SourceFetcher._apply_details(item, {"metrics": BilibiliService._stat_to_metrics(stat), "tags": tags})
+        return item
+
+    persona = Persona(name="P", interests=["显卡"])
+    base = {"view": 10_000, "like": 0, "coin": 0, "favorite": 0, "reply": 0}
+    pool = [
+        feed_item("BVplain", base, ["日常"]),
+        feed_item("BVstarred", {**base, "favorite": 2_000}, ["日常"]),
+        feed_item("BVtagged", base, ["显卡"]),
+    ]
+    # Tags come from "labels", favorites from "stars": both move an item up
+    assert [t["original_id"] for t in prerank(pool, persona, now=NOW)] == ["BVtagged", "BVstarred", "BVplain"]
@@ -0,0 +1,80 @@
+"""
+Sync worker for SYNC_MODE=queue.
+
+    python -m backend.worker            # 领取并执行同步任务，可在多台机器上启动多个
+    python -m backend.worker --once     # 处理完当前队列后退出
+
+Each job fetches one unique source (with its watermark) and stores the items in the queue.
+The worker that completes the last job of a sync assembles and caches every persona feed.
+The API reads those feeds from the shared cache: Redis, or without it the CACHE_DISK_PATH file
+(the same file for the API and every worker on the box).
+"""
+import argparse
+import logging
+import os
+import socket
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from .database import create_db_and_tables, SessionLocal
+from .models import SourceConfig
+from .services.crawler import crawler_service
+from .services.job_queue import check_sync_mode, get_job_queue
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("BuddyWorker")
+
+
+def run_job(queue, job):
+    config = SourceConfig(**job["config"])
+    logger.info(f"Sync {job['sync_id']}: fetching {job['key']}")
+    try:
+        with SessionLocal() as session:
+            items = crawler_service.sync_source(session, config)
+    except Exception as e:
+        # A failed source still completes its job so the sync can be assembled
+        logger.error(f"Sync {job['sync_id']}: {job['key']} failed: {e}")
+        items = []
+
+    if queue.complete(job["sync_id"], job["key"], items):
+        assemble(queue, job["sync_id"])
+
+
+def assemble(queue, sync_id: str):
+    plan = queue.get_plan(sync_id)
+    persona_configs = {
+        int(pid): [SourceConfig(**c) for c in configs] for pid, configs in plan.get("personas", {}).items()
+    }
+    persona_names = {int(pid): name for pid, name in plan.get("names", {}).items()}
+    persona_versions = {int(pid): version for pid, version in plan.get("versions", {}).items()}
+    crawler_service.publish_feeds(persona_configs, persona_names, queue.get_results(sync_id), persona_versions)
+    queue.finish(sync_id)
+    logger.info(f"Sync {sync_id}: persona feeds assembled")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Buddy sync worker")
+    parser.add_argument("--id", default=f"{socket.gethostname()}-{os.getpid()}", help="worker id shown in leases")
+    parser.add_argument("--poll", type=float, default=2.0, help="seconds to wait when the queue is empty")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    check_sync_mode("queue")
+    queue = get_job_queue()
+    logger.info(f"Worker {args.id} started ({type(queue).__name__})")
+
+    while True:
+        job = queue.lease(args.id)
+        if job:
+            run_job(queue, job)
+        elif args.once:
+            break
+        else:
+            time.sleep(args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,21 @@
 import api from './api'
 
+const JOB_POLL_INTERVAL = 1000
+const JOB_TIMEOUT = 5 * 60 * 1000
+
+// AI generation endpoints queue a job and answer 202 { job_id }; poll it until it is done
+async function waitForJob(jobId) {
+    const deadline = Date.now() + JOB_TIMEOUT
+    while (Date.now() < deadline) {
+        const res = await api.get(`/ai/jobs/${jobId}`)
+        const job = res.data
+        if (job.status === 'done') return job.result
+        if (job.status === 'failed') throw new Error(job.error || 'AI job failed')
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL))
+    }
+    throw new Error('AI job timed out')
+}
+
 export const dataService = {
     // Manual Sync
     async manualSync() {
@@ -33,7 +49,49 @@ export const dataService = {
             persona_id: personaId,
             extra_prompt: extraPrompt
         })
-        return res.data
+        return waitForJob(res.data.job_id)
+    },
+
+    // Streaming Script Generation (SSE): onToken(text) is called as the model writes,
+    // resolves with the persisted script. Aborting `signal` cancels the generation upstream.
+    // regenerate=true asks for a fresh script instead of the cached one for the same inputs.
+    async streamScript(topicId, templateId, personaId, extraPrompt = '', onToken = () => {}, signal = undefined, regenerate = false) {
+        const res = await fetch(`${api.defaults.baseURL}/scripts/generate/stream`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+            body: JSON.stringify({
+                topic_id: topicId,
+                template_id: templateId,
+                persona_id: personaId,
+                extra_prompt: extraPrompt,
+                regenerate
+            }),
+            signal
+        })
+        if (!res.ok) {
+            const body = await res.json().catch(() => ({}))
+            throw new Error(body.detail || `HTTP ${res.status}`)
+        }
+
+        const reader = res.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ''
+        while (true) {
+            const { value, done } = await reader.read()
+            if (done) break
+            buffer += decoder.decode(value, { stream: true })
+            let sep
+            while ((sep = buffer.indexOf('\n\n')) !== -1) {
+                const block = buffer.slice(0, sep)
+                buffer = buffer.slice(sep + 2)
+                const event = block.match(/^event: (.*)$/m)?.[1]
+                const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}')
+                if (event === 'token') onToken(data.text)
+                else if (event === 'done') return data
+                else if (event === 'error') throw new Error(data.detail || 'AI stream failed')
+            }
+        }
+        throw new Error('AI stream ended unexpectedly')
     },
 
     // Script Recovery
@@ -47,11 +105,12 @@ export const dataService = {
     },
 
     // Metadata Generation (AI Title, Info, Tags)
-    async generateMetadata(topicId, personaId, scriptContent = null) {
+    async generateMetadata(topicId, personaId, scriptContent = null, regenerate = false) {
         const params = personaId ? { persona_id: personaId } : {}
         const payload = scriptContent ? { script_content: scriptContent } : {}
+        if (regenerate) payload.regenerate = true
         const res = await api.post(`/topics/${topicId}/generate-metadata`, payload, { params })
-        const topic = res.data
+        const topic = await waitForJob(res.data.job_id)
         return {
             ...topic, // Return full topic to keep data synced
             titles: topic.analysis_result?.ai_titles || [topic.ai_title],